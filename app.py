@@ -30,6 +30,8 @@ from components.transitions import (
     falling_leaves_animation,
     page_loading_animation
 )
+from utils.artifact_store import get_artifact_store, StoredImageDict
+from utils.image_pyramid import encoded_preview
 
 # Set page configuration
 st.set_page_config(
@@ -48,10 +50,6 @@ def load_css():
 load_css()
 
 # Initialize session state variables if they don't exist
-if 'uploaded_image' not in st.session_state:
-    st.session_state.uploaded_image = None
-if 'analyzed_image' not in st.session_state:
-    st.session_state.analyzed_image = None
 if 'deforested_areas' not in st.session_state:
     st.session_state.deforested_areas = None
 if 'analysis_complete' not in st.session_state:
@@ -64,7 +62,8 @@ if 'prev_location' not in st.session_state:
 if 'theme' not in st.session_state:
     st.session_state.theme = "light"
 if 'timelapse_images' not in st.session_state:
-    st.session_state.timelapse_images = {}
+    # Frames live in the session's artifact store and are decoded on access
+    st.session_state.timelapse_images = StoredImageDict(get_artifact_store(st.session_state), "timelapse_images")
 if 'time_series_data' not in st.session_state:
     st.session_state.time_series_data = None
 if 'forest_loss_stats' not in st.session_state:
@@ -694,16 +693,20 @@ if page == "Overview Dashboard":
         from data.sample_coordinates import get_coordinates_for_location
         from utils.mapping import create_map_with_deforestation
         
+        from utils.map_cache import map_cache
+        import streamlit.components.v1 as st_components
+        
+        # Reruns with the same inputs reuse the rendered map
         coordinates = get_coordinates_for_location(st.session_state.selected_location)
-        map_view = create_map_with_deforestation(
+        map_html = map_cache.get(
+            create_map_with_deforestation,
             center_lat=coordinates["lat"],
             center_lon=coordinates["lon"],
             zoom=coordinates["zoom"],
             deforested_areas=st.session_state.deforested_areas if 'deforested_areas' in st.session_state else None
         )
         
-        from streamlit_folium import st_folium
-        st_folium(map_view, width=725)
+        st_components.html(map_html, width=725, height=700)
         
     with dashboard_tabs[1]:
         st.subheader("Recent Deforestation Statistics")
@@ -738,16 +741,15 @@ if page == "Overview Dashboard":
         )
         
         if quick_upload is not None:
-            from PIL import Image
-            
             try:
-                # Read and display the uploaded image
-                image = Image.open(quick_upload)
-                st.image(image, caption="Uploaded Image", use_container_width=True)
+                # Display the uploaded image, decoded straight at display resolution
+                st.image(encoded_preview(quick_upload.getvalue()), caption="Uploaded Image", use_container_width=True)
                 
                 # Add a button to redirect to the full analysis page
                 if st.button("Proceed to Full Analysis"):
-                    st.session_state.uploaded_image = image
+                    get_artifact_store(st.session_state).put_encoded(
+                        "uploaded_image", quick_upload.getvalue(), source_id=quick_upload.file_id
+                    )
                     # We'll use the session state to track that we want to switch to the upload section
                     st.session_state.redirect_to_upload = True
                     st.rerun()
@@ -0,0 +1,82 @@
+"""
+Compare the float32 before/after difference used originally with the integer diff kernel.
+
+Reports wall time and peak traced memory (inputs excluded) for each image size.
+
+Usage:
+    python benchmarks/diff_kernel_benchmark.py [megapixels ...]
+
+Defaults to 1, 10 and 100 megapixels. The float32 baseline needs roughly 40 bytes
+per pixel, so the 100 MP run needs about 4 GB of free memory.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.diff_kernel import allocate_diff_buffers, abs_diff_sum, threshold_masks
+
+# Mean-intensity thresholds of the original pipeline and their summed-difference equivalents
+MEAN_THRESHOLDS = (30, 80, 50)
+SUM_THRESHOLDS = tuple(3 * threshold for threshold in MEAN_THRESHOLDS)
+
+
+def float_baseline(before, after):
+    """The original float32 pipeline: absolute difference, channel sum and thresholds."""
+    diff = np.abs(before.astype(np.float32) - after.astype(np.float32))
+    intensity = np.sum(diff, axis=2) / 3
+    masks = [intensity > threshold for threshold in MEAN_THRESHOLDS]
+    return intensity, masks
+
+
+def integer_kernel(before, after):
+    """The integer kernel: uint16 channel sum and thresholds in preallocated buffers."""
+    buffers = allocate_diff_buffers(before.shape[:2])
+    change_sum = abs_diff_sum(before, after, buffers)
+    masks = threshold_masks(change_sum, SUM_THRESHOLDS)
+    return change_sum, masks
+
+
+def measure(function, before, after, repeats):
+    """Return the best wall time over the repeats and the peak traced memory of one run."""
+    tracemalloc.start()
+    function(before, after)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(before, after)
+        best = min(best, time.perf_counter() - start)
+    return best, peak
+
+
+def main(megapixel_sizes):
+    rng = np.random.default_rng(0)
+    print(f"{'MP':>5} {'float32 s':>10} {'int s':>8} {'speedup':>8} {'float32 MB':>11} {'int MB':>8} {'memory':>7}")
+    for megapixels in megapixel_sizes:
+        side = int(np.sqrt(megapixels * 1_000_000))
+        before = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+        after = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+
+        # Both pipelines must agree before their costs are compared
+        intensity, float_masks = float_baseline(before, after)
+        change_sum, int_masks = integer_kernel(before, after)
+        assert np.array_equal(np.rint(intensity * 3).astype(np.uint16), change_sum)
+        assert all(np.array_equal(f, i) for f, i in zip(float_masks, int_masks))
+        del intensity, float_masks, change_sum, int_masks
+
+        repeats = 3 if megapixels < 50 else 1
+        float_time, float_peak = measure(float_baseline, before, after, repeats)
+        int_time, int_peak = measure(integer_kernel, before, after, repeats)
+        print(f"{megapixels:>5g} {float_time:>10.3f} {int_time:>8.3f} {float_time / int_time:>7.1f}x "
+              f"{float_peak / 2**20:>11.0f} {int_peak / 2**20:>8.0f} {float_peak / int_peak:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main([float(arg) for arg in sys.argv[1:]] or [1, 10, 100])
@@ -1,6 +1,6 @@
 import streamlit as st
 import folium
-from streamlit_folium import st_folium
+import streamlit.components.v1 as st_components
 import numpy as np
 from datetime import datetime, timedelta
 import pandas as pd
@@ -8,19 +8,29 @@ import plotly.express as px
 import plotly.graph_objects as go
 
 from utils.mapping import create_map_with_deforestation
+from utils.map_cache import map_cache
 from utils.visualization import create_deforestation_heatmap
 from data.sample_coordinates import get_coordinates_for_location
+from utils.change_product import get_change_product
+from utils.region_stats import summarize_region_stats
+from utils.image_pyramid import display_level, COLUMN_DISPLAY_WIDTH
+from utils.artifact_store import get_artifact_store
+from utils.alignment import DEFAULT_RESAMPLING
 from utils.deforestation_analysis import (
     calculate_detailed_deforestation_metrics,
     compare_to_global_regions,
     analyze_weather_impact,
     create_weather_plots,
-    create_deforestation_projection
+    create_deforestation_projection,
+    PROJECTION_SIMULATIONS,
+    PROJECTION_HORIZON_YEARS
 )
 
 def analysis_section():
     """Display analysis results for deforestation detection."""
     
+    store = get_artifact_store(st.session_state)
+    
     st.header("Deforestation Analysis Results")
     
     if not st.session_state.analysis_complete:
@@ -28,8 +38,12 @@ def analysis_section():
         return
     
     # Check if we have before and after images
-    has_before_after = ('before_image' in st.session_state and 
-                       'after_image' in st.session_state)
+    has_before_after = ('before_image' in store and 
+                       'after_image' in store)
+    
+    # Decode the pair once for this rerun
+    before_image = store.get_image("before_image")
+    after_image = store.get_image("after_image")
     
     # Create tabs for different views
     analysis_tabs = st.tabs([
@@ -50,14 +64,14 @@ def analysis_section():
             
             with col1:
                 st.image(
-                    st.session_state.before_image,
+                    display_level(before_image, COLUMN_DISPLAY_WIDTH),
                     use_container_width=True,
                     caption="Before - Original Forest Coverage"
                 )
             
             with col2:
                 st.image(
-                    st.session_state.after_image,
+                    display_level(after_image, COLUMN_DISPLAY_WIDTH),
                     use_container_width=True,
                     caption="After - Current Forest Coverage"
                 )
@@ -68,9 +82,13 @@ def analysis_section():
             # Create a comparison container with embedded HTML for image comparison
             comparison_value = st.slider("Slide to compare", 0, 100, 50, key="image_comparison_slider")
             
+            # Embed the column-width pyramid levels rather than the full-resolution images
+            before_display = display_level(before_image, COLUMN_DISPLAY_WIDTH)
+            after_display = display_level(after_image, COLUMN_DISPLAY_WIDTH)
+
             # Get the dimensions of the images
-            width = getattr(st.session_state.before_image, 'width', 600)
-            height = getattr(st.session_state.before_image, 'height', 450)
+            width = getattr(before_display, 'width', 600)
+            height = getattr(before_display, 'height', 450)
             
             # Convert images to base64 for HTML embedding
             import base64
@@ -81,8 +99,8 @@ def analysis_section():
                 img.save(buffered, format="PNG")
                 return base64.b64encode(buffered.getvalue()).decode()
             
-            before_b64 = get_image_base64(st.session_state.before_image)
-            after_b64 = get_image_base64(st.session_state.after_image)
+            before_b64 = get_image_base64(before_display)
+            after_b64 = get_image_base64(after_display)
             
             # Create image comparison with CSS
             comparison_html = f"""
@@ -130,39 +148,22 @@ def analysis_section():
             
             # Add a more dynamic analysis based on the specific images
             if has_before_after:
-                # Perform simple analysis on the images to detect specific changes
-                import numpy as np
-                from PIL import ImageStat
-                
-                # Convert images to numpy arrays for analysis
-                before_array = np.array(st.session_state.before_image)
-                after_array = np.array(st.session_state.after_image)
-                
-                # Resize images to the same dimensions before comparison
-                # Use the dimensions of the first image as the target size
-                from PIL import Image
-                
-                # Get target dimensions
-                target_width = before_array.shape[1]
-                target_height = before_array.shape[0]
-                
-                # Resize the after image to match before image dimensions
-                if before_array.shape != after_array.shape:
-                    # Convert after_array back to PIL Image for resizing
-                    after_img = Image.fromarray(after_array.astype('uint8'))
-                    after_img = after_img.resize((target_width, target_height), Image.LANCZOS)
-                    after_array = np.array(after_img)
+                # Read the aligned arrays and difference statistics from the shared change product
+                product = get_change_product(
+                    st.session_state,
+                    before_image,
+                    after_image,
+                    st.session_state.get("resampling", DEFAULT_RESAMPLING)
+                )
+                change_stats = product["stats"]
                 
                 # Calculate basic statistical differences between images
-                before_green_mean = np.mean(before_array[:,:,1])
-                after_green_mean = np.mean(after_array[:,:,1])
+                before_green_mean = change_stats["before_green_mean"]
+                after_green_mean = change_stats["after_green_mean"]
                 green_change_pct = ((before_green_mean - after_green_mean) / before_green_mean) * 100 if before_green_mean > 0 else 0
                 
                 # Identify areas with significant changes (simplified approach)
-                diff = np.abs(before_array.astype(np.float32) - after_array.astype(np.float32))
-                total_diff = np.sum(diff)
-                significant_change_pixels = np.sum(np.sum(diff, axis=2) > 100)
-                significant_change_pct = (significant_change_pixels / (before_array.shape[0] * before_array.shape[1])) * 100
+                significant_change_pct = (change_stats["significant_pixels"] / change_stats["total_pixels"]) * 100
                 
                 # Identify specific types of changes
                 changes = []
@@ -176,8 +177,8 @@ def analysis_section():
                     # Look for specific patterns in the difference image
                     # Linear patterns might indicate roads
                     # Implement a simplified road detection (this would be more sophisticated in a real system)
-                    horizontal_edges = np.sum(np.abs(diff[1:,:,:] - diff[:-1,:,:]))
-                    vertical_edges = np.sum(np.abs(diff[:,1:,:] - diff[:,:-1,:]))
+                    horizontal_edges = change_stats["horizontal_edges"]
+                    vertical_edges = change_stats["vertical_edges"]
                     edge_ratio = horizontal_edges / vertical_edges if vertical_edges > 0 else 0
                     
                     if edge_ratio > 1.5 or edge_ratio < 0.6:
@@ -185,12 +186,12 @@ def analysis_section():
                         
                     # Check for large contiguous areas of change - potential clearings
                     # This is simplified; a real implementation would use connected component analysis
-                    if np.max(diff) > 150:
+                    if change_stats["max_channel_diff"] > 150:
                         changes.append("**Large cleared areas**: Significant sections of forest appear to have been completely removed")
                 
                 # Check for water body changes (detect blue channel changes)
-                before_blue_mean = np.mean(before_array[:,:,2])
-                after_blue_mean = np.mean(after_array[:,:,2])
+                before_blue_mean = change_stats["before_blue_mean"]
+                after_blue_mean = change_stats["after_blue_mean"]
                 blue_change_pct = ((after_blue_mean - before_blue_mean) / before_blue_mean) * 100 if before_blue_mean > 0 else 0
                 
                 if abs(blue_change_pct) > 10:
@@ -221,7 +222,7 @@ def analysis_section():
         else:
             # Only single image available (old functionality)
             st.image(
-                st.session_state.uploaded_image, 
+                display_level(store.get_image("uploaded_image")), 
                 use_container_width=True, 
                 caption="Satellite Image"
             )
@@ -236,14 +237,20 @@ def analysis_section():
             
             with col1:
                 st.image(
-                    st.session_state.before_analyzed if hasattr(st.session_state, 'before_analyzed') else st.session_state.before_image,
+                    display_level(
+                        store.get_image("before_analyzed") if 'before_analyzed' in store else before_image,
+                        COLUMN_DISPLAY_WIDTH
+                    ),
                     use_container_width=True,
                     caption="Before - Analyzed Forest Coverage"
                 )
             
             with col2:
                 st.image(
-                    st.session_state.after_analyzed if hasattr(st.session_state, 'after_analyzed') else st.session_state.analyzed_image,
+                    display_level(
+                        store.get_image("after_analyzed") if 'after_analyzed' in store else store.get_image("analyzed_image"),
+                        COLUMN_DISPLAY_WIDTH
+                    ),
                     use_container_width=True,
                     caption="After - Detected Deforestation"
                 )
@@ -253,13 +260,13 @@ def analysis_section():
             
             # Show the default analyzed image with deforestation highlighted
             st.image(
-                st.session_state.analyzed_image,
+                display_level(store.get_image("analyzed_image")),
                 use_container_width=True,
                 caption="Areas of Deforestation Highlighted (Red Overlay)"
             )
             
             # Show additional visualizations if available
-            if hasattr(st.session_state, 'diff_visualization'):
+            if 'diff_visualization' in store:
                 st.subheader("Change Intensity Heatmap")
                 st.markdown("""
                 This heatmap shows the intensity of changes between the before and after images:
@@ -269,53 +276,26 @@ def analysis_section():
                 """, unsafe_allow_html=True)
                 
                 st.image(
-                    st.session_state.diff_visualization,
+                    display_level(store.get_image("diff_visualization")),
                     use_container_width=True,
                     caption="Change Intensity Heatmap"
                 )
                 
-                # Add a detailed explanation based on the images
-                # Get numpy arrays of the images for analysis
-                import numpy as np
-                before_array = np.array(st.session_state.before_image)
-                after_array = np.array(st.session_state.after_image)
-                
-                # Resize images to the same dimensions before comparison
-                # Use the dimensions of the first image as the target size
-                from PIL import Image
-                
-                # Get target dimensions
-                target_width = before_array.shape[1]
-                target_height = before_array.shape[0]
-                
-                # Resize the after image to match before image dimensions
-                if before_array.shape != after_array.shape:
-                    # Convert after_array back to PIL Image for resizing
-                    after_img = Image.fromarray(after_array.astype('uint8'))
-                    after_img = after_img.resize((target_width, target_height), Image.LANCZOS)
-                    after_array = np.array(after_img)
+                # Add a detailed explanation based on the images, read from the shared change product
+                product = get_change_product(
+                    st.session_state,
+                    before_image,
+                    after_image,
+                    st.session_state.get("resampling", DEFAULT_RESAMPLING)
+                )
                 
                 # Calculate basic metrics for the changes
-                diff = np.abs(before_array.astype(np.float32) - after_array.astype(np.float32))
-                total_diff = np.sum(diff)
-                significant_change_mask = np.sum(diff, axis=2) > 100
-                significant_change_pixels = np.sum(significant_change_mask)
-                total_pixels = before_array.shape[0] * before_array.shape[1]
-                significant_change_pct = (significant_change_pixels / total_pixels) * 100
+                significant_change_pct = (product["stats"]["significant_pixels"] / product["stats"]["total_pixels"]) * 100
                 
                 # Identify patterns in the changes
-                # Check for clustering of changes
-                from scipy import ndimage
-                labeled_array, num_features = ndimage.label(significant_change_mask)
-                
-                # Calculate properties of the changed regions
-                region_sizes = []
-                for i in range(1, num_features + 1):
-                    region_size = np.sum(labeled_array == i)
-                    region_sizes.append(region_size)
-                
-                # Sort region sizes to find the largest changes
-                region_sizes.sort(reverse=True)
+                # Check for clustering of changes using the per-region statistics table
+                region_summary = summarize_region_stats(product["region_stats"])
+                num_features = region_summary["num_regions"]
                 
                 # Create a detailed analysis
                 st.subheader("Change Pattern Analysis")
@@ -324,14 +304,13 @@ def analysis_section():
                 col1, col2 = st.columns(2)
                 with col1:
                     st.metric("Total Changed Areas", f"{num_features}")
-                    if len(region_sizes) > 0:
-                        st.metric("Largest Changed Area", f"{region_sizes[0]} pixels")
+                    if num_features > 0:
+                        st.metric("Largest Changed Area", f"{region_summary['largest_area']} pixels")
                 
                 with col2:
                     st.metric("Affected Area", f"{significant_change_pct:.1f}%")
-                    if len(region_sizes) > 0:
-                        avg_size = sum(region_sizes) / len(region_sizes)
-                        st.metric("Average Change Size", f"{avg_size:.1f} pixels")
+                    if num_features > 0:
+                        st.metric("Average Change Size", f"{region_summary['average_area']:.1f} pixels")
                 
                 # Classify the pattern
                 pattern_description = ""
@@ -341,9 +320,9 @@ def analysis_section():
                     pattern_description = "Single large area of change detected - likely a concentrated deforestation event."
                 elif num_features > 20:
                     pattern_description = "Highly fragmented pattern - multiple small changes across the landscape."
-                elif len(region_sizes) > 0 and region_sizes[0] > 5000:
+                elif region_summary["largest_area"] > 5000:
                     pattern_description = "Large-scale clearing detected - significant deforestation event."
-                elif len(region_sizes) > 0 and max(region_sizes) < 1000 and len(region_sizes) > 10:
+                elif region_summary["largest_area"] < 1000 and num_features > 10:
                     pattern_description = "Distributed small clearings - possibly selective logging or small agriculture."
                 else:
                     pattern_description = "Mixed pattern of deforestation - combination of large and small clearings."
@@ -367,8 +346,8 @@ def analysis_section():
                     
                     # Downsample for performance
                     sample_factor = 4
-                    change_intensity = np.sum(diff, axis=2) / 3.0
-                    downsampled = change_intensity[::sample_factor, ::sample_factor]
+                    # Mean per-channel difference, computed on the downsampled grid only
+                    downsampled = product["change_sum"][::sample_factor, ::sample_factor] / 3.0
                     
                     # Create a 3D surface plot
                     x = np.arange(0, downsampled.shape[1])
@@ -405,15 +384,15 @@ def analysis_section():
                 ["Original Image", "Analyzed Image with Deforestation Highlighted"]
             )
             
-            if view_option == "Original Image" and st.session_state.uploaded_image is not None:
+            if view_option == "Original Image" and store.get_image("uploaded_image") is not None:
                 st.image(
-                    st.session_state.uploaded_image, 
+                    display_level(store.get_image("uploaded_image")), 
                     use_container_width=True, 
                     caption="Original Satellite Image"
                 )
-            elif view_option == "Analyzed Image with Deforestation Highlighted" and st.session_state.analyzed_image is not None:
+            elif view_option == "Analyzed Image with Deforestation Highlighted" and store.get_image("analyzed_image") is not None:
                 st.image(
-                    st.session_state.analyzed_image, 
+                    display_level(store.get_image("analyzed_image")), 
                     use_container_width=True, 
                     caption="Deforested Areas Highlighted"
                 )
@@ -440,8 +419,8 @@ def analysis_section():
             
             # Calculate detailed metrics
             metrics = calculate_detailed_deforestation_metrics(
-                st.session_state.before_image,
-                st.session_state.after_image,
+                before_image,
+                after_image,
                 time_difference_years
             )
             
@@ -688,15 +667,17 @@ def analysis_section():
         
         coordinates = get_coordinates_for_location(st.session_state.selected_location)
         
-        # Create interactive map with deforestation areas
-        map_view = create_map_with_deforestation(
+        # Create interactive map with deforestation areas; reruns with the same inputs
+        # reuse the rendered map
+        map_html = map_cache.get(
+            create_map_with_deforestation,
             center_lat=coordinates["lat"],
             center_lon=coordinates["lon"],
             zoom=coordinates["zoom"],
             deforested_areas=st.session_state.deforested_areas
         )
         
-        st_folium(map_view, width=725, height=500, returned_objects=[])
+        st_components.html(map_html, width=725, height=500)
         
         st.markdown("""
         **Map Legend:**
@@ -730,6 +711,14 @@ def analysis_section():
             if metrics['annual_rate'] > 0:
                 if projections["years_to_50_percent"] is not None:
                     st.warning(f"⚠️ At the current rate of deforestation ({metrics['annual_rate']:.2f}% per year), **50% of the remaining forest will be lost in approximately {projections['years_to_50_percent']} years**.")
+                    
+                    # Spread of the same figure across the simulated trajectories
+                    low, median, high = (
+                        f"{years:.0f}" if np.isfinite(years) else f"more than {PROJECTION_HORIZON_YEARS}"
+                        for years in projections["years_to_50_percent_percentiles"].values()
+                    )
+                    st.caption(f"Across {PROJECTION_SIMULATIONS:,} simulated rate trajectories with year-to-year variation "
+                               f"and loss shocks, 50% loss takes {median} years (P50), ranging from {low} (P5) to {high} (P95).")
                 
                 # Show potential conservation impact
                 st.subheader("Conservation Impact")
@@ -3,8 +3,10 @@ import folium
 from folium.plugins import HeatMap, MarkerCluster
 import pandas as pd
 import numpy as np
-from streamlit_folium import folium_static, st_folium
+import streamlit.components.v1 as st_components
 import json
+from utils.heat_aggregation import bin_heat_points
+from utils.map_cache import map_cache
 
 # Function to load forest health indicators
 def load_forest_health_data():
@@ -107,7 +109,11 @@ def create_global_health_map(forest_data):
     marker_cluster = MarkerCluster(name="Forest Regions").add_to(m)
     
     # Create a heatmap of deforestation rates
-    heat_data = [[row.latitude, row.longitude, row.deforestation_rate] for _, row in forest_data.iterrows()]
+    heat_data = bin_heat_points(
+        forest_data['latitude'].to_numpy(),
+        forest_data['longitude'].to_numpy(),
+        forest_data['deforestation_rate'].to_numpy()
+    )
     HeatMap(heat_data, name="Deforestation Intensity", radius=35, blur=20).add_to(m)
     
     # Function to determine marker color based on health index
@@ -186,11 +192,11 @@ def global_forest_health_section():
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        # Create the map
-        m = create_global_health_map(forest_data)
+        # Create the map; reruns with the same data reuse the rendered map
+        map_html = map_cache.get(create_global_health_map, forest_data=forest_data)
         
         # Display the map
-        st_folium(m, width=800, height=600, returned_objects=[])
+        st_components.html(map_html, width=800, height=600)
     
     with col2:
         # Add filter controls
@@ -1,6 +1,6 @@
 import streamlit as st
 import folium
-from streamlit_folium import st_folium
+import streamlit.components.v1 as st_components
 import datetime
 import pandas as pd
 import numpy as np
@@ -13,8 +13,19 @@ import folium.plugins
 
 # Import utilities
 from utils.mapping import create_map_with_deforestation
+from utils.heat_aggregation import bin_heat_points
+from utils.map_cache import map_cache
+from utils.alert_index import AlertIndex, viewport_bounds
 from data.sample_coordinates import get_coordinates_for_location
 
+# Size and zoom of the alert map
+ALERT_MAP_WIDTH = 1000
+ALERT_MAP_HEIGHT = 600
+ALERT_MAP_ZOOM = 9
+
+# Largest distance (km) selectable for the alert table filter
+ALERT_MAX_RADIUS_KM = 50
+
 def get_recent_alerts(location, days_back=30):
     """
     Generate simulated recent deforestation alerts.
@@ -174,7 +185,11 @@ def create_alert_map(alerts_df, center_lat, center_lon, zoom=9):
         ).add_to(m)
     
     # Add heatmap layer
-    heat_data = [[row['lat'], row['lon'], row['severity'] * row['area_ha']] for _, row in alerts_df.iterrows()]
+    heat_data = bin_heat_points(
+        alerts_df['lat'].to_numpy(),
+        alerts_df['lon'].to_numpy(),
+        (alerts_df['severity'] * alerts_df['area_ha']).to_numpy()
+    )
     folium.plugins.HeatMap(
         heat_data,
         radius=15,
@@ -253,11 +268,18 @@ def realtime_mapping_section():
     with col2:
         days_back = st.slider("Days to look back", 1, 90, 30)
     
-    # Simulate loading real-time data
-    with st.spinner("Loading real-time alert data..."):
-        # Simulate a brief delay for realism
-        time.sleep(0.5)
-        alerts_df = get_recent_alerts(location, days_back)
+    # Simulate loading real-time data; alerts are kept until the location or period
+    # changes, so unrelated widgets do not reload them
+    alerts_query = (location, days_back)
+    if st.session_state.get("alerts_query") != alerts_query or "alerts_index" not in st.session_state:
+        with st.spinner("Loading real-time alert data..."):
+            # Simulate a brief delay for realism
+            time.sleep(0.5)
+            st.session_state.alerts_df = get_recent_alerts(location, days_back)
+            st.session_state.alerts_index = AlertIndex.from_frame(st.session_state.alerts_df)
+            st.session_state.alerts_query = alerts_query
+    alerts_df = st.session_state.alerts_df
+    alerts_index = st.session_state.alerts_index
     
     # Display stats about alerts with custom styling
     col1, col2, col3, col4 = st.columns(4)
@@ -297,16 +319,23 @@ def realtime_mapping_section():
             </div>
             """, unsafe_allow_html=True)
     
-    # Create and display map
+    # Create and display map with only the alerts inside its initial viewport
     st.subheader("Deforestation Alert Map")
-    alert_map = create_alert_map(alerts_df, center_lat, center_lon)
-    st_folium(alert_map, width=1000, height=600, returned_objects=[])
+    viewport = viewport_bounds(center_lat, center_lon, ALERT_MAP_ZOOM, ALERT_MAP_WIDTH, ALERT_MAP_HEIGHT)
+    map_html = map_cache.get(
+        create_alert_map,
+        alerts_df=alerts_df.iloc[alerts_index.within_bounds(*viewport)],
+        center_lat=center_lat,
+        center_lon=center_lon,
+        zoom=ALERT_MAP_ZOOM
+    )
+    st_components.html(map_html, width=ALERT_MAP_WIDTH, height=ALERT_MAP_HEIGHT)
     
     # Display alert table
     st.subheader("Recent Alerts")
     
     # Add filtering options
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
         severity_filter = st.multiselect(
             "Filter by Severity",
@@ -321,10 +350,14 @@ def realtime_mapping_section():
             default=["Active", "Verified", "Under Investigation"]
         )
     
-    # Apply filters
-    filtered_df = alerts_df[
-        (alerts_df['severity'].isin(severity_filter)) &
-        (alerts_df['status'].isin(status_filter))
+    with col3:
+        radius_km = st.slider("Distance from region center (km)", 5, ALERT_MAX_RADIUS_KM, ALERT_MAX_RADIUS_KM, 5)
+    
+    # Apply filters, fetching only the alerts within the radius from the spatial index
+    nearby_df = alerts_df.iloc[alerts_index.within_radius(center_lat, center_lon, radius_km)]
+    filtered_df = nearby_df[
+        (nearby_df['severity'].isin(severity_filter)) &
+        (nearby_df['status'].isin(status_filter))
     ]
     
     # Format the dataframe for display
@@ -6,6 +6,7 @@ import numpy as np
 from datetime import datetime, timedelta
 from streamlit_extras.colored_header import colored_header
 from streamlit_extras.card import card
+from utils.forest_time_series import generate_forest_time_series, region_profile
 
 def generate_time_series_data(location):
     """
@@ -21,101 +22,12 @@ def generate_time_series_data(location):
     pandas.DataFrame
         DataFrame with date and forest cover percentage
     """
-    # Define starting points and rate of change based on location
-    if location == "Amazon Rainforest":
-        start_value = 95.0
-        yearly_change = -0.72
-        variation = 0.25
-        # Add specific known deforestation events - represented as spikes
-        deforestation_events = {
-            "2004-07-01": -1.2,  # Increased logging
-            "2007-11-01": -1.7,  # Major agricultural expansion
-            "2016-05-01": -2.1,  # Severe drought and fires
-            "2019-08-01": -2.4,  # Significant policy changes
-            "2022-03-01": -1.8,  # Recent acceleration
-        }
-    elif location == "Borneo":
-        start_value = 90.0
-        yearly_change = -1.1
-        variation = 0.3
-        # Add specific known deforestation events
-        deforestation_events = {
-            "2005-04-01": -2.2,  # Palm oil expansion
-            "2009-09-01": -1.9,  # Timber concessions
-            "2015-02-01": -2.6,  # Major fires
-            "2018-06-01": -1.5,  # Industrial plantations
-            "2021-11-01": -1.3,  # Recent changes
-        }
-    elif location == "Congo Basin":
-        start_value = 92.0
-        yearly_change = -0.45
-        variation = 0.2
-        # Add specific known deforestation events
-        deforestation_events = {
-            "2006-03-01": -0.8,  # Road development
-            "2010-08-01": -1.1,  # Mining concessions
-            "2014-05-01": -1.4,  # Agricultural expansion
-            "2017-11-01": -1.2,  # Increased logging
-            "2020-07-01": -0.9,  # Recent pressures
-        }
-    else:
-        start_value = 88.0
-        yearly_change = -0.85
-        variation = 0.3
-        deforestation_events = {}
-    
-    # Generate dates and forest cover values
-    start_date = datetime(2000, 1, 1)
-    dates = []
-    forest_cover = []
-    urban_expansion = []
-    agricultural_expansion = []
-    logging_activity = []
+    profile = region_profile(location)
+    start_value = profile["start_value"]
+    yearly_change = profile["yearly_change"]
     
-    # Generate quarterly data for 23 years (2000-2023)
-    for i in range(92):  
-        current_date = start_date + timedelta(days=i*90)
-        date_str = current_date.strftime("%Y-%m-%d")
-        dates.append(current_date)
-        
-        # Calculate forest cover with seasonal variation and long-term trend
-        years_passed = i / 4
-        seasonal_factor = 0.2 * np.sin(i * np.pi / 2)  # Seasonal variation
-        random_factor = variation * np.random.randn()  # Random variation
-        
-        # Base trend value
-        value = start_value + yearly_change * years_passed + seasonal_factor + random_factor
-        
-        # Apply specific deforestation events
-        if date_str in deforestation_events:
-            value += deforestation_events[date_str]
-        
-        forest_cover.append(max(0, min(100, value)))  # Ensure value is between 0 and 100
-        
-        # Calculate urban expansion (inverse of forest loss but not exactly)
-        urban_value = min(100 - value + 5, 35)  # Cap at reasonable level
-        urban_variation = 0.15 * np.random.randn()
-        urban_expansion.append(urban_value + urban_variation)
-        
-        # Calculate agricultural expansion (correlates with forest loss)
-        agri_value = min(100 - value + 10, 70)  # Higher than urban but capped
-        agri_variation = 0.2 * np.random.randn()
-        agricultural_expansion.append(agri_value + agri_variation)
-        
-        # Calculate logging activity (fluctuates more)
-        log_value = min(100 - value - 5, 40)  # Lower than agriculture
-        log_seasonal = 0.4 * np.sin(i * np.pi / 2)  # Stronger seasonal effect
-        log_variation = 0.4 * np.random.randn()
-        logging_activity.append(max(0, log_value + log_seasonal + log_variation))
-    
-    # Create DataFrame with all metrics
-    df = pd.DataFrame({
-        'date': dates,
-        'forest_cover': forest_cover,
-        'urban_expansion': urban_expansion,
-        'agricultural_expansion': agricultural_expansion,
-        'logging_activity': logging_activity
-    })
+    # Quarterly data from 2000 to 2022
+    df = generate_forest_time_series([location]).drop(columns="region")
     
     # Calculate statistics
     stats = {
@@ -6,9 +6,17 @@ import pandas as pd
 from datetime import datetime
 import time
 
+from utils.image_pyramid import display_level, FULL_DISPLAY_WIDTH
+from utils.artifact_store import get_artifact_store
+
+# The image column takes three fifths of the page width
+TIMELAPSE_DISPLAY_WIDTH = FULL_DISPLAY_WIDTH * 3 // 5
+
 def timelapse_section():
     """Display time-lapse view of deforestation changes."""
     
+    store = get_artifact_store(st.session_state)
+    
     st.header("Time-Lapse Deforestation View")
     
     if not st.session_state.analysis_complete:
@@ -36,7 +44,7 @@ def timelapse_section():
             # Display the image for the selected year
             if selected_year in st.session_state.timelapse_images:
                 st.image(
-                    st.session_state.timelapse_images[selected_year],
+                    display_level(st.session_state.timelapse_images[selected_year], TIMELAPSE_DISPLAY_WIDTH),
                     use_container_width=True,
                     caption=f"Satellite Image from {selected_year}"
                 )
@@ -56,7 +64,7 @@ def timelapse_section():
                     
                     # Display image
                     st.image(
-                        st.session_state.timelapse_images[year],
+                        display_level(st.session_state.timelapse_images[year], TIMELAPSE_DISPLAY_WIDTH),
                         use_container_width=True,
                         caption=f"Satellite Image from {year}"
                     )
@@ -76,9 +84,9 @@ def timelapse_section():
             )
             
             # Show a placeholder image
-            if st.session_state.analyzed_image is not None:
+            if store.get_image("analyzed_image") is not None:
                 st.image(
-                    st.session_state.analyzed_image,
+                    display_level(store.get_image("analyzed_image"), TIMELAPSE_DISPLAY_WIDTH),
                     use_container_width=True,
                     caption="Current Analysis (Time-lapse not available)"
                 )
@@ -4,12 +4,24 @@ import numpy as np
 import datetime
 import PIL
 from PIL import Image as PILImage  # Rename to avoid scope conflicts
-from utils.image_processing import process_satellite_image
+from utils.image_processing import process_satellite_image, analyze_image_pair
+from utils.result_cache import analysis_cache
+from utils.change_product import get_change_product
+from utils.image_pyramid import display_level, COLUMN_DISPLAY_WIDTH
+from utils.artifact_store import get_artifact_store
+from utils.alignment import RESAMPLING_FILTERS, DEFAULT_RESAMPLING
 from utils.mapping import create_map_with_deforestation
 
+# Parameters that identify the pair analysis pipeline in the result cache; bump the
+# version when the analysis output changes so stale cache entries are not reused
+PAIR_ANALYSIS_PARAMS = {"pipeline": "pair-analysis", "version": 3}
+
 def upload_section():
     """Create the upload section for satellite images with before and after comparison."""
     
+    # Large images for this session are kept in the session's artifact store
+    store = get_artifact_store(st.session_state)
+    
     # Check if we're in dark mode
     is_dark_mode = 'theme' in st.session_state and st.session_state.theme == 'dark'
     
@@ -147,12 +159,11 @@ def upload_section():
             # Preview of before image
             if uploaded_before is not None:
                 try:
-                    # Read the uploaded image
-                    before_image = PILImage.open(uploaded_before)
-                    st.session_state.before_image = before_image
+                    # Keep the compressed upload; its pixels are decoded once, when first analyzed
+                    store.put_encoded("before_image", uploaded_before.getvalue(), source_id=uploaded_before.file_id)
                     
-                    # Display preview
-                    st.image(before_image, use_container_width=True, caption="'Before' Image Preview")
+                    # Display preview, decoded straight at display resolution
+                    st.image(store.get_preview("before_image"), use_container_width=True, caption="'Before' Image Preview")
                     st.success("'Before' image uploaded successfully!")
                     
                 except Exception as e:
@@ -172,12 +183,11 @@ def upload_section():
             # Preview of after image
             if uploaded_after is not None:
                 try:
-                    # Read the uploaded image
-                    after_image = PILImage.open(uploaded_after)
-                    st.session_state.after_image = after_image
+                    # Keep the compressed upload; its pixels are decoded once, when first analyzed
+                    store.put_encoded("after_image", uploaded_after.getvalue(), source_id=uploaded_after.file_id)
                     
-                    # Display preview
-                    st.image(after_image, use_container_width=True, caption="'After' Image Preview")
+                    # Display preview, decoded straight at display resolution
+                    st.image(store.get_preview("after_image"), use_container_width=True, caption="'After' Image Preview")
                     st.success("'After' image uploaded successfully!")
                     
                 except Exception as e:
@@ -189,105 +199,81 @@ def upload_section():
         with upload_tabs[2]:  # Comparison Preview Tab
             st.subheader("Compare Before & After Images")
             
-            both_images_uploaded = ('before_image' in st.session_state and 
-                                  'after_image' in st.session_state)
+            both_images_uploaded = ('before_image' in store and 
+                                  'after_image' in store)
             
             if both_images_uploaded:
                 # Display side by side comparison
                 col1, col2 = st.columns(2)
                 with col1:
-                    st.image(st.session_state.before_image, use_container_width=True, caption="Before")
+                    st.image(store.get_preview("before_image", COLUMN_DISPLAY_WIDTH), use_container_width=True, caption="Before")
                 with col2:
-                    st.image(st.session_state.after_image, use_container_width=True, caption="After")
+                    st.image(store.get_preview("after_image", COLUMN_DISPLAY_WIDTH), use_container_width=True, caption="After")
+                
+                # Resampling quality used to put the 'After' image on the 'Before' grid
+                if store.get_size("before_image") != store.get_size("after_image"):
+                    resampling_options = list(RESAMPLING_FILTERS)
+                    st.session_state.resampling = st.selectbox(
+                        "Image sizes differ - resampling quality for alignment",
+                        resampling_options,
+                        index=resampling_options.index(st.session_state.get("resampling", DEFAULT_RESAMPLING)),
+                        help="Nearest is fastest, Lanczos gives the smoothest result; "
+                             "the aligned image is computed once per pair and reused"
+                    )
+                resampling = st.session_state.get("resampling", DEFAULT_RESAMPLING)
                 
                 # Process button
                 if st.button("Analyze Deforestation Between Images"):
                     with st.spinner("Analyzing deforestation patterns..."):
-                        # Process the before image for reference
-                        before_analyzed, _ = process_satellite_image(st.session_state.before_image)
-                        st.session_state.before_analyzed = before_analyzed
+                        # Full-resolution pixels are only needed from here on
+                        before_image = store.get_image("before_image")
+                        after_image = store.get_image("after_image")
                         
-                        # Process the after image for comparison and detection
-                        after_analyzed, deforested_areas = process_satellite_image(st.session_state.after_image)
-                        st.session_state.after_analyzed = after_analyzed
-                        st.session_state.deforested_areas = deforested_areas
+                        # Reuse the stored result when this exact image pair was analyzed before
+                        cache_key = analysis_cache.make_key(
+                            [before_image, after_image],
+                            {**PAIR_ANALYSIS_PARAMS, "resampling": resampling}
+                        )
+                        results = analysis_cache.get(cache_key)
                         
-                        # Generate a difference visualization to highlight changes
-                        try:
-                            # Convert images to numpy arrays
-                            import numpy as np
-                            before_array = np.array(st.session_state.before_image)
-                            after_array = np.array(st.session_state.after_image)
-                            
-                            # Resize images to the same dimensions before comparison
-                            if before_array.shape != after_array.shape:
-                                # Get target dimensions from the before image
-                                target_width = before_array.shape[1]
-                                target_height = before_array.shape[0]
+                        if results is None:
+                            try:
+                                # Aligned arrays, difference and region labels, built once and
+                                # shared with the Analysis Results page
+                                product = get_change_product(
+                                    st.session_state,
+                                    before_image,
+                                    after_image,
+                                    resampling
+                                )
                                 
-                                # Convert after_array back to PIL Image for resizing
-                                after_img = PILImage.fromarray(after_array.astype('uint8'))
-                                after_img = after_img.resize((target_width, target_height), PILImage.LANCZOS)
-                                after_array = np.array(after_img)
-                            
-                            # Create a difference image (absolute difference between before and after)
-                            diff = np.abs(before_array.astype(np.float32) - after_array.astype(np.float32))
-                            
-                            # Scale the differences for better visibility
-                            diff_normalized = np.clip(diff * 2, 0, 255).astype(np.uint8)
-                            
-                            # Create a heatmap-style visualization where red indicates significant changes
-                            diff_heatmap = np.zeros_like(before_array)
-                            
-                            # Blue channel for minimal changes, green for moderate, red for significant
-                            change_intensity = np.sum(diff, axis=2) / 3.0
-                            
-                            # Set blue channel (minimal changes)
-                            diff_heatmap[:,:,2] = np.where(change_intensity < 30, change_intensity * 8, 0).astype(np.uint8)
-                            
-                            # Set green channel (moderate changes)
-                            diff_heatmap[:,:,1] = np.where((change_intensity >= 30) & (change_intensity < 80), 
-                                                          (change_intensity - 30) * 5, 0).astype(np.uint8)
-                            
-                            # Set red channel (significant changes - likely deforestation)
-                            diff_heatmap[:,:,0] = np.where(change_intensity >= 80, 
-                                                          (change_intensity - 80) * 3, 0).astype(np.uint8)
-                            
-                            # Convert back to PIL Image - use PILImage directly
-                            diff_image = PILImage.fromarray(diff_heatmap)
-                            
-                            # Store the difference visualization
-                            st.session_state.diff_visualization = diff_image
-                            
-                            # Create an overlay version that shows the original with changes highlighted
-                            overlay_weight = 0.7  # Weight for the original image
-                            highlight_weight = 0.3  # Weight for the highlights
-                            
-                            # Create a mask where significant changes occur
-                            significant_changes = (change_intensity > 50)
-                            
-                            # Start with the after image
-                            overlay = after_array.copy()
-                            
-                            # Add red highlight to areas with significant changes
-                            overlay[significant_changes, 0] = np.clip(overlay[significant_changes, 0] * overlay_weight + 
-                                                                    255 * highlight_weight, 0, 255).astype(np.uint8)
-                            overlay[significant_changes, 1] = np.clip(overlay[significant_changes, 1] * overlay_weight, 0, 255).astype(np.uint8)
-                            overlay[significant_changes, 2] = np.clip(overlay[significant_changes, 2] * overlay_weight, 0, 255).astype(np.uint8)
-                            
-                            # Convert to PIL Image
-                            overlay_image = PILImage.fromarray(overlay)
-                            st.session_state.change_overlay = overlay_image
-                            
-                            # Use the overlay image as the analyzed image
-                            st.session_state.analyzed_image = overlay_image
-                        except Exception as e:
-                            st.error(f"Error generating difference visualization: {str(e)}")
-                            # Fallback to the standard processed image
-                            st.session_state.analyzed_image = after_analyzed
+                                # Detection, change heatmap and overlay for the pair; the heatmap
+                                # and overlay are derived from the change product
+                                results = analyze_image_pair(
+                                    before_image,
+                                    after_image,
+                                    resampling=resampling,
+                                    change_product=product
+                                )
+                            except Exception as e:
+                                st.error(f"Error analyzing the image pair: {str(e)}")
+                                st.stop()
+                            analysis_cache.put(cache_key, results)
+                        
+                        store.put_image("before_analyzed", results["before_analyzed"])
+                        store.put_image("after_analyzed", results["after_analyzed"])
+                        st.session_state.deforested_areas = results["deforested_areas"]
+                        
+                        # Store the difference visualization (blue = minimal, green = moderate,
+                        # red = significant changes)
+                        store.put_image("diff_visualization", results["diff_visualization"])
+                        
+                        # After image with significant changes highlighted in red, used as the analyzed image
+                        store.put_image("change_overlay", results["change_overlay"])
+                        store.put_image("analyzed_image", results["change_overlay"])
                         
                         # Set uploaded_image to after image for compatibility with other components
-                        st.session_state.uploaded_image = st.session_state.after_image
+                        store.put_image("uploaded_image", after_image)
                         
                         # Mark analysis as complete
                         st.session_state.analysis_complete = True
@@ -297,10 +283,10 @@ def upload_section():
             else:
                 st.info("Please upload both 'Before' and 'After' images to enable comparison and analysis.")
                 
-                if 'before_image' not in st.session_state:
+                if 'before_image' not in store:
                     st.warning("'Before' image not yet uploaded.")
                     
-                if 'after_image' not in st.session_state:
+                if 'after_image' not in store:
                     st.warning("'After' image not yet uploaded.")
                 
                 # Show placeholder for comparison
@@ -347,24 +333,24 @@ def upload_section():
                 after_image = PILImage.fromarray(after_array)
                 
                 # Store the images in session state
-                st.session_state.before_image = before_image
-                st.session_state.after_image = after_image
-                st.session_state.uploaded_image = after_image  # For compatibility with other components
+                store.put_image("before_image", before_image)
+                store.put_image("after_image", after_image)
+                store.put_image("uploaded_image", after_image)  # For compatibility with other components
                 
                 # Process the images
                 before_analyzed, _ = process_satellite_image(before_image)
-                after_analyzed, deforested_areas = process_satellite_image(after_image)
+                after_analyzed, deforested_areas = process_satellite_image(after_image, reference_image=before_image)
                 
                 # Store the processed results
-                st.session_state.before_analyzed = before_analyzed
-                st.session_state.after_analyzed = after_analyzed
-                st.session_state.analyzed_image = after_analyzed
+                store.put_image("before_analyzed", before_analyzed)
+                store.put_image("after_analyzed", after_analyzed)
+                store.put_image("analyzed_image", after_analyzed)
                 st.session_state.deforested_areas = deforested_areas
                 st.session_state.analysis_complete = True
                 
                 # Generate timelapse images
                 years = list(range(selected_years['before_year'], selected_years['after_year'] + 1))
-                st.session_state.timelapse_images = {}
+                st.session_state.timelapse_images.clear()
                 
                 for i, year in enumerate(years):
                     # Interpolate between before and after images to simulate progression
@@ -379,10 +365,10 @@ def upload_section():
             # Show a preview of the loaded samples
             col1, col2 = st.columns(2)
             with col1:
-                st.image(before_image, use_container_width=True, 
+                st.image(display_level(before_image, COLUMN_DISPLAY_WIDTH), use_container_width=True, 
                          caption=f"Before ({selected_years['before_year']})")
             with col2:
-                st.image(after_image, use_container_width=True, 
+                st.image(display_level(after_image, COLUMN_DISPLAY_WIDTH), use_container_width=True, 
                          caption=f"After ({selected_years['after_year']})")
 
 
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.alert_index import AlertIndex, viewport_bounds, EARTH_RADIUS_KM
+
+
+def _alerts(count=4000, seed=0):
+    """Alerts spread over the globe, with extra ones near the poles and the antimeridian."""
+    rng = np.random.default_rng(seed)
+    lats = np.degrees(np.arcsin(rng.uniform(-1, 1, count)))
+    lons = rng.uniform(-180, 180, count)
+    lats[:300] = rng.uniform(84, 90, 300)
+    lons[300:600] = (rng.uniform(177, 183, 300) + 180) % 360 - 180
+    lats[300:600] = rng.uniform(-20, 20, 300)
+    return pd.DataFrame({"lat": lats, "lon": lons})
+
+
+def _haversine_km(lat, lon, lats, lons):
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _in_box(alerts, south, west, north, east):
+    lats, lons = alerts["lat"].to_numpy(), alerts["lon"].to_numpy()
+    if west <= east:
+        in_lons = (lons >= west) & (lons <= east)
+    else:
+        in_lons = (lons >= west) | (lons <= east)
+    return np.flatnonzero((lats >= south) & (lats <= north) & in_lons)
+
+
+def _in_polygon(alerts, vertices):
+    """Even-odd rule, one point and one edge at a time."""
+    positions = []
+    for position, (lat, lon) in enumerate(zip(alerts["lat"], alerts["lon"])):
+        inside = False
+        for (lat_a, lon_a), (lat_b, lon_b) in zip(vertices, vertices[1:] + vertices[:1]):
+            if (lat_a > lat) != (lat_b > lat):
+                if lon < lon_a + (lat - lat_a) * (lon_b - lon_a) / (lat_b - lat_a):
+                    inside = not inside
+        if inside:
+            positions.append(position)
+    return np.array(positions, dtype=np.intp)
+
+
+@pytest.fixture(scope="module")
+def alerts():
+    return _alerts()
+
+
+@pytest.fixture(scope="module")
+def index(alerts):
+    return AlertIndex.from_frame(alerts)
+
+
+@pytest.mark.parametrize("box", [
+    (-10, 20, 15, 60),  # Ordinary viewport
+    (-15, 170, 15, -170),  # Across the antimeridian
+    (-5, 179.5, 5, -179.5),  # Narrow, across the antimeridian
+    (80, -180, 90, 180),  # Polar cap
+    (85, 0, 90, 10),  # Wedge touching the pole
+    (-90, -180, 90, 180),  # The whole world
+    (-30, -100, 30, 120),  # Wider than a hemisphere
+])
+def test_bounds_match_brute_force(alerts, index, box):
+    np.testing.assert_array_equal(index.within_bounds(*box), _in_box(alerts, *box))
+
+
+@pytest.mark.parametrize("lat, lon, radius_km", [
+    (0, 179.9, 800), (89.5, 30, 700), (-45, -60, 2500), (10, 10, 0.001), (0, 0, 25000)
+])
+def test_radius_matches_haversine(alerts, index, lat, lon, radius_km):
+    distances = _haversine_km(lat, lon, alerts["lat"].to_numpy(), alerts["lon"].to_numpy())
+
+    np.testing.assert_array_equal(index.within_radius(lat, lon, radius_km), np.flatnonzero(distances <= radius_km))
+
+
+@pytest.mark.parametrize("lat, lon, k", [(0, -179.95, 12), (88, 100, 5), (-30, 45, 1)])
+def test_nearest_matches_haversine(alerts, index, lat, lon, k):
+    distances = _haversine_km(lat, lon, alerts["lat"].to_numpy(), alerts["lon"].to_numpy())
+    expected = np.argsort(distances)[:k]
+
+    positions, distances_km = index.nearest(lat, lon, k=k)
+
+    np.testing.assert_array_equal(positions, expected)
+    assert np.allclose(distances_km, distances[expected], atol=1e-6)
+
+    cutoff = distances[expected[k // 2]]
+    positions, _ = index.nearest(lat, lon, k=k, max_distance_km=cutoff)
+    np.testing.assert_array_equal(positions, expected[:k // 2 + 1])
+
+
+def test_polygons_match_brute_force(alerts, index):
+    concave = [[-20, -40], [30, -40], [30, 40], [-20, 40], [-20, 10], [10, 0], [-20, -10]]
+    triangle = [[0, 0], [0, 60], [60, 0]]
+
+    np.testing.assert_array_equal(index.within_polygon(concave), _in_polygon(alerts, concave))
+    inside = index.within_polygon(triangle + [triangle[0]])
+    lats, lons = alerts["lat"].to_numpy()[inside], alerts["lon"].to_numpy()[inside]
+    assert len(inside) and (lats >= 0).all() and (lons >= 0).all() and (lats + lons <= 60).all()
+    np.testing.assert_array_equal(inside, _in_polygon(alerts, triangle))
+    with pytest.raises(ValueError):
+        index.within_polygon([[0, 0], [1, 1]])
+
+
+def test_empty_index_and_viewports():
+    empty = AlertIndex([], [])
+
+    assert len(empty.within_radius(0, 0, 100)) == 0
+    assert len(empty.nearest(0, 0, k=3)[0]) == 0
+    assert viewport_bounds(0, 0, 0, 1024, 768)[1::2] == (-180.0, 180.0)
+    south, west, north, east = viewport_bounds(0, 175, 4, 1024, 512)
+    assert west > east and south == pytest.approx(-north)
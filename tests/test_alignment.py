@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.alignment import align_pair, resample_image
+
+
+def _smooth(width, height, seed=0):
+    """A smooth gradient with mild noise, like a satellite scene at low zoom."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 / width, y * 255 / height, (x + y) * 127 / (width + height)], axis=2)
+    pixels = np.clip(base + rng.normal(0, 4, base.shape), 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels)
+
+
+def _difference(first, second):
+    return np.abs(np.asarray(first).astype(np.int16) - np.asarray(second).astype(np.int16))
+
+
+def test_integer_downscale_is_block_mean():
+    image = _smooth(120, 90)
+
+    reduced = resample_image(image, (40, 30))
+
+    blocks = np.asarray(image).reshape(30, 3, 40, 3, 3).mean(axis=(1, 3))
+    assert reduced.size == (40, 30)
+    # Pillow rounds the fixed-point block mean, so allow one level of rounding
+    assert np.abs(np.asarray(reduced) - blocks).max() < 1
+    # The original single Lanczos pass gives nearly the same image
+    assert _difference(reduced, image.resize((40, 30), Image.LANCZOS)).mean() < 2
+
+
+@pytest.mark.parametrize("resampling, size", [("lanczos", (71, 53)), ("bilinear", (33, 40))])
+def test_other_downscales_stay_close_to_direct_filter(resampling, size):
+    image = _smooth(200, 150, seed=1)
+    filters = {"lanczos": Image.LANCZOS, "bilinear": Image.BILINEAR}
+
+    resized = resample_image(image, size, resampling)
+
+    difference = _difference(resized, image.resize(size, filters[resampling]))
+    assert difference.mean() < 1.0 and difference.max() <= 8
+
+
+@pytest.mark.parametrize("resampling, size", [("lanczos", (250, 190)), ("nearest", (50, 40)), ("nearest", (300, 200))])
+def test_upscales_and_nearest_match_direct_filter(resampling, size):
+    image = _smooth(100, 80, seed=2)
+    filters = {"lanczos": Image.LANCZOS, "nearest": Image.NEAREST}
+
+    resized = resample_image(image, size, resampling)
+
+    assert np.array_equal(np.asarray(resized), np.asarray(image.resize(size, filters[resampling])))
+
+
+def test_same_size_and_unknown_filter():
+    image = _smooth(30, 20)
+
+    assert resample_image(image, (30, 20)) is image
+    with pytest.raises(ValueError):
+        resample_image(image, (10, 10), "cubic")
+
+
+def test_aligned_image_is_cached_per_pair():
+    before, after = _smooth(90, 60, seed=3), _smooth(180, 120, seed=4)
+
+    first = align_pair(before, after)
+    second = align_pair(before.copy(), after.copy())
+
+    assert second[1] is first[1]
+    assert first[1].size == before.size
+    assert np.array_equal(np.asarray(first[1]), np.asarray(resample_image(after, before.size)))
+    assert align_pair(before, after, "nearest")[1] is not first[1]
@@ -0,0 +1,151 @@
+import io
+import hashlib
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.artifact_store import SessionArtifactStore, ArtifactQuotaError
+
+
+def _noise(width, height, seed=0):
+    """Random RGB image; noise does not compress, so its stored size is predictable."""
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionArtifactStore(max_memory_bytes=200_000, max_disk_bytes=1_000_000,
+                                 spill_threshold_bytes=100_000, root_dir=str(tmp_path))
+    yield store
+    store.clear()
+
+
+def test_small_image_is_compressed_in_memory(store):
+    image = _noise(100, 100)
+    store.put_image("small", image)
+
+    usage = store.usage()
+    assert usage["memory_bytes"] > 0 and usage["disk_bytes"] == 0
+    assert np.array_equal(np.asarray(store.get_image("small")), np.asarray(image))
+
+
+def test_image_above_spill_threshold_goes_to_disk(store):
+    image = _noise(200, 200)  # 120 KB of pixels
+    store.put_image("large", image)
+
+    usage = store.usage()
+    assert usage["memory_bytes"] == 0 and usage["disk_bytes"] >= 120_000
+    assert len(os.listdir(store.directory)) == 1
+    assert np.array_equal(np.asarray(store.get_image("large")), np.asarray(image))
+
+
+def test_memory_overflow_spills_instead_of_failing(store):
+    for i in range(6):
+        store.put_image(f"frame_{i}", _noise(100, 100, seed=i))  # 30 KB each, 180 KB in memory
+    store.put_image("overflow", _noise(100, 100, seed=9))  # Does not fit the 200 KB quota
+
+    usage = store.usage()
+    assert usage["memory_bytes"] <= store.max_memory_bytes
+    assert usage["disk_bytes"] > 0
+
+
+def test_disk_quota_overflow_raises(store):
+    with pytest.raises(ArtifactQuotaError):
+        store.put_image("too_large", _noise(600, 600))  # 1.08 MB on disk
+
+    usage = store.usage()
+    assert "too_large" not in store
+    assert usage["disk_bytes"] == 0
+    assert not os.listdir(store.directory)
+
+
+def test_identical_content_is_shared_until_last_delete(store):
+    image = _noise(100, 100)
+    store.put_image("first", image)
+    memory_after_first = store.usage()["memory_bytes"]
+    store.put_image("second", image.copy())
+
+    assert store.usage()["memory_bytes"] == memory_after_first
+
+    store.delete("first")
+    assert "second" in store
+    assert store.usage()["memory_bytes"] == memory_after_first
+    assert np.array_equal(np.asarray(store.get_image("second")), np.asarray(image))
+
+    store.delete("second")
+    assert store.usage()["memory_bytes"] == 0
+
+
+def test_move_to_disk_keeps_blob_readable(store):
+    image = _noise(100, 100)
+    store.put_image("frame", image)
+    key = store._names["frame"]
+    expected = np.asarray(image).copy()
+    del image
+    store._decoded.clear()
+
+    store.move_to_disk(key)
+
+    usage = store.usage()
+    assert usage["memory_bytes"] == 0 and usage["disk_bytes"] > 0
+    assert np.array_equal(np.asarray(store.get_image("frame")), expected)
+
+
+def _encoded_upload(size_bytes, seed=0):
+    """A valid PNG padded to size_bytes; decoders stop at the image end, like a large real upload."""
+    buffer = io.BytesIO()
+    _noise(64, 48, seed).save(buffer, format="PNG")
+    data = buffer.getvalue()
+    return data + bytes(size_bytes - len(data))
+
+
+def test_upload_larger_than_memory_quota_is_stored_on_disk(tmp_path):
+    store = SessionArtifactStore(root_dir=str(tmp_path))
+    try:
+        store.put_encoded("before_image", _encoded_upload(71 * 2**20))
+
+        usage = store.usage()
+        assert usage["memory_bytes"] == 0 and usage["disk_bytes"] == 71 * 2**20
+        assert store.get_size("before_image") == (64, 48)
+        assert store.get_preview("before_image", 32).width == 32
+        assert np.array_equal(np.asarray(store.get_image("before_image")), np.asarray(_noise(64, 48)))
+    finally:
+        store.clear()
+
+
+def test_two_large_uploads_in_one_session(tmp_path):
+    store = SessionArtifactStore(root_dir=str(tmp_path))
+    try:
+        store.put_encoded("before_image", _encoded_upload(41 * 2**20, seed=1))
+        store.put_encoded("after_image", _encoded_upload(41 * 2**20, seed=2))
+
+        assert "before_image" in store and "after_image" in store
+        assert store.usage()["memory_bytes"] <= store.max_memory_bytes
+        assert np.array_equal(np.asarray(store.get_image("after_image")), np.asarray(_noise(64, 48, seed=2)))
+    finally:
+        store.clear()
+
+
+def test_small_upload_stays_in_memory(store):
+    store.put_encoded("before_image", _encoded_upload(20_000))
+
+    usage = store.usage()
+    assert usage["memory_bytes"] == 20_000 and usage["disk_bytes"] == 0
+
+
+def test_decoded_upload_is_not_hashed_again(store, monkeypatch):
+    data = _encoded_upload(20_000)
+    store.put_encoded("before_image", data, source_id="upload-1")
+    store.get_image("before_image")  # Replaces the encoded file with its pixels
+    assert store._blobs[store._names["before_image"]]["kind"] != "encoded"
+
+    calls = []
+    blake2b = hashlib.blake2b
+    monkeypatch.setattr(hashlib, "blake2b", lambda *args, **kwargs: calls.append(args) or blake2b(*args, **kwargs))
+    store.put_encoded("before_image", data, source_id="upload-1")
+
+    assert calls == []
+    assert np.array_equal(np.asarray(store.get_image("before_image")), np.asarray(_noise(64, 48)))
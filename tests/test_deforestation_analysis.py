@@ -0,0 +1,307 @@
+import zlib
+import warnings
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+from utils.deforestation_analysis import (
+    calculate_forest_coverage, calculate_forest_coverage_batch, calculate_detailed_deforestation_metrics,
+    calculate_bulk_deforestation_metrics, severity_level_index, SEVERITY_LEVELS, SEVERITY_COLORS,
+    WeatherSeriesStore, WEATHER_BLOCK_DAYS, WEATHER_VARIABLES, rollup_weather, _simulate_weather_blocks,
+    _weather_region_params, create_deforestation_projection, simulate_coverage_trajectories, _simulate_log_survival,
+    PROJECTION_SIMULATIONS, PROJECTION_RATE_UNCERTAINTY, PROJECTION_ANNUAL_VOLATILITY, PROJECTION_SHOCK_PROBABILITY,
+    PROJECTION_SHOCK_RATE, PROJECTION_HORIZON_YEARS, PROJECTION_SEED
+)
+
+
+def _scenes(count=4, seed=0):
+    rng = np.random.default_rng(seed)
+    scenes = [rng.integers(0, 256, (37 + 11 * i, 53 - 5 * i, 3), dtype=np.uint8) for i in range(count)]
+    scenes[0][:, :, 1] = 255  # Mostly forest
+    scenes[1][:] = 0  # No forest at all
+    return scenes
+
+
+def _original_coverage(rgb):
+    """The original full-frame rule: green above red, blue and 100."""
+    rgb = rgb.astype(np.int64)
+    is_forest = (rgb[:, :, 1] > rgb[:, :, 0]) & (rgb[:, :, 1] > rgb[:, :, 2]) & (rgb[:, :, 1] > 100)
+    return np.mean(is_forest) * 100
+
+
+def _tile_coverage(rgb, tile_size):
+    """The per-tile formulation: classify each tile on its own."""
+    height, width = rgb.shape[:2]
+    grid = np.zeros((-(-height // tile_size), -(-width // tile_size)))
+    for row, y0 in enumerate(range(0, height, tile_size)):
+        for col, x0 in enumerate(range(0, width, tile_size)):
+            tile = rgb[y0:y0 + tile_size, x0:x0 + tile_size]
+            grid[row, col] = _original_coverage(tile)
+    return grid
+
+
+def test_batch_coverage_matches_single_image():
+    scenes = _scenes()
+
+    coverage = calculate_forest_coverage_batch([Image.fromarray(rgb) for rgb in scenes], scene_ids=list("abcd"),
+                                               chunk_rows=7)
+
+    assert coverage.index.tolist() == list("abcd")
+    assert coverage.tolist() == pytest.approx([_original_coverage(rgb) for rgb in scenes])
+    assert coverage["b"] == 0
+    assert calculate_forest_coverage(Image.fromarray(scenes[2])) == _original_coverage(scenes[2])
+
+
+def test_batch_coverage_of_stacked_array():
+    stack = np.stack([rgb[:37, :38] for rgb in _scenes()])
+
+    coverage = calculate_forest_coverage_batch(stack, chunk_rows=16)
+
+    assert coverage.tolist() == pytest.approx([_original_coverage(rgb) for rgb in stack])
+
+
+@pytest.mark.parametrize("tile_size, chunk_rows", [(8, 20), (16, 5), (64, 64)])
+def test_tile_grids_match_per_tile_coverage(tile_size, chunk_rows):
+    scenes = _scenes(seed=tile_size)
+
+    coverage, grids = calculate_forest_coverage_batch(scenes, tile_size=tile_size, chunk_rows=chunk_rows)
+
+    for scene_id, rgb in enumerate(scenes):
+        assert grids[scene_id].dtype == np.float32
+        assert np.allclose(grids[scene_id], _tile_coverage(rgb, tile_size), atol=1e-4)
+        assert coverage[scene_id] == pytest.approx(_original_coverage(rgb))
+
+
+def test_scene_ids_must_match_images():
+    with pytest.raises(ValueError):
+        calculate_forest_coverage_batch(_scenes(2), scene_ids=["only one"])
+
+
+def _original_severity(annual_rate):
+    """The original if/elif ladder."""
+    if annual_rate <= 0:
+        return "Improving", "#4CAF50"
+    elif annual_rate < 0.5:
+        return "Low", "#8BC34A"
+    elif annual_rate < 1.0:
+        return "Moderate", "#FFC107"
+    elif annual_rate < 2.0:
+        return "High", "#FF9800"
+    return "Critical", "#F44336"
+
+
+def test_severity_index_matches_original_ladder():
+    rates = np.array([-5.0, -0.0, 0.0, 1e-9, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 2.0 - 1e-12, 40.0, np.inf, np.nan])
+
+    index = severity_level_index(rates)
+
+    assert index.shape == rates.shape
+    assert [(SEVERITY_LEVELS[i], SEVERITY_COLORS[i]) for i in index] == [_original_severity(r) for r in rates]
+    assert severity_level_index(0.5) == 2 and severity_level_index(0.5).shape == ()
+
+
+def test_bulk_metrics_match_pairwise_metrics():
+    scenes = _scenes(seed=3)
+    pairs = [(Image.fromarray(scenes[i]), Image.fromarray(scenes[(i + 1) % 4])) for i in range(4)]
+    years = [1, 2, 0.5, 3]
+
+    bulk = calculate_bulk_deforestation_metrics(pairs, time_difference_years=years)
+
+    for pair_id, ((before, after), time_difference) in enumerate(zip(pairs, years)):
+        expected = calculate_detailed_deforestation_metrics(before, after, time_difference)
+        row = bulk.loc[pair_id]
+        assert (row["severity"], row["severity_color"]) == _original_severity(expected["annual_rate"])
+        for name in ("before_coverage", "after_coverage", "percentage_change", "annual_rate", "carbon_impact_tons"):
+            assert row[name] == pytest.approx(expected[name])
+
+
+def _weather_by_day_loop(location, first_block, blocks):
+    """The original per-day loop, fed the same block-seeded draws as the simulator."""
+    base_temp, base_rain, seasonality = _weather_region_params(location)
+    rows = []
+    for block in range(first_block, first_block + blocks):
+        rng = np.random.default_rng([zlib.crc32(location.encode("utf-8")), block])
+        noise = np.column_stack([
+            rng.normal(0, 1.5, WEATHER_BLOCK_DAYS),
+            rng.exponential(10, WEATHER_BLOCK_DAYS),
+            rng.normal(0, 5, WEATHER_BLOCK_DAYS)
+        ])
+        for day, (temp_var, rain_var, humid_var) in enumerate(noise):
+            date = datetime(1970, 1, 1) + timedelta(days=block * WEATHER_BLOCK_DAYS + day)
+            month_factor = np.sin((date.month / 12) * 2 * np.pi)
+            temp = base_temp + 3 * month_factor + temp_var
+            rain = max(0, base_rain + seasonality * month_factor + rain_var)
+            humid = min(100, max(40, 70 + 20 * month_factor + humid_var))
+            rows.append((temp, rain, humid))
+    return np.array(rows)
+
+
+@pytest.mark.parametrize("location", ["Amazon Rainforest, Brazil", "Borneo, Indonesia", "Somewhere Else"])
+def test_weather_simulator_matches_per_day_loop(location):
+    values = _simulate_weather_blocks(location, 300, 3)
+
+    assert values.shape == (3 * WEATHER_BLOCK_DAYS, len(WEATHER_VARIABLES))
+    assert np.allclose(values, _weather_by_day_loop(location, 300, 3))
+
+
+def test_weather_is_reproducible_and_location_specific():
+    store = WeatherSeriesStore()
+    first = store.daily("Congo Basin", date(2020, 1, 1), date(2020, 12, 31))
+    second = WeatherSeriesStore().daily("Congo Basin", date(2020, 1, 1), date(2020, 12, 31))
+    other = store.daily("Amazon Rainforest", date(2020, 1, 1), date(2020, 12, 31))
+
+    assert len(first) == 366 and first["date"].iloc[-1] == pd.Timestamp(2020, 12, 31)
+    pd.testing.assert_frame_equal(first, second)
+    assert not np.allclose(first["temperature"], other["temperature"])
+    assert first["precipitation"].min() >= 0
+    assert first["humidity"].between(40, 100).all()
+
+
+def _drought_months_by_scan(weather_data):
+    """The original row-by-row scan: monthly precipitation sums below 100 mm."""
+    monthly_precip = []
+    current = (weather_data['date'].iloc[0].year, weather_data['date'].iloc[0].month)
+    monthly_sum = 0
+    for _, row in weather_data.iterrows():
+        if (row['date'].year, row['date'].month) == current:
+            monthly_sum += row['precipitation']
+        else:
+            monthly_precip.append(monthly_sum)
+            monthly_sum = row['precipitation']
+            current = (row['date'].year, row['date'].month)
+    monthly_precip.append(monthly_sum)
+    return monthly_precip, sum(total < 100 for total in monthly_precip)
+
+
+@pytest.mark.parametrize("period, freq", [("monthly", "M"), ("seasonal", "Q-NOV")])
+def test_rollup_matches_groupby(period, freq):
+    weather_data = WeatherSeriesStore().daily("Borneo", date(2019, 2, 11), date(2021, 7, 3))
+
+    rollup = rollup_weather(weather_data, period)
+
+    grouped = weather_data.groupby(weather_data['date'].dt.to_period(freq)).agg(
+        temperature=('temperature', 'mean'), precipitation=('precipitation', 'sum'),
+        humidity=('humidity', 'mean'), days=('date', 'size')
+    )
+    assert rollup['date'].tolist() == grouped.index.to_timestamp().tolist()
+    for column in ("temperature", "precipitation", "humidity", "days"):
+        assert np.allclose(rollup[column], grouped[column]), column
+
+    # Without a reference, anomalies are against the same calendar slot over the series
+    slot = grouped.index.month if period == "monthly" else grouped.index.quarter
+    expected_temp = grouped['temperature'].groupby(slot).transform('mean')
+    assert np.allclose(rollup['temperature_anomaly'], grouped['temperature'] - expected_temp)
+
+
+def test_rollup_drought_months_match_row_scan():
+    weather_data = WeatherSeriesStore().daily("Somewhere dry", date(2018, 3, 17), date(2019, 9, 2))
+    weather_data['precipitation'] *= np.where(weather_data['date'].dt.month % 3 == 0, 0.001, 1.0)
+
+    rollup = rollup_weather(weather_data, reference=(22, 1500))
+    monthly_precip, drought_months = _drought_months_by_scan(weather_data)
+
+    assert np.allclose(rollup['precipitation'], monthly_precip)
+    assert int(rollup['drought'].sum()) == drought_months > 0
+    assert np.allclose(rollup['precipitation_anomaly_percent'], (np.array(monthly_precip) - 125) / 125 * 100)
+
+
+def test_extended_series_matches_fresh_simulation():
+    store = WeatherSeriesStore()
+    store.daily("Amazon", date(2020, 5, 1), date(2020, 6, 30))
+    store.daily("Amazon", date(2020, 6, 1), date(2022, 1, 15))  # Appends blocks
+
+    extended = store.daily("Amazon", date(2019, 11, 3), date(2022, 1, 15))  # Prepends blocks
+
+    pd.testing.assert_frame_equal(extended, WeatherSeriesStore().daily("Amazon", date(2019, 11, 3), date(2022, 1, 15)))
+
+
+@pytest.mark.parametrize("period", ["monthly", "seasonal"])
+def test_store_rollup_matches_rollup_of_daily(period):
+    store = WeatherSeriesStore()
+    start, end = date(2019, 1, 20), date(2021, 4, 9)
+
+    rollup = store.rollup("Congo", start, end, period)
+
+    pd.testing.assert_frame_equal(rollup, rollup_weather(store.daily("Congo", start, end), period), check_dtype=False)
+    reference = store.rollup("Congo", start, end, period, reference=(25, 1800))
+    expected = rollup_weather(store.daily("Congo", start, end), period, reference=(25, 1800))
+    pd.testing.assert_frame_equal(reference, expected, check_dtype=False)
+
+
+def test_prepend_recomputes_totals():
+    store = WeatherSeriesStore()
+    store.rollup("Borneo", date(2021, 3, 1), date(2021, 8, 31))
+
+    rollup = store.rollup("Borneo", date(2020, 2, 14), date(2021, 8, 31))
+
+    series = store._series["Borneo"]
+    values = series["values"][:series["length"]]
+    assert np.allclose(series["totals"][1:series["length"] + 1], np.cumsum(values, axis=0))
+    pd.testing.assert_frame_equal(rollup, WeatherSeriesStore().rollup("Borneo", date(2020, 2, 14), date(2021, 8, 31)))
+
+
+def test_empty_range_gives_empty_rollup():
+    store = WeatherSeriesStore()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        rollup = store.rollup("Amazon", date(2020, 1, 10), date(2020, 1, 5))
+        daily_rollup = rollup_weather(store.daily("Amazon", date(2020, 1, 10), date(2020, 1, 5)))
+
+    assert rollup.empty and daily_rollup.empty
+    assert list(rollup.columns) == list(daily_rollup.columns) == list(rollup_weather(store.daily(
+        "Amazon", date(2020, 1, 1), date(2020, 1, 5))).columns)
+
+
+def test_projection_halves_in_34_years_at_two_percent():
+    projection = create_deforestation_projection({"after_coverage": 60.0, "annual_rate": 2.0}, years_to_project=40)
+
+    assert projection["years_to_50_percent"] == 34
+    assert np.allclose(projection["projection_data"]["Current Trend"], 60.0 * 0.98 ** np.arange(41))
+
+    # Without any randomness every trajectory halves in the first full year past 34.3
+    simulation = simulate_coverage_trajectories(60.0, 2.0, 40, simulations=10, rate_uncertainty=0,
+                                                annual_volatility=0, shock_probability=0)
+    assert (simulation["years_to_50_percent"] == 35).all()
+    assert np.allclose(simulation["coverage"], 60.0 * 0.98 ** np.arange(41))
+
+
+def test_projection_percentiles_are_ordered():
+    projection = create_deforestation_projection({"after_coverage": 80.0, "annual_rate": 3.0}, years_to_project=25)
+
+    bands = projection["percentile_bands"]
+    assert (bands["P5"] <= bands["P50"]).all() and (bands["P50"] <= bands["P95"]).all()
+    assert bands["P5"].iloc[-1] < bands["P95"].iloc[-1]
+    years = projection["years_to_50_percent_percentiles"]
+    assert years[5] <= years[50] <= years[95] < np.inf
+
+
+@pytest.mark.parametrize("annual_rate", [0.0, -1.5])
+def test_no_loss_never_halves(annual_rate):
+    projection = create_deforestation_projection({"after_coverage": 50.0, "annual_rate": annual_rate})
+
+    assert projection["years_to_50_percent"] is None
+    assert all(value == np.inf for value in projection["years_to_50_percent_percentiles"].values())
+    assert np.isnan(projection["years_to_50_percent_samples"]).all()
+    assert projection["percentile_bands"][["P5", "P50", "P95"]].to_numpy().max() <= 100
+
+
+def test_draws_are_cached_read_only_and_shared_across_lengths():
+    _simulate_log_survival.cache_clear()
+
+    short = simulate_coverage_trajectories(70.0, 1.2, 10)
+    long = simulate_coverage_trajectories(35.0, 1.2, 60)
+
+    info = _simulate_log_survival.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
+    assert np.allclose(long["coverage"][:, :11] * 2, short["coverage"])
+    np.testing.assert_array_equal(short["years_to_50_percent"], long["years_to_50_percent"])
+    draws = _simulate_log_survival(1.2, PROJECTION_SIMULATIONS, PROJECTION_RATE_UNCERTAINTY,
+                                   PROJECTION_ANNUAL_VOLATILITY, PROJECTION_SHOCK_PROBABILITY,
+                                   PROJECTION_SHOCK_RATE, PROJECTION_HORIZON_YEARS, PROJECTION_SEED)
+    assert not draws.flags.writeable
+    with pytest.raises(ValueError):
+        draws[0, 0] = 1.0
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from utils.diff_kernel import allocate_diff_buffers, abs_diff_sum, threshold_masks
+
+# Mean-intensity thresholds of the original float32 pipeline
+MEAN_THRESHOLDS = (30, 80, 50)
+
+
+def _pair(shape=(61, 47, 3), seed=0):
+    rng = np.random.default_rng(seed)
+    before = rng.integers(0, 256, shape, dtype=np.uint8)
+    after = rng.integers(0, 256, shape, dtype=np.uint8)
+    after[:5] = before[:5]  # No change
+    before[5, :, :] = 0
+    after[5, :, :] = 255  # Largest possible change, 765
+    return before, after
+
+
+def _float_baseline(before, after):
+    """The original float32 pipeline: absolute difference, channel sum and thresholds."""
+    diff = np.abs(before.astype(np.float32) - after.astype(np.float32))
+    intensity = np.sum(diff, axis=2) / 3
+    return diff, intensity, [intensity > threshold for threshold in MEAN_THRESHOLDS]
+
+
+def test_matches_float_pipeline():
+    before, after = _pair()
+    diff, intensity, masks = _float_baseline(before, after)
+    channel_diff = np.empty_like(before)
+
+    change_sum = abs_diff_sum(before, after, channel_diff=channel_diff)
+
+    assert change_sum.dtype == np.uint16
+    assert np.array_equal(change_sum, np.sum(diff, axis=2))
+    assert np.array_equal(channel_diff, diff)
+    assert change_sum.max() == 765 and change_sum[:5].max() == 0
+    assert np.allclose(change_sum / 3, intensity)
+    thresholded = threshold_masks(change_sum, [3 * threshold for threshold in MEAN_THRESHOLDS])
+    assert thresholded.shape == (3,) + change_sum.shape
+    for mask, expected in zip(thresholded, masks):
+        assert np.array_equal(mask, expected)
+
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_reused_buffers_give_fresh_results(seed):
+    before, after = _pair(seed=seed)
+    buffers = allocate_diff_buffers(before.shape[:2])
+    abs_diff_sum(after, before[::-1].copy(), buffers)
+    out = np.ones((2,) + before.shape[:2], dtype=bool)
+
+    change_sum = abs_diff_sum(before, after, buffers)
+    masks = threshold_masks(change_sum, (0, 300), out=out)
+
+    assert change_sum is buffers["change_sum"] and masks is out
+    assert np.array_equal(change_sum, np.sum(_float_baseline(before, after)[0], axis=2))
+    assert np.array_equal(masks[1], change_sum > 300)
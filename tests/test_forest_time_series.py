@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import forest_time_series
+from utils.forest_time_series import generate_forest_time_series, TIME_SERIES_METRICS
+
+
+def test_multi_region_frame_layout():
+    regions = ["Amazon Rainforest", "Borneo", "Unlisted Forest"]
+
+    frame = generate_forest_time_series(regions, seed=1)
+
+    dates = pd.date_range("2000-01-01", "2022-12-31", freq="QS")
+    assert len(dates) == 92 and len(frame) == 3 * 92
+    assert isinstance(frame["region"].dtype, pd.CategoricalDtype)
+    assert list(frame["region"].cat.categories) == regions
+    for region, group in frame.groupby("region", observed=True):
+        assert group["date"].tolist() == dates.tolist()
+    assert all(frame[name].dtype == np.float32 for name in TIME_SERIES_METRICS)
+    assert frame["forest_cover"].between(0, 100).all() and (frame["logging_activity"] >= 0).all()
+    # Regions follow their own profiles
+    first = frame.groupby("region", observed=True)["forest_cover"].first()
+    assert first["Amazon Rainforest"] == pytest.approx(95, abs=1.5)
+    assert first["Unlisted Forest"] == pytest.approx(88, abs=1.5)
+
+
+@pytest.mark.parametrize("resolution, freq, length", [("monthly", "MS", 24), ("weekly", "W-MON", 104), ("daily", "D", 731)])
+def test_resolutions(resolution, freq, length):
+    frame = generate_forest_time_series(["Borneo"], "2019-01-01", "2020-12-31", resolution=resolution, seed=2)
+
+    assert len(frame) == length
+    assert frame["date"].tolist() == pd.date_range("2019-01-01", "2020-12-31", freq=freq).tolist()
+    # The yearly trend is the same whatever the sampling
+    cover = frame["forest_cover"].to_numpy()
+    assert cover[-length // 4:].mean() - cover[:length // 4].mean() == pytest.approx(-1.1 * 1.5, abs=0.3)
+
+
+def test_events_apply_to_first_sample_on_or_after_their_date(monkeypatch):
+    profile = {
+        "start_value": 80.0, "yearly_change": -1.2, "variation": 0.0,
+        "events": {"2010-01-10": -0.5, "2010-03-15": -2.0, "2010-06-01": -1.0, "1999-01-01": -7.0, "2030-01-01": -9.0}
+    }
+    monkeypatch.setitem(forest_time_series.REGION_PROFILES, "Test Forest", profile)
+
+    frame = generate_forest_time_series(["Test Forest"], "2010-01-05", "2010-12-31", resolution="monthly", seed=3)
+
+    years_passed = (np.arange(11) / 12).astype(np.float32)
+    expected = (np.float32(80.0) + np.float32(-1.2) * years_passed
+                + 0.2 * np.sin(2 * np.pi * years_passed)).astype(np.float32)
+    expected[0] -= 0.5  # Samples start on 2010-02-01
+    expected[2] -= 2.0  # 2010-03-15 falls to April
+    expected[4] -= 1.0  # Exactly on the June sample
+    assert np.allclose(frame["forest_cover"].to_numpy(), expected, atol=1e-5)
+
+
+def test_seed_and_resolution_checks():
+    first = generate_forest_time_series(["Congo Basin"], seed=4)
+
+    pd.testing.assert_frame_equal(first, generate_forest_time_series(["Congo Basin"], seed=4))
+    with pytest.raises(ValueError):
+        generate_forest_time_series(["Congo Basin"], resolution="hourly")
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from utils.heat_aggregation import bin_heat_points, _square_cells, _hex_cells
+
+
+def _strip_and_box(count=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "parallel": (np.zeros(count), rng.uniform(-50, 50, count)),  # 100 degrees along the equator
+        "meridian": (rng.uniform(-60, 60, count), np.full(count, 20.0)),
+        "box": (rng.uniform(-10, 10, count), rng.uniform(-50, 50, count)),
+        "cluster": (rng.normal(0, 1e-4, count), rng.normal(0, 1e-4, count))
+    }
+
+
+@pytest.mark.parametrize("cells", [_square_cells, _hex_cells])
+@pytest.mark.parametrize("layout", ["parallel", "meridian", "box", "cluster"])
+def test_grid_size_is_bounded(cells, layout):
+    lats, lons = _strip_and_box()[layout]
+
+    ids, cell_count = cells(lats, lons, 2000)
+
+    assert cell_count <= 3 * 2000
+    assert ids.min() >= 0 and ids.max() < cell_count
+
+
+@pytest.mark.parametrize("grid", ["square", "hex"])
+@pytest.mark.parametrize("layout", ["parallel", "box"])
+def test_binned_weight_is_preserved(grid, layout):
+    lats, lons = _strip_and_box()[layout]
+    weights = np.random.default_rng(1).uniform(0, 2, len(lats))
+
+    rows = np.array(bin_heat_points(lats, lons, weights, grid=grid, normalize=False))
+
+    assert len(rows) <= 2000
+    assert rows[:, 2].sum() == pytest.approx(weights.sum())
+
+
+@pytest.mark.parametrize("grid, cells", [("square", _square_cells), ("hex", _hex_cells)])
+def test_cells_are_weighted_centroids(grid, cells):
+    rng = np.random.default_rng(2)
+    lats, lons = rng.uniform(40, 41, 500), rng.uniform(-3, -1, 500)
+    weights = rng.uniform(0, 1, 500)
+    weights[:50] = 0  # Some cells may carry no weight at all
+
+    rows = bin_heat_points(lats, lons, weights, max_points=40, grid=grid, normalize=False)
+
+    ids, _ = cells(lats, lons, 40)
+    expected = []
+    for cell in np.unique(ids):
+        members = ids == cell
+        total = weights[members].sum()
+        centroid_weights = weights[members] if total > 0 else np.ones(members.sum())
+        expected.append([
+            round(np.average(lats[members], weights=centroid_weights), 5),
+            round(np.average(lons[members], weights=centroid_weights), 5),
+            total
+        ])
+    expected = sorted(expected, key=lambda row: -row[2])[:40]
+    assert len(rows) == len(expected)
+    assert np.allclose(sorted(rows), sorted(expected))
+
+
+def test_small_inputs_pass_through_unchanged():
+    lats, lons, weights = [1.234567891, -5.0], [10.0, 20.000001], [0.4, 7.5]
+
+    rows = bin_heat_points(lats, lons, weights)
+
+    assert rows == [[1.23457, 10.0, 0.4], [-5.0, 20.0, 7.5]]
+    assert bin_heat_points([], []) == []
+
+
+def test_binned_weights_are_normalized():
+    lats, lons = _strip_and_box()["box"]
+
+    rows = np.array(bin_heat_points(lats, lons, grid="hex"))
+
+    assert rows[:, 2].max() == 1.0
+    with pytest.raises(ValueError):
+        bin_heat_points(lats, lons, grid="triangle")
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils import alignment, image_pyramid
+from utils.artifact_store import SessionArtifactStore
+from utils.map_cache import MapCache
+from utils.memory_budget import memory_budget, MemoryBudget
+from utils.result_cache import AnalysisCache
+
+
+def _noise(width, height, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+@pytest.fixture
+def budget_limit():
+    """Set the global budget ceiling for one test and restore it afterwards."""
+    limit = memory_budget.max_bytes
+    yield memory_budget.set_limit
+    memory_budget.set_limit(limit)
+
+
+def test_least_recently_used_is_evicted_first():
+    budget = MemoryBudget(max_bytes=100)
+    evicted = []
+    budget.register("a", "first", 40, lambda: evicted.append("first"))
+    budget.register("b", "second", 40, lambda: evicted.append("second"))
+    budget.touch("a", "first")
+    budget.register("a", "third", 40, lambda: evicted.append("third"))
+
+    assert evicted == ["second"]
+    assert budget.usage()["sessions"] == {"a": 80}
+
+
+def test_global_budget_evicts_to_disk(tmp_path, budget_limit):
+    store = SessionArtifactStore(max_memory_bytes=200_000, max_disk_bytes=1_000_000,
+                                 spill_threshold_bytes=100_000, root_dir=str(tmp_path))
+    try:
+        budget_limit(40_000)
+        store.put_image("first", _noise(100, 100, seed=1))
+        store.put_image("second", _noise(100, 100, seed=2))  # Pushes the first one out of memory
+
+        first = store._blobs[store._names["first"]]
+        second = store._blobs[store._names["second"]]
+        assert first["memory_bytes"] == 0 and first["disk_bytes"] > 0
+        assert second["memory_bytes"] > 0
+    finally:
+        store.clear()
+
+
+def test_aligned_images_count_toward_budget(budget_limit):
+    budget_limit(40_000)
+    alignment.align_pair(_noise(100, 100, seed=1), _noise(50, 50, seed=2))
+    assert memory_budget.usage()["sessions"]["alignment_cache"] == 30_000
+
+    alignment.align_pair(_noise(100, 100, seed=3), _noise(50, 50, seed=4))  # Evicts the first pair
+
+    assert len(alignment._aligned) == 1
+    assert alignment._aligned_bytes == memory_budget.usage()["sessions"]["alignment_cache"] == 30_000
+
+
+def test_pyramids_count_toward_budget(budget_limit):
+    image_pyramid.clear_pyramid_cache()
+    budget_limit(10**9)
+    image_pyramid.get_pyramid(_noise(1024, 64, seed=1))
+    assert memory_budget.usage()["sessions"]["pyramid_cache"] == image_pyramid._pyramid_bytes > 0
+
+    budget_limit(0)
+    assert not image_pyramid._pyramids and image_pyramid._pyramid_bytes == 0
+    assert "pyramid_cache" not in memory_budget.usage()["sessions"]
+
+
+def test_analysis_results_are_evicted_from_memory_only(tmp_path, budget_limit):
+    cache = AnalysisCache(cache_dir=str(tmp_path / "cache"))
+    result = {"mask": np.ones((100, 100), dtype=np.uint8)}
+    budget_limit(10**9)
+    cache.put("first", result)
+    cache.put("second", result)
+    assert memory_budget.usage()["sessions"][cache.budget_id] == cache.stats()["memory_bytes"]
+
+    budget_limit(cache.stats()["memory_bytes"] // 2)  # Room for one entry
+
+    assert cache.stats()["memory_entries"] == 1
+    assert np.array_equal(cache.get("first")["mask"], result["mask"])
+    assert cache.stats()["disk_hits"] == 1
+
+    cache.clear()
+    assert cache.budget_id not in memory_budget.usage()["sessions"]
+
+
+def test_map_pages_count_toward_budget(budget_limit):
+    class Page:
+        def __init__(self, html):
+            self.html = html
+
+        def get_root(self):
+            return self
+
+        def render(self):
+            return self.html
+
+    cache = MapCache()
+    budget_limit(10**9)
+    cache.get(Page, html="a" * 1000)
+    cache.get(Page, html="b" * 1000)
+    assert memory_budget.usage()["sessions"][cache.budget_id] == 2000
+
+    budget_limit(1500)
+
+    assert cache.stats()["entries"] == 1 and cache.stats()["bytes"] == 1000
+    assert cache.get(Page, html="b" * 1000) == "b" * 1000
+    assert cache.stats()["hits"] == 1
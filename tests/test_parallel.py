@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+from PIL import Image
+from scipy import ndimage
+
+from utils import parallel
+from utils.vegetation import excess_green, vegetation_mask, detect_deforestation_regions
+
+
+def _same_partition(labels, expected):
+    """Return True when two label arrays split the pixels into the same regions."""
+    if not np.array_equal(labels > 0, expected > 0):
+        return False
+    pairs = np.unique(np.stack([labels[labels > 0], expected[expected > 0]]), axis=1)
+    # Each region maps to exactly one expected region and vice versa
+    return len(np.unique(pairs[0])) == len(np.unique(pairs[1])) == pairs.shape[1]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def shutdown_pool():
+    yield
+    parallel.shutdown_executor()
+
+
+@pytest.mark.parametrize("density, workers", [(0.3, 2), (0.5, 3), (0.6, 4), (0.0, 3)])
+def test_parallel_label_matches_ndimage(monkeypatch, density, workers):
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_PIXELS", 0)
+    rng = np.random.default_rng(int(density * 10) + workers)
+    mask = rng.random((97, 61)) < density
+
+    labels, num_regions = parallel.parallel_label(mask, workers=workers)
+    expected, expected_regions = ndimage.label(mask, structure=np.ones((3, 3), dtype=bool))
+
+    assert num_regions == expected_regions
+    assert _same_partition(labels, expected)
+    assert set(np.unique(labels)) <= set(range(num_regions + 1))
+
+
+def test_parallel_label_merges_regions_across_bands(monkeypatch):
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_PIXELS", 0)
+    mask = np.zeros((40, 20), dtype=bool)
+    mask[:, 5] = True  # One column crossing every band
+    mask[np.arange(40), np.arange(40) % 20] = True  # A diagonal touching only by corners
+
+    labels, num_regions = parallel.parallel_label(mask, workers=4)
+    expected, expected_regions = ndimage.label(mask, structure=np.ones((3, 3), dtype=bool))
+
+    assert num_regions == expected_regions
+    assert _same_partition(labels, expected)
+
+
+def test_parallel_label_edge_connectivity(monkeypatch):
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_PIXELS", 0)
+    mask = np.random.default_rng(7).random((80, 50)) < 0.55
+
+    labels, num_regions = parallel.parallel_label(mask, workers=3, connectivity=4)
+    expected, expected_regions = ndimage.label(mask)
+
+    assert num_regions == expected_regions
+    assert _same_partition(labels, expected)
+
+
+def _forest_pair(seed=5, height=150, width=110):
+    """A green scene with clearings that cross band and tile edges."""
+    rng = np.random.default_rng(seed)
+    before = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    before[:, :, 1] = np.maximum(before[:, :, 1], 180)
+    before[:, :, [0, 2]] //= 2
+    after = before.copy()
+    after[30:120, 20:50] = (150, 110, 80)
+    after[rng.random((height, width)) < 0.1] = (160, 120, 90)
+    return Image.fromarray(before), Image.fromarray(after)
+
+
+def test_parallel_vegetation_loss_matches_serial(monkeypatch):
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_PIXELS", 0)
+    before, after = _forest_pair()
+    before_rgb, after_rgb = np.asarray(before), np.asarray(after)
+
+    index_drop, loss_mask = parallel.parallel_vegetation_loss(before, after, workers=3, tile_size=32)
+
+    assert np.array_equal(index_drop, excess_green(before_rgb) - excess_green(after_rgb))
+    assert np.array_equal(loss_mask, detect_deforestation_regions(before, after)[1])
+    assert np.array_equal(loss_mask, vegetation_mask(before_rgb) & ~vegetation_mask(after_rgb) & (index_drop >= 40))
+
+
+def test_parallel_regions_match_serial(monkeypatch):
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_PIXELS", 0)
+    before, after = _forest_pair(seed=6)
+    serial_regions, serial_mask = detect_deforestation_regions(before, after, min_region_pixels=5)
+
+    regions, loss_mask = parallel.parallel_detect_deforestation_regions(before, after, min_region_pixels=5, workers=3)
+
+    def key(region):
+        return -region["pixels"], region["y1"], region["x1"]
+
+    assert np.array_equal(loss_mask, serial_mask)
+    assert len(regions) == len(serial_regions) > 1
+    for region, expected in zip(sorted(regions, key=key), sorted(serial_regions, key=key)):
+        assert region["confidence"] == pytest.approx(expected.pop("confidence"))
+        assert {name: value for name, value in region.items() if name != "confidence"} == expected
+
+
+def test_pool_does_not_fork(monkeypatch):
+    methods = []
+    get_context = parallel.multiprocessing.get_context
+
+    def recording_get_context(method=None):
+        methods.append(method)
+        return get_context(method)
+
+    parallel.shutdown_executor()
+    monkeypatch.setattr(parallel.multiprocessing, "get_context", recording_get_context)
+    parallel.get_executor(2)
+
+    assert methods == [parallel.POOL_START_METHOD]
+    assert parallel.POOL_START_METHOD in ("forkserver", "spawn")
+
+
+def test_pool_only_grows():
+    parallel.shutdown_executor()
+    larger = parallel.get_executor(3)
+
+    assert parallel.get_executor(2) is larger
+    assert parallel.get_executor(4) is not larger
+    assert parallel.get_executor(3) is parallel.get_executor(4)
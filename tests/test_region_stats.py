@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from utils.region_stats import compute_region_stats, summarize_region_stats, REGION_STATS_COLUMNS
+
+
+def _stats_by_loop(labels, intensity):
+    """The per-region formulation: one full-frame comparison per label."""
+    padded = np.pad(labels, 1)
+    rows = []
+    for region_id, box in enumerate(ndimage.find_objects(labels), start=1):
+        if box is None:
+            continue
+        region = labels == region_id
+        inside = np.pad(region, 1)
+        # Pixel edges between the region and anything else, including the border
+        perimeter = sum(int((inside & (np.roll(padded, shift, axis) != region_id)).sum())
+                        for shift in (1, -1) for axis in (0, 1))
+        centroid_y, centroid_x = ndimage.center_of_mass(region)
+        rows.append({
+            "label": region_id,
+            "area": int(region.sum()),
+            "x1": box[1].start, "y1": box[0].start, "x2": box[1].stop - 1, "y2": box[0].stop - 1,
+            "centroid_x": centroid_x,
+            "centroid_y": centroid_y,
+            "mean_intensity": intensity[region].mean(),
+            "perimeter": perimeter
+        })
+    return sorted(rows, key=lambda row: -row["area"])
+
+
+@pytest.mark.parametrize("connectivity", [4, 8])
+def test_matches_per_region_loop(connectivity):
+    rng = np.random.default_rng(connectivity)
+    mask = rng.random((83, 71)) < 0.45
+    structure = np.ones((3, 3), dtype=bool) if connectivity == 8 else None
+    labels, num_regions = ndimage.label(mask, structure=structure)
+    intensity = rng.integers(0, 766, mask.shape)
+
+    table = compute_region_stats(labels, num_regions, intensity=intensity)
+    expected = _stats_by_loop(labels, intensity)
+
+    assert list(table.columns) == REGION_STATS_COLUMNS
+    assert table["area"].tolist() == [row["area"] for row in expected]
+    by_label = table.set_index("label")
+    for row in expected:
+        actual = by_label.loc[row["label"]]
+        for column in ("area", "x1", "y1", "x2", "y2", "perimeter"):
+            assert actual[column] == row[column], column
+        for column in ("centroid_x", "centroid_y", "mean_intensity"):
+            assert actual[column] == pytest.approx(row[column], rel=1e-6), column
+
+
+def test_missing_labels_are_skipped():
+    labels = np.zeros((6, 6), dtype=np.int32)
+    labels[1:3, 1:4] = 1
+    labels[4, 0:6] = 3
+
+    table = compute_region_stats(labels)
+
+    assert table["label"].tolist() == [1, 3]
+    assert table[["x1", "y1", "x2", "y2"]].values.tolist() == [[1, 1, 3, 2], [0, 4, 5, 4]]
+    assert table["perimeter"].tolist() == [10, 14]
+    assert np.isnan(table["mean_intensity"]).all()
+
+
+def test_empty_labels():
+    table = compute_region_stats(np.zeros((4, 4), dtype=np.int32))
+
+    assert table.empty and list(table.columns) == REGION_STATS_COLUMNS
+    assert summarize_region_stats(table)["num_regions"] == 0
@@ -0,0 +1,55 @@
+import os
+import pickle
+
+import numpy as np
+from PIL import Image
+
+from utils.result_cache import AnalysisCache, encode_result, decode_result
+
+
+def _result():
+    return {
+        "image": Image.fromarray(np.arange(48, dtype=np.uint8).reshape(4, 4, 3)),
+        "areas": [{"x1": 1, "confidence": np.float64(0.75)}],
+        "mask": np.eye(3, dtype=bool),
+        "label": None
+    }
+
+
+def test_round_trip_without_pickle():
+    decoded = decode_result(encode_result(_result()))
+
+    assert np.array_equal(np.asarray(decoded["image"]), np.asarray(_result()["image"]))
+    assert decoded["areas"] == [{"x1": 1, "confidence": 0.75}]
+    assert np.array_equal(decoded["mask"], np.eye(3, dtype=bool))
+    assert decoded["label"] is None
+
+
+def test_disk_hit_after_restart(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    AnalysisCache(cache_dir=cache_dir).put("key", _result())
+
+    cache = AnalysisCache(cache_dir=cache_dir)
+    assert cache.get("key")["areas"][0]["x1"] == 1
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_foreign_entry_is_dropped(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    os.makedirs(cache_dir, mode=0o700)
+    with open(os.path.join(cache_dir, "key.npz"), "wb") as f:
+        f.write(pickle.dumps({"not": "an archive"}))
+
+    cache = AnalysisCache(cache_dir=cache_dir)
+    assert cache.get("key") is None
+    assert not os.path.exists(os.path.join(cache_dir, "key.npz"))
+
+
+def test_shared_directory_is_not_used(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+
+    cache = AnalysisCache(cache_dir=str(shared))
+    assert cache.cache_dir != str(shared)
+    assert os.stat(cache.cache_dir).st_mode & 0o077 == 0
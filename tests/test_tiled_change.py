@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from PIL import Image
+from scipy import ndimage
+
+from utils import parallel
+from utils.tiled_change import detect_changes_tiled, process_change_tile
+from utils.change_product import build_change_product, SIGNIFICANT_CHANGE_SUM
+from utils.region_stats import compute_region_stats
+
+
+def _pair(width=203, height=157, seed=0):
+    """A pair with smooth structure plus noise, so tiles see both strong and weak change."""
+    rng = np.random.default_rng(seed)
+    before = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    after = before.copy()
+    after[20:90, 30:150] = rng.integers(0, 256, (70, 120, 3), dtype=np.uint8)
+    after[100:140, 10:60] //= 3
+    return Image.fromarray(before), Image.fromarray(after)
+
+
+def _full_frame_stats(before, after):
+    """The full-frame statistics the change product used to compute in one pass."""
+    before, after = np.asarray(before), np.asarray(after)
+    diff = np.abs(before.astype(np.int16) - after.astype(np.int16))
+    return {
+        "before_green_mean": before[:, :, 1].mean(),
+        "after_green_mean": after[:, :, 1].mean(),
+        "before_blue_mean": before[:, :, 2].mean(),
+        "after_blue_mean": after[:, :, 2].mean(),
+        "total_diff": int(diff.sum()),
+        "max_channel_diff": int(diff.max()),
+        "horizontal_edges": int(np.abs(diff[1:] - diff[:-1]).sum()),
+        "vertical_edges": int(np.abs(diff[:, 1:] - diff[:, :-1]).sum())
+    }
+
+
+@pytest.fixture(scope="module", autouse=True)
+def shutdown_pool():
+    yield
+    parallel.shutdown_executor()
+
+
+@pytest.mark.parametrize("tile_size", [16, 37, 64, 1024])
+def test_tiled_matches_full_frame(tile_size):
+    before, after = _pair()
+    heatmap, overlay, mask, change_sum = process_change_tile(np.asarray(before), np.asarray(after))
+
+    tiled = detect_changes_tiled(before, after, tile_size=tile_size)
+
+    assert np.array_equal(tiled["heatmap"], heatmap)
+    assert np.array_equal(tiled["overlay"], overlay)
+    assert np.array_equal(tiled["mask"], mask)
+    assert np.array_equal(tiled["change_sum"], change_sum)
+    assert tiled["significant_pixels"] == int(mask.sum())
+    assert tiled["stats"] == pytest.approx(_full_frame_stats(before, after))
+
+
+def test_tiled_writes_memory_mapped_outputs(tmp_path):
+    before, after = _pair()
+    in_memory = detect_changes_tiled(before, after, tile_size=37)
+
+    mapped = detect_changes_tiled(before, after, tile_size=37, output_dir=str(tmp_path))
+
+    for name in ("heatmap", "overlay", "mask", "change_sum"):
+        assert isinstance(mapped[name], np.memmap)
+        assert np.array_equal(np.load(tmp_path / f"{name}.npy"), in_memory[name])
+
+
+def test_parallel_matches_tiled(monkeypatch, tmp_path):
+    monkeypatch.setattr(parallel, "MIN_PARALLEL_PIXELS", 0)
+    before, after = _pair()
+    tiled = detect_changes_tiled(before, after, tile_size=37)
+
+    result = parallel.parallel_change_detection(before, after, workers=2, tile_size=37, output_dir=str(tmp_path))
+
+    for name in ("heatmap", "overlay", "mask", "change_sum"):
+        assert np.array_equal(result[name], tiled[name])
+    assert result["significant_pixels"] == tiled["significant_pixels"]
+    assert result["stats"] == pytest.approx(tiled["stats"])
+
+
+def test_change_product_matches_full_frame(tmp_path):
+    before, after = _pair(seed=3)
+    change_sum = np.abs(np.asarray(before).astype(np.int16) - np.asarray(after).astype(np.int16)).sum(axis=2)
+    labels, num_regions = ndimage.label(change_sum > SIGNIFICANT_CHANGE_SUM)
+    region_stats = compute_region_stats(labels, num_regions, intensity=change_sum)
+
+    product = build_change_product(before, after, output_dir=str(tmp_path))
+
+    assert np.array_equal(product["change_sum"], change_sum)
+    assert product["num_regions"] == num_regions
+    assert np.array_equal(product["region_stats"]["area"], region_stats["area"])
+    assert np.allclose(product["region_stats"]["mean_intensity"], region_stats["mean_intensity"] / 3)
+    assert product["stats"]["significant_pixels"] == int((change_sum > SIGNIFICANT_CHANGE_SUM).sum())
+    assert product["stats"] == pytest.approx({
+        **_full_frame_stats(before, after),
+        "significant_pixels": product["stats"]["significant_pixels"],
+        "total_pixels": change_sum.size
+    })
@@ -0,0 +1,84 @@
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+
+from utils.vegetation import excess_green, vegetation_mask, detect_deforestation_regions, detect_cleared_regions
+from utils.deforestation_analysis import calculate_forest_coverage
+
+
+def _scene(seed, height=120, width=160):
+    rng = np.random.default_rng(seed)
+    rgb = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    rgb[10:70, 20:100, 1] = 220  # A green patch
+    rgb[10:70, 20:100, [0, 2]] //= 2
+    return rgb
+
+
+def _regions_by_loop(mask, strength, min_region_pixels, pixel_size_m=10):
+    """The per-region formulation: one full-frame comparison per 8-connected label."""
+    labels, num_regions = ndimage.label(mask, structure=np.ones((3, 3), dtype=bool))
+    regions = []
+    for region_id in range(1, num_regions + 1):
+        region = labels == region_id
+        pixels = int(region.sum())
+        if pixels < min_region_pixels:
+            continue
+        rows, cols = np.nonzero(region)
+        mean_strength = strength[region].mean()
+        regions.append({
+            "x1": int(cols.min()), "y1": int(rows.min()), "x2": int(cols.max()), "y2": int(rows.max()),
+            "pixels": pixels,
+            "confidence": 0.5 + 0.49 * float(np.clip(mean_strength / 255.0, 0.0, 1.0)),
+            "area_km2": round(pixels * pixel_size_m ** 2 / 1e6, 4)
+        })
+    return regions
+
+
+def _by_size(regions):
+    return sorted(regions, key=lambda region: (-region["pixels"], region["y1"], region["x1"]))
+
+
+def test_excess_green_matches_float_formula():
+    rgb = np.array([[[0, 255, 0], [255, 0, 255], [12, 34, 56], [255, 255, 255]]], dtype=np.uint8)
+    expected = 2 * rgb[:, :, 1].astype(float) - rgb[:, :, 0] - rgb[:, :, 2]
+
+    assert np.array_equal(excess_green(rgb), expected)
+
+
+def test_vegetation_mask_matches_coverage_rule():
+    rgb = _scene(1)
+    expected = (rgb[:, :, 1] > rgb[:, :, 0]) & (rgb[:, :, 1] > rgb[:, :, 2]) & (rgb[:, :, 1] > 100)
+
+    assert np.array_equal(vegetation_mask(rgb), expected)
+    assert calculate_forest_coverage(Image.fromarray(rgb)) == expected.mean() * 100
+
+
+def test_deforestation_regions_match_per_region_loop():
+    before = _scene(2)
+    after = before.copy()
+    after[20:50, 30:60] = (140, 90, 60)  # Cleared inside the green patch
+    after[55:65, 80:95] = (150, 100, 90)
+
+    regions, loss_mask = detect_deforestation_regions(Image.fromarray(before), Image.fromarray(after),
+                                                      min_region_pixels=20)
+
+    index_drop = excess_green(before).astype(int) - excess_green(after)
+    expected_mask = vegetation_mask(before) & ~vegetation_mask(after) & (index_drop >= 40)
+    assert np.array_equal(loss_mask, expected_mask)
+
+    expected = _by_size(_regions_by_loop(expected_mask, index_drop, 20))
+    assert [region["pixels"] for region in regions] == [region["pixels"] for region in expected]
+    assert len(expected) >= 2
+    for region, expected_region in zip(_by_size(regions), expected):
+        assert np.isclose(region.pop("confidence"), expected_region.pop("confidence"))
+        assert region == expected_region
+
+
+def test_cleared_regions_are_non_forest_patches():
+    rgb = np.zeros((60, 60, 3), dtype=np.uint8)
+    rgb[:, :, 1] = 200
+    rgb[10:30, 10:40] = (180, 120, 90)
+
+    regions = detect_cleared_regions(Image.fromarray(rgb), min_region_pixels=10)
+
+    assert [(r["x1"], r["y1"], r["x2"], r["y2"], r["pixels"]) for r in regions] == [(10, 10, 39, 29, 600)]
@@ -0,0 +1,235 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Mean Earth radius (km) used to convert between chord and great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Width in pixels of a Web Mercator tile, which sets the scale of each zoom level
+TILE_SIZE_PX = 256
+
+# Points per k-d tree leaf; larger leaves build faster, smaller ones query faster
+ALERT_INDEX_LEAF_SIZE = 32
+
+
+def _unit_vectors(lats, lons):
+    """Convert degrees to (n, 3) points on the unit sphere."""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def _chord(distance_km):
+    """Straight-line distance through the unit sphere for a great-circle distance."""
+    angle = np.minimum(np.asarray(distance_km, dtype=np.float64) / EARTH_RADIUS_KM, np.pi)
+    return 2 * np.sin(angle / 2)
+
+
+def _great_circle_km(chord):
+    """Great-circle distance for a straight-line distance through the unit sphere."""
+    return 2 * np.arcsin(np.minimum(np.asarray(chord, dtype=np.float64) / 2, 1.0)) * EARTH_RADIUS_KM
+
+
+def viewport_bounds(center_lat, center_lon, zoom, width_px, height_px):
+    """
+    Approximate the latitude/longitude box shown by a Web Mercator map.
+
+    Parameters:
+    -----------
+    center_lat : float
+        Latitude of the map center
+    center_lon : float
+        Longitude of the map center
+    zoom : int
+        Zoom level of the map
+    width_px : int
+        Width of the map in pixels
+    height_px : int
+        Height of the map in pixels
+
+    Returns:
+    --------
+    tuple
+        (south, west, north, east) in degrees, for AlertIndex.within_bounds
+    """
+    world_px = TILE_SIZE_PX * 2 ** zoom
+    half_width = min(width_px / world_px * 180, 180)
+    center_y = np.arctanh(np.sin(np.radians(center_lat)))
+    half_height = height_px / world_px * np.pi
+    south = np.degrees(np.arcsin(np.tanh(center_y - half_height)))
+    north = np.degrees(np.arcsin(np.tanh(center_y + half_height)))
+    west = (center_lon - half_width + 180) % 360 - 180
+    east = (center_lon + half_width + 180) % 360 - 180
+    if half_width == 180:
+        west, east = -180.0, 180.0
+    return float(south), float(west), float(north), float(east)
+
+
+class AlertIndex:
+    """
+    Spatial index over alert coordinates for viewport, radius and nearest-neighbour queries.
+
+    Alerts are stored as points on the unit sphere in a scipy cKDTree, so
+    straight-line distances in the tree map exactly to great-circle distances
+    and queries work across the antimeridian and near the poles. Queries return
+    row positions into the indexed frame, for use with alerts_df.iloc.
+    """
+
+    def __init__(self, lats, lons):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self._tree = cKDTree(_unit_vectors(self.lats, self.lons), leafsize=ALERT_INDEX_LEAF_SIZE,
+                             balanced_tree=False, compact_nodes=False)
+
+    @classmethod
+    def from_frame(cls, alerts_df, lat_column="lat", lon_column="lon"):
+        """
+        Index the coordinates of an alert DataFrame.
+
+        Parameters:
+        -----------
+        alerts_df : pd.DataFrame
+            DataFrame with alert data
+        lat_column : str
+            Name of the latitude column
+        lon_column : str
+            Name of the longitude column
+
+        Returns:
+        --------
+        AlertIndex
+            Index whose query results are row positions into alerts_df
+        """
+        return cls(alerts_df[lat_column].to_numpy(), alerts_df[lon_column].to_numpy())
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _ball(self, lat, lon, radius_km):
+        """Sorted positions of the alerts within radius_km of a point."""
+        if len(self) == 0:
+            return np.empty(0, dtype=np.intp)
+        center = _unit_vectors([lat], [lon])[0]
+        # Pad the chord slightly so rounding never drops a point on the boundary
+        positions = self._tree.query_ball_point(center, _chord(radius_km) * (1 + 1e-9), return_sorted=True)
+        return np.asarray(positions, dtype=np.intp)
+
+    def within_radius(self, lat, lon, radius_km):
+        """
+        Find the alerts within a great-circle distance of a point.
+
+        Parameters:
+        -----------
+        lat : float
+            Latitude of the point
+        lon : float
+            Longitude of the point
+        radius_km : float
+            Search radius in kilometers
+
+        Returns:
+        --------
+        numpy.ndarray
+            Sorted row positions of the matching alerts
+        """
+        return self._ball(lat, lon, radius_km)
+
+    def within_bounds(self, south, west, north, east):
+        """
+        Find the alerts inside a latitude/longitude box, such as a map viewport.
+
+        The tree is searched with the smallest spherical cap around the box and
+        the candidates are then checked against the box itself.
+
+        Parameters:
+        -----------
+        south : float
+            Southern latitude of the box
+        west : float
+            Western longitude of the box; greater than east when the box crosses the antimeridian
+        north : float
+            Northern latitude of the box
+        east : float
+            Eastern longitude of the box
+
+        Returns:
+        --------
+        numpy.ndarray
+            Sorted row positions of the matching alerts
+        """
+        width = (east - west) % 360 or (360 if east != west else 0)
+        center_lat = (south + north) / 2
+        center_lon = west + width / 2
+        corners = _unit_vectors([south, south, north, north], [west, east, west, east])
+        center = _unit_vectors([center_lat], [center_lon])[0]
+        # Boxes wider than a hemisphere cannot be bounded by their corners
+        cap_chord = 2.0 if width > 180 else np.linalg.norm(corners - center, axis=1).max()
+        positions = self._ball(center_lat, center_lon, _great_circle_km(cap_chord))
+
+        lats, lons = self.lats[positions], self.lons[positions]
+        inside = (lats >= south) & (lats <= north) & ((lons - west) % 360 <= width)
+        return positions[inside]
+
+    def within_polygon(self, vertices):
+        """
+        Find the alerts inside a polygon, such as a shape drawn on the map.
+
+        Candidates inside the polygon's bounding box are tested with an even-odd
+        ray-casting rule. The polygon must not cross the antimeridian.
+
+        Parameters:
+        -----------
+        vertices : array-like
+            (n, 2) [lat, lon] vertices of the polygon; closing it is optional
+
+        Returns:
+        --------
+        numpy.ndarray
+            Sorted row positions of the matching alerts
+        """
+        vertices = np.asarray(vertices, dtype=np.float64)
+        if len(vertices) < 3:
+            raise ValueError("A polygon needs at least 3 vertices")
+        poly_lats, poly_lons = vertices[:, 0], vertices[:, 1]
+        positions = self.within_bounds(poly_lats.min(), poly_lons.min(), poly_lats.max(), poly_lons.max())
+
+        lats, lons = self.lats[positions], self.lons[positions]
+        inside = np.zeros(len(positions), dtype=bool)
+        next_lats, next_lons = np.roll(poly_lats, -1), np.roll(poly_lons, -1)
+        for lat_a, lon_a, lat_b, lon_b in zip(poly_lats, poly_lons, next_lats, next_lons):
+            if lat_a == lat_b:
+                continue
+            crosses = (lat_a > lats) != (lat_b > lats)
+            crossing_lon = lon_a + (lats - lat_a) * (lon_b - lon_a) / (lat_b - lat_a)
+            inside ^= crosses & (lons < crossing_lon)
+        return positions[inside]
+
+    def nearest(self, lat, lon, k=1, max_distance_km=None):
+        """
+        Find the alerts closest to a point.
+
+        Parameters:
+        -----------
+        lat : float
+            Latitude of the point
+        lon : float
+            Longitude of the point
+        k : int
+            Number of alerts to return
+        max_distance_km : float, optional
+            Ignore alerts farther away than this
+
+        Returns:
+        --------
+        tuple
+            (positions, distances_km) arrays ordered from nearest to farthest;
+            shorter than k when fewer alerts qualify
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+        upper = np.inf if max_distance_km is None else _chord(max_distance_km) * (1 + 1e-9)
+        chords, positions = self._tree.query(_unit_vectors([lat], [lon])[0], k=[*range(1, k + 1)],
+                                             distance_upper_bound=upper)
+        found = np.isfinite(chords)
+        return positions[found].astype(np.intp), _great_circle_km(chords[found])
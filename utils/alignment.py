@@ -0,0 +1,132 @@
+import functools
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from utils.result_cache import image_fingerprint
+from utils.memory_budget import memory_budget
+
+# Resampling filters selectable for alignment, from fastest to highest quality
+RESAMPLING_FILTERS = {
+    "nearest": Image.NEAREST,
+    "bilinear": Image.BILINEAR,
+    "lanczos": Image.LANCZOS
+}
+DEFAULT_RESAMPLING = "lanczos"
+
+# For downscales, box-reduce by an integer factor first while the intermediate stays
+# at least this many times larger than the target; the filter then only runs on the
+# small intermediate (see Image.resize)
+REDUCING_GAP = 3.0
+
+# Upper bound on the decoded size of all cached aligned images
+DEFAULT_MAX_ALIGNED_BYTES = 512 * 1024 * 1024
+
+_aligned = OrderedDict()  # (before fingerprint, after fingerprint, resampling) -> (image, size in bytes)
+_aligned_bytes = 0
+_aligned_lock = threading.Lock()
+
+# Owner id the cached images are registered under in the process memory budget
+_BUDGET_ID = "alignment_cache"
+
+
+def _drop_aligned(key):
+    """Memory budget eviction callback: forget one cached aligned image."""
+    global _aligned_bytes
+    with _aligned_lock:
+        entry = _aligned.pop(key, None)
+        if entry is not None:
+            _aligned_bytes -= entry[1]
+
+
+def _to_rgb(image):
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def resample_image(image, size, resampling=DEFAULT_RESAMPLING):
+    """
+    Resize an image with the chosen quality, taking the cheapest exact path available.
+
+    Exact integer downscales are done with a single box reduction. Other downscales
+    use Pillow's reducing-gap path, and upscales run the filter directly.
+
+    Parameters:
+    -----------
+    image : PIL.Image
+        The image to resize
+    size : tuple
+        Target (width, height)
+    resampling : str
+        One of the RESAMPLING_FILTERS keys
+
+    Returns:
+    --------
+    PIL.Image
+        The resized image, or the image itself if it already has the target size
+    """
+    if resampling not in RESAMPLING_FILTERS:
+        raise ValueError(f"Unknown resampling '{resampling}', expected one of {sorted(RESAMPLING_FILTERS)}")
+    if image.size == tuple(size):
+        return image
+
+    width, height = size
+    if resampling != "nearest" and width <= image.width and height <= image.height:
+        factor_x, factor_y = image.width // width, image.height // height
+        if factor_x * width == image.width and factor_y * height == image.height:
+            # Each output pixel is the mean of a whole factor_x x factor_y block
+            return image.reduce((factor_x, factor_y))
+        return image.resize(size, RESAMPLING_FILTERS[resampling], reducing_gap=REDUCING_GAP)
+    return image.resize(size, RESAMPLING_FILTERS[resampling])
+
+
+def align_pair(before_image, after_image, resampling=DEFAULT_RESAMPLING):
+    """
+    Put an image pair on a common RGB grid, resampling the after image once per pair.
+
+    The aligned after image is cached by the content of both images and the
+    resampling choice, so reruns and every page that compares the pair reuse it.
+
+    Parameters:
+    -----------
+    before_image : PIL.Image
+        The earlier image, which defines the grid
+    after_image : PIL.Image
+        The later image, resampled onto the before image's size if needed
+    resampling : str
+        One of the RESAMPLING_FILTERS keys
+
+    Returns:
+    --------
+    tuple
+        (before_image, after_image) as RGB images of the same size
+    """
+    global _aligned_bytes
+    if after_image.size == before_image.size:
+        return _to_rgb(before_image), _to_rgb(after_image)
+
+    key = (image_fingerprint(before_image), image_fingerprint(after_image), resampling)
+    before_image = _to_rgb(before_image)
+    with _aligned_lock:
+        cached = _aligned.get(key)
+        if cached is not None:
+            _aligned.move_to_end(key)
+            memory_budget.touch(_BUDGET_ID, key)
+            return before_image, cached[0]
+
+    aligned = resample_image(_to_rgb(after_image), before_image.size, resampling)
+
+    size = aligned.width * aligned.height * 3
+    with _aligned_lock:
+        stored = key not in _aligned and size <= DEFAULT_MAX_ALIGNED_BYTES
+        if stored:
+            _aligned[key] = (aligned, size)
+            _aligned_bytes += size
+            while _aligned_bytes > DEFAULT_MAX_ALIGNED_BYTES:
+                evicted_key, (_, evicted_size) = _aligned.popitem(last=False)
+                _aligned_bytes -= evicted_size
+                memory_budget.release(_BUDGET_ID, evicted_key)
+    if stored:
+        # Registered outside the cache lock; see MemoryBudget._evict
+        memory_budget.register(_BUDGET_ID, key, size, functools.partial(_drop_aligned, key))
+    return before_image, aligned
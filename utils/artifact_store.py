@@ -0,0 +1,523 @@
+import os
+import io
+import uuid
+import hashlib
+import zlib
+import functools
+import shutil
+import tempfile
+import threading
+import weakref
+from collections.abc import MutableMapping
+
+import numpy as np
+from PIL import Image
+
+from utils.result_cache import image_fingerprint, remember_fingerprint
+from utils.memory_budget import memory_budget
+from utils.image_pyramid import display_level, encoded_preview, FULL_DISPLAY_WIDTH
+
+# Root directory for per-session spill files
+DEFAULT_ARTIFACT_DIR = os.path.join(tempfile.gettempdir(), "deforestation_session_artifacts")
+
+# Per-session quotas
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 1024 * 1024 * 1024
+
+# Decoded rasters larger than this are written to a memory-mapped file instead of
+# being compressed in memory
+DEFAULT_SPILL_THRESHOLD_BYTES = 4 * 1024 * 1024
+
+# zlib level for in-memory rasters; low levels are several times faster to write
+COMPRESSION_LEVEL = 1
+
+# Modes that round-trip losslessly through a numpy array
+_ARRAY_MODES = ("L", "LA", "RGB", "RGBA", "I", "F")
+
+
+class ArtifactQuotaError(Exception):
+    """Raised when storing an artifact would exceed the session's storage quota."""
+
+
+class SessionArtifactStore:
+    """
+    Compact storage for the large images of one user session.
+
+    Images are kept as compressed bytes in memory, or as memory-mapped files in a
+    per-session directory when they are large, and are only decoded when read.
+    Names with identical content share one copy, and a decoded image is shared
+    between reads for as long as any caller still holds it, so a single rerun
+    decodes each image at most once.
+
+    In-memory data is tracked by the process-wide memory budget, which moves it
+    to the session directory when all sessions together exceed the ceiling.
+    """
+
+    def __init__(self, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+                 spill_threshold_bytes=DEFAULT_SPILL_THRESHOLD_BYTES, root_dir=DEFAULT_ARTIFACT_DIR):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.spill_threshold_bytes = spill_threshold_bytes
+        self.root_dir = root_dir
+        self.directory = None
+        self.memory_bytes = 0
+        self.disk_bytes = 0
+        # Blobs are keyed by the pixel fingerprint, or by a hash of the file for encoded uploads
+        self._names = {}  # artifact name -> content key
+        self._blobs = {}  # content key -> stored data, shared by names with identical content
+        self._decoded = weakref.WeakValueDictionary()  # content key -> decoded image still in use
+        self._file_counter = 0
+        self._lock = threading.RLock()
+        self._finalizer = None
+        self.session_id = uuid.uuid4().hex
+        weakref.finalize(self, memory_budget.release_session, self.session_id)
+
+    def _session_directory(self):
+        """Create the spill directory on first use and remove it when the store goes away."""
+        if self.directory is None:
+            os.makedirs(self.root_dir, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix="session_", dir=self.root_dir)
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+        return self.directory
+
+    def scratch_directory(self, prefix):
+        """
+        Create a new directory inside the session directory for derived files.
+
+        The directory is removed with the session directory; callers may remove it earlier.
+
+        Parameters:
+        -----------
+        prefix : str
+            Prefix of the directory name
+
+        Returns:
+        --------
+        str
+            Path of the new directory
+        """
+        with self._lock:
+            return tempfile.mkdtemp(prefix=f"{prefix}_", dir=self._session_directory())
+
+    def put_image(self, name, image):
+        """
+        Store an image under a name, replacing any previous image with that name.
+
+        Parameters:
+        -----------
+        name : str
+            Artifact name, for example "before_image"
+        image : PIL.Image or None
+            The image to store; None removes the artifact
+
+        Raises:
+        -------
+        ArtifactQuotaError
+            If the image does not fit within the session's memory and disk quotas
+        """
+        if image is None:
+            self.delete(name)
+            return
+
+        fingerprint = image_fingerprint(image)
+        if self._reuse(name, fingerprint):
+            self._decoded.setdefault(fingerprint, image)
+            return
+
+        if image.mode not in _ARRAY_MODES:
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        blob = self._pixel_blob(np.asarray(image))
+        blob["fingerprint"] = fingerprint
+        self._add_blob(name, fingerprint, blob)
+        self._decoded[fingerprint] = image
+
+    def put_encoded(self, name, data, source_id=None):
+        """
+        Store an encoded image file (e.g. an uploaded JPEG or PNG) without decoding it.
+
+        Only the file header is read here. Files above the spill threshold, or that
+        do not fit the memory quota, are written to the session directory. The
+        pixels are decoded the first time get_image needs them and are then kept in
+        decoded form, so the full decode is paid once; previews are produced from
+        the file by get_preview.
+
+        Parameters:
+        -----------
+        name : str
+            Artifact name
+        data : bytes
+            The encoded file
+        source_id : str, optional
+            Identifier of the upload (such as the uploader's file id); when it matches
+            the stored artifact the file is not hashed again
+
+        Raises:
+        -------
+        ArtifactQuotaError
+            If the file does not fit within the session's memory and disk quotas
+        """
+        with self._lock:
+            key = self._names.get(name)
+            if source_id is not None and key is not None and self._blobs[key].get("source_id") == source_id:
+                return
+
+        key = "encoded:" + hashlib.blake2b(data, digest_size=20).hexdigest()
+        if self._reuse(name, key):
+            return
+
+        header = Image.open(io.BytesIO(data))
+        blob = self._encoded_blob(data)
+        blob.update({"kind": "encoded", "size": header.size, "source_id": source_id, "fingerprint": None})
+        self._add_blob(name, key, blob)
+
+    def _reuse(self, name, key):
+        """Point name at an already stored blob with the same key; return whether one existed."""
+        with self._lock:
+            if self._names.get(name) == key:
+                # Same content (e.g. the uploader re-opening the file on a rerun)
+                return True
+            if key in self._blobs:
+                # Identical content is already stored under another name; share it
+                self.delete(name)
+                self._blobs[key]["refs"] += 1
+                self._names[name] = key
+                return True
+        return False
+
+    def _pixel_blob(self, pixels):
+        """Compress pixels in memory, or spill them to disk when they are large or memory is full."""
+        if pixels.nbytes <= self.spill_threshold_bytes:
+            data = zlib.compress(pixels.tobytes(), COMPRESSION_LEVEL)
+            if self.memory_bytes + len(data) <= self.max_memory_bytes:
+                return {"kind": "compressed", "data": data, "dtype": pixels.dtype.str,
+                        "shape": pixels.shape, "memory_bytes": len(data), "disk_bytes": 0}
+        return self._spill(pixels)
+
+    def _encoded_blob(self, data):
+        """Keep an encoded file in memory, or write it to disk when it is large or memory is full."""
+        if len(data) <= self.spill_threshold_bytes and self.memory_bytes + len(data) <= self.max_memory_bytes:
+            return {"data": bytes(data), "memory_bytes": len(data), "disk_bytes": 0}
+        path = self._new_file(".bin")
+        with open(path, "wb") as f:
+            f.write(data)
+        return {"data": None, "path": path, "memory_bytes": 0, "disk_bytes": len(data)}
+
+    def _add_blob(self, name, key, blob):
+        """Account for a new blob under name, enforcing the session quotas and the global budget."""
+        blob["refs"] = 1
+        with self._lock:
+            self.delete(name)
+            if (self.memory_bytes + blob["memory_bytes"] > self.max_memory_bytes
+                    or self.disk_bytes + blob["disk_bytes"] > self.max_disk_bytes):
+                self._discard(blob)
+                raise ArtifactQuotaError(
+                    f"Storing '{name}' would exceed this session's storage quota "
+                    f"({self.max_memory_bytes // 2**20} MB in memory, {self.max_disk_bytes // 2**20} MB on disk)"
+                )
+            self._blobs[key] = blob
+            self._names[name] = key
+            self.memory_bytes += blob["memory_bytes"]
+            self.disk_bytes += blob["disk_bytes"]
+        self._track(key, blob)
+
+    def _track(self, key, blob):
+        # Called outside the store lock; see MemoryBudget._evict
+        if blob["memory_bytes"]:
+            memory_budget.register(
+                self.session_id, key, blob["memory_bytes"],
+                functools.partial(_evict_blob, weakref.ref(self), key)
+            )
+        else:
+            memory_budget.release(self.session_id, key)
+
+    def _new_file(self, extension):
+        with self._lock:
+            self._file_counter += 1
+            return os.path.join(self._session_directory(), f"artifact_{self._file_counter}{extension}")
+
+    def _spill(self, pixels):
+        """Write pixels to a memory-mappable .npy file in the session directory."""
+        path = self._new_file(".npy")
+        np.save(path, pixels, allow_pickle=False)
+        return {"kind": "memmap", "path": path, "shape": pixels.shape,
+                "memory_bytes": 0, "disk_bytes": os.path.getsize(path)}
+
+    def move_to_disk(self, key):
+        """
+        Move the in-memory bytes of a stored blob to the session directory.
+
+        Called by the memory budget on eviction; the blob stays readable and is
+        decoded from the file on the next access. Does nothing if the blob is gone,
+        already on disk, or would not fit the disk quota.
+        """
+        with self._lock:
+            blob = self._blobs.get(key)
+            if blob is None or blob.get("data") is None:
+                return
+            size = len(blob["data"])
+            if self.disk_bytes + size > self.max_disk_bytes:
+                return
+            path = self._new_file(".bin")
+            try:
+                with open(path, "wb") as f:
+                    f.write(blob["data"])
+            except OSError:
+                return
+            blob["path"] = path
+            blob["data"] = None
+            blob["memory_bytes"] = 0
+            blob["disk_bytes"] = size
+            self.memory_bytes -= size
+            self.disk_bytes += size
+
+    @staticmethod
+    def _discard(blob):
+        if "path" in blob:
+            try:
+                os.remove(blob["path"])
+            except OSError:
+                pass
+
+    @staticmethod
+    def _read_data(blob):
+        if blob.get("data") is not None:
+            return blob["data"]
+        with open(blob["path"], "rb") as f:
+            return f.read()
+
+    def get_image(self, name, default=None):
+        """
+        Return the stored image, decoding it if no caller currently holds it.
+
+        Parameters:
+        -----------
+        name : str
+            Artifact name
+        default : object
+            Returned when no image is stored under the name
+
+        Returns:
+        --------
+        PIL.Image
+            The decoded image, or default
+        """
+        with self._lock:
+            key = self._names.get(name)
+            if key is None:
+                return default
+            memory_budget.touch(self.session_id, key)
+            image = self._decoded.get(key)
+            if image is not None:
+                return image
+
+            blob = self._blobs[key]
+            materialized = blob["kind"] == "encoded"
+            if materialized:
+                image = Image.open(blob["path"] if blob.get("data") is None else io.BytesIO(blob["data"]))
+                image.load()
+                blob = self._materialize(key, blob, image)
+            elif blob["kind"] == "compressed":
+                pixels = np.frombuffer(zlib.decompress(self._read_data(blob)), dtype=blob["dtype"])
+                image = Image.fromarray(pixels.reshape(blob["shape"]))
+            else:
+                image = Image.fromarray(np.load(blob["path"], mmap_mode="r"))
+
+            if blob["fingerprint"] is not None:
+                remember_fingerprint(image, blob["fingerprint"])
+            self._decoded[key] = image
+        if materialized:
+            self._track(key, blob)
+        return image
+
+    def _materialize(self, key, blob, image):
+        """Replace an encoded blob by its decoded pixels so later reads skip the file decode; return the blob kept."""
+        if image.mode not in _ARRAY_MODES:
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        pixels = np.asarray(image)
+        decoded = self._pixel_blob(pixels)
+        memory_after = self.memory_bytes - blob["memory_bytes"] + decoded["memory_bytes"]
+        disk_after = self.disk_bytes - blob["disk_bytes"] + decoded["disk_bytes"]
+        if memory_after > self.max_memory_bytes or disk_after > self.max_disk_bytes:
+            # Keep the encoded file; it is decoded again on the next read
+            self._discard(decoded)
+            return blob
+        self._discard(blob)
+        self.memory_bytes, self.disk_bytes = memory_after, disk_after
+        decoded["refs"] = blob["refs"]
+        decoded["fingerprint"] = image_fingerprint(image)
+        # Keep the upload identity so put_encoded on a rerun still skips hashing the file
+        decoded["source_id"] = blob.get("source_id")
+        self._blobs[key] = decoded
+        return decoded
+
+    def get_size(self, name):
+        """Return the (width, height) of a stored image without decoding it, or None."""
+        with self._lock:
+            key = self._names.get(name)
+            if key is None:
+                return None
+            blob = self._blobs[key]
+            if blob["kind"] == "encoded":
+                return blob["size"]
+            return (blob["shape"][1], blob["shape"][0])
+
+    def get_preview(self, name, display_width=FULL_DISPLAY_WIDTH):
+        """
+        Return a display-resolution version of a stored image.
+
+        Encoded uploads that have not been decoded yet are previewed straight from
+        the file: JPEGs are decoded in draft mode at a reduced scale, other formats
+        are decoded in full and then downscaled. Other images use their cached
+        pyramid level.
+
+        Parameters:
+        -----------
+        name : str
+            Artifact name
+        display_width : int
+            Width in pixels the image is rendered at
+
+        Returns:
+        --------
+        PIL.Image or None
+            The preview image, or None when nothing is stored under the name
+        """
+        with self._lock:
+            key = self._names.get(name)
+            if key is None:
+                return None
+            blob = self._blobs[key]
+            if blob["kind"] == "encoded" and key not in self._decoded:
+                # File-backed uploads are previewed from their path without reading them in full
+                data = blob["path"] if blob.get("data") is None else blob["data"]
+            else:
+                data = None
+        if data is not None:
+            try:
+                return encoded_preview(data, display_width, key=key)
+            except FileNotFoundError:
+                # The file was decoded (and removed) by another read in the meantime
+                pass
+        return display_level(self.get_image(name), display_width)
+
+    def delete(self, name):
+        """Remove an artifact if it exists."""
+        with self._lock:
+            key = self._names.pop(name, None)
+            if key is None:
+                return
+            blob = self._blobs[key]
+            blob["refs"] -= 1
+            if blob["refs"] == 0:
+                del self._blobs[key]
+                self._decoded.pop(key, None)
+                self.memory_bytes -= blob["memory_bytes"]
+                self.disk_bytes -= blob["disk_bytes"]
+                self._discard(blob)
+                memory_budget.release(self.session_id, key)
+
+    def names(self, prefix=""):
+        """Return the names of the stored artifacts that start with prefix."""
+        with self._lock:
+            return [name for name in self._names if name.startswith(prefix)]
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def usage(self):
+        """
+        Return the storage used by this session.
+
+        Returns:
+        --------
+        dict
+            Dictionary with the number of artifacts and the memory and disk bytes used and allowed
+        """
+        with self._lock:
+            return {
+                "artifacts": len(self._names),
+                "memory_bytes": self.memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "disk_bytes": self.disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes
+            }
+
+    def clear(self):
+        """Remove every artifact and the session's spill directory."""
+        with self._lock:
+            for name in list(self._names):
+                self.delete(name)
+            if self._finalizer is not None:
+                self._finalizer()
+                self._finalizer = None
+                self.directory = None
+
+
+def _evict_blob(store_ref, key):
+    """Memory budget eviction callback; holds the store weakly so ended sessions can be collected."""
+    store = store_ref()
+    if store is not None:
+        store.move_to_disk(key)
+
+
+class StoredImageDict(MutableMapping):
+    """
+    Dictionary view of the images stored under a common prefix, such as the time-lapse frames.
+
+    Keys are kept in insertion order; values are decoded from the store on access.
+    """
+
+    def __init__(self, store, prefix):
+        self._store = store
+        self._prefix = prefix
+        self._keys = []
+
+    def _name(self, key):
+        return f"{self._prefix}/{key}"
+
+    def __getitem__(self, key):
+        image = self._store.get_image(self._name(key))
+        if image is None:
+            raise KeyError(key)
+        return image
+
+    def __setitem__(self, key, image):
+        self._store.put_image(self._name(key), image)
+        if key not in self._keys:
+            self._keys.append(key)
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        self._store.delete(self._name(key))
+        self._keys.remove(key)
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+
+def get_artifact_store(state):
+    """
+    Return the artifact store kept in a state mapping, creating it on first use.
+
+    Parameters:
+    -----------
+    state : MutableMapping
+        Per-session state (normally st.session_state)
+
+    Returns:
+    --------
+    SessionArtifactStore
+        The session's artifact store
+    """
+    store = state.get("artifact_store")
+    if store is None:
+        store = SessionArtifactStore()
+        state["artifact_store"] = store
+    return store
@@ -0,0 +1,162 @@
+import shutil
+import functools
+
+import numpy as np
+
+from utils.result_cache import image_fingerprint
+from utils.region_stats import compute_region_stats
+from utils.alignment import align_pair, DEFAULT_RESAMPLING
+from utils.artifact_store import get_artifact_store
+from utils.memory_budget import memory_budget
+from utils.parallel import parallel_label, parallel_change_detection
+
+# Threshold on the summed per-channel difference (0-765) for a pixel to count as significant change
+SIGNIFICANT_CHANGE_SUM = 100
+
+
+def change_product_key(before_image, after_image, resampling=DEFAULT_RESAMPLING):
+    """Return the key identifying the change product of an image pair."""
+    return (image_fingerprint(before_image), image_fingerprint(after_image), resampling)
+
+
+def build_change_product(before_image, after_image, resampling=DEFAULT_RESAMPLING, workers=None, output_dir=None):
+    """
+    Build the shared "change product" for a before/after image pair.
+
+    Everything the Upload and Analysis pages need from the pixel comparison is
+    computed here once, so the pages can read it on every rerun instead of
+    re-aligning the images and rebuilding the difference arrays. The pair is
+    compared tile by tile (across worker processes for large scenes), so no
+    full-frame difference or float temporaries are created, and the rasters can
+    be kept in memory-mapped files.
+
+    Parameters:
+    -----------
+    before_image : PIL.Image
+        The earlier satellite image
+    after_image : PIL.Image
+        The later satellite image; resampled onto the before image if sizes differ
+    resampling : str
+        Resampling quality for the alignment (see utils.alignment.RESAMPLING_FILTERS)
+    workers : int, optional
+        Number of worker processes for large scenes (defaults to all cores)
+    output_dir : str, optional
+        Write the heatmap, overlay and change sum to memory-mapped .npy files in this directory
+
+    Returns:
+    --------
+    dict
+        Dictionary with:
+        - "key": the (before, after) fingerprint pair the product was built from
+        - "heatmap", "overlay": uint8 RGB change visualizations (see utils.tiled_change)
+        - "change_sum": uint16 sum of the per-channel difference (0-765)
+        - "num_regions": number of connected regions of significant change
+        - "region_stats": per-region table as returned by compute_region_stats
+        - "stats": scalar summaries (channel means, total/max difference, edge sums,
+          significant and total pixel counts)
+        - "output_dir": the directory holding the memory-mapped rasters, if any
+    """
+    key = change_product_key(before_image, after_image, resampling)
+    before_image, after_image = align_pair(before_image, after_image, resampling)
+
+    change = parallel_change_detection(before_image, after_image, workers=workers, output_dir=output_dir)
+    change_sum = change["change_sum"]
+
+    # Regions of significant change; the labels are only needed for the region table
+    significant_mask = change_sum > SIGNIFICANT_CHANGE_SUM
+    labels, num_regions = parallel_label(significant_mask, workers, connectivity=4)
+
+    # Mean intensity is the mean per-channel difference, i.e. change_sum / 3
+    region_stats = compute_region_stats(labels, num_regions, intensity=change_sum)
+    region_stats["mean_intensity"] /= 3
+    del labels
+
+    stats = {
+        **change["stats"],
+        "significant_pixels": int(np.count_nonzero(significant_mask)),
+        "total_pixels": int(significant_mask.size)
+    }
+
+    return {
+        "key": key,
+        "heatmap": change["heatmap"],
+        "overlay": change["overlay"],
+        "change_sum": change_sum,
+        "num_regions": num_regions,
+        "region_stats": region_stats,
+        "stats": stats,
+        "output_dir": output_dir
+    }
+
+
+def change_product_bytes(product):
+    """Return the memory held by the arrays and tables of a change product; memory-mapped rasters are not counted."""
+    size = sum(value.nbytes for value in product.values()
+               if isinstance(value, np.ndarray) and not isinstance(value, np.memmap))
+    size += int(product["region_stats"].memory_usage(index=True).sum())
+    return size
+
+
+def _drop_change_product(slot, key):
+    """Memory budget eviction callback; the product is rebuilt on its next use."""
+    product = slot.get("product")
+    if product is not None and product["key"] == key:
+        _discard_change_product(slot.pop("product"))
+
+
+def _discard_change_product(product):
+    """Remove the memory-mapped files of a product that is no longer kept."""
+    if product.get("output_dir") is not None:
+        shutil.rmtree(product["output_dir"], ignore_errors=True)
+
+
+def get_change_product(state, before_image, after_image, resampling=DEFAULT_RESAMPLING):
+    """
+    Return the change product stored in a state mapping, rebuilding it only when the images changed.
+
+    The product's rasters are memory-mapped files in the session directory. The
+    rest is tracked by the process-wide memory budget and may be dropped
+    between reruns when memory is short, in which case it is rebuilt here.
+
+    Parameters:
+    -----------
+    state : MutableMapping
+        Where the product is kept between reruns (normally st.session_state)
+    before_image : PIL.Image
+        The earlier satellite image
+    after_image : PIL.Image
+        The later satellite image
+    resampling : str
+        Resampling quality for the alignment
+
+    Returns:
+    --------
+    dict
+        The change product as returned by build_change_product
+    """
+    slot = state.get("change_product")
+    if slot is None:
+        slot = {}
+        state["change_product"] = slot
+    store = get_artifact_store(state)
+    session_id = store.session_id
+
+    key = change_product_key(before_image, after_image, resampling)
+    product = slot.get("product")
+    if product is not None and product["key"] == key:
+        memory_budget.touch(session_id, "change_product")
+        return product
+
+    # Rasters go to the session directory, which is removed when the session ends
+    product = build_change_product(
+        before_image, after_image, resampling, output_dir=store.scratch_directory("change_product")
+    )
+    previous = slot.get("product")
+    slot["product"] = product
+    if previous is not None:
+        _discard_change_product(previous)
+    memory_budget.register(
+        session_id, "change_product", change_product_bytes(product),
+        functools.partial(_drop_change_product, slot, key)
+    )
+    return product
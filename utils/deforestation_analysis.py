@@ -1,9 +1,96 @@
+import zlib
+import functools
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 from PIL import Image, ImageStat
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from utils.vegetation import to_rgb_array, vegetation_mask
+
+# Rows classified per chunk by calculate_forest_coverage_batch
+FOREST_COVERAGE_CHUNK_ROWS = 256
+
+# Severity levels by annual deforestation rate (%/year): rates <= 0 are "Improving",
+# and each upper bound below closes the level with the same index + 1
+SEVERITY_LEVELS = np.array(["Improving", "Low", "Moderate", "High", "Critical"])
+SEVERITY_COLORS = np.array(["#4CAF50", "#8BC34A", "#FFC107", "#FF9800", "#F44336"])
+SEVERITY_UPPER_BOUNDS = np.array([0.5, 1.0, 2.0])
+
+# Simplified impact model: average tropical forest stores about 250 tons of carbon
+# per hectare; the scene area would come from image metadata in a real system
+CARBON_TONS_PER_HECTARE = 250
+ESTIMATED_AREA_HECTARES = 100
+
+# Simulated weather: (base temperature in °C, base daily rainfall in mm, seasonal
+# rainfall amplitude) by region name contained in the location
+WEATHER_REGION_PARAMS = {
+    "Amazon": (27, 200, 20),
+    "Borneo": (28, 220, 100),
+    "Congo": (25, 150, 80)
+}
+DEFAULT_WEATHER_PARAMS = (22, 120, 50)
+
+# Weather variables simulated for every day, in storage column order
+WEATHER_VARIABLES = ("temperature", "precipitation", "humidity")
+
+# Simulated weather is generated in blocks of this many days, each from a generator
+# seeded by the location and block number, so a day's values do not depend on the
+# range that was requested first
+WEATHER_BLOCK_DAYS = 64
+
+# Locations whose daily series are kept by the weather store
+WEATHER_STORE_MAX_LOCATIONS = 64
+
+# Day 0 of the block numbering
+_WEATHER_EPOCH = pd.Timestamp("1970-01-01")
+
+# Reference climate (mean temperature in °C, annual precipitation in mm) by region
+# name contained in the location
+WEATHER_REFERENCE_CLIMATE = {
+    "Amazon": (27, 2400),
+    "Borneo": (28, 2600),
+    "Congo": (25, 1800)
+}
+DEFAULT_REFERENCE_CLIMATE = (22, 1500)
+
+# Simplified drought threshold: precipitation per month below this (mm)
+DROUGHT_THRESHOLD_MM = 100
+
+# Monte Carlo projection: number of trajectories, relative standard deviation of each
+# trajectory's underlying rate and of its year-to-year variation, and the yearly
+# probability and size (percentage points of rate) of loss shocks such as fire years
+PROJECTION_SIMULATIONS = 5000
+PROJECTION_RATE_UNCERTAINTY = 0.25
+PROJECTION_ANNUAL_VOLATILITY = 0.2
+PROJECTION_SHOCK_PROBABILITY = 0.05
+PROJECTION_SHOCK_RATE = 2.0
+PROJECTION_PERCENTILES = (5, 50, 95)
+
+# Trajectories are always simulated this far ahead, so changing the projection length
+# reuses the same draws and the time to 50% loss is found beyond the plotted years
+PROJECTION_HORIZON_YEARS = 100
+PROJECTION_SEED = 0
+
+# Cached draws kept per process. Each is PROJECTION_SIMULATIONS x (horizon + 1) float64,
+# about 4 MB, so the cache stays at 32 MB and is left out of the memory budget
+PROJECTION_CACHE_SIZE = 8
+
+# Deterministic projection scenarios: multiplier applied to the current rate
+PROJECTION_SCENARIOS = {
+    "Current Trend": 1.0,
+    "Improved Conservation (50% reduction)": 0.5,
+    "Accelerated Loss (50% increase)": 1.5
+}
+
+# Rollup periods: pandas period frequency and number of months per period; seasons
+# are meteorological (DJF, MAM, JJA, SON)
+WEATHER_ROLLUP_PERIODS = {
+    "monthly": ("M", 1),
+    "seasonal": ("Q-NOV", 3)
+}
 
 def calculate_forest_coverage(image):
     """
@@ -20,21 +107,100 @@ def calculate_forest_coverage(image):
         Percentage of forest coverage (0-100)
     """
     # Convert image to numpy array
-    img_array = np.array(image)
+    img_array = to_rgb_array(image)
     
     # Simple approach: areas where green channel is dominant are likely forest
     # This is a simplified approach and would be more sophisticated in a real system
-    is_green_dominant = (img_array[:,:,1] > img_array[:,:,0]) & (img_array[:,:,1] > img_array[:,:,2])
-    is_green_significant = img_array[:,:,1] > 100
-    
-    # Combine conditions
-    is_forest = is_green_dominant & is_green_significant
+    is_forest = vegetation_mask(img_array)
     
     # Calculate percentage
     forest_percentage = np.mean(is_forest) * 100
     
     return forest_percentage
 
+def calculate_forest_coverage_batch(images, scene_ids=None, min_green=100, tile_size=None,
+                                    chunk_rows=FOREST_COVERAGE_CHUNK_ROWS):
+    """
+    Calculate forest coverage for many images in one chunked pass.
+    
+    Uses the same green-dominance rule as calculate_forest_coverage, but works on
+    bands of rows with a reused boolean buffer and integer counters, so scoring a
+    large stack of scenes never allocates full-frame temporaries.
+    
+    Parameters:
+    -----------
+    images : list or np.ndarray
+        PIL images or uint8 RGB arrays of shape (height, width, 3), or a stacked
+        uint8 array of shape (scenes, height, width, 3); scenes may differ in size
+        when given as a list
+    scene_ids : list, optional
+        Identifiers for the scenes, in order; defaults to 0..N-1
+    min_green : int
+        Minimum green value for a pixel to count as forest
+    tile_size : int, optional
+        When given, also compute a coverage grid over tiles of tile_size x tile_size pixels
+    chunk_rows : int
+        Number of image rows classified at a time
+    
+    Returns:
+    --------
+    pd.Series or tuple
+        Series of forest coverage percentages (0-100) indexed by scene id. When
+        tile_size is given, a tuple (coverage, grids) where grids maps each scene id
+        to a float32 array of per-tile coverage percentages.
+    """
+    if scene_ids is None:
+        scene_ids = list(range(len(images)))
+    if len(scene_ids) != len(images):
+        raise ValueError("scene_ids must have one entry per image")
+    if tile_size is not None:
+        # Bands of whole tile rows, so every tile is counted within a single band
+        chunk_rows = max(tile_size, chunk_rows - chunk_rows % tile_size)
+    
+    coverage = np.zeros(len(images), dtype=np.float64)
+    grids = {}
+    buffer = None
+    
+    for index, image in enumerate(images):
+        rgb = to_rgb_array(image) if isinstance(image, Image.Image) else np.asarray(image)[:, :, :3]
+        height, width = rgb.shape[:2]
+        if height == 0 or width == 0:
+            continue
+        
+        band_rows = min(chunk_rows, height)
+        if buffer is None or buffer.shape[0] < band_rows or buffer.shape[1] != width:
+            buffer = np.empty((band_rows, width), dtype=bool)
+        
+        if tile_size is not None:
+            tile_rows = -(-height // tile_size)
+            column_starts = np.arange(0, width, tile_size)
+            tile_counts = np.zeros((tile_rows, len(column_starts)), dtype=np.int64)
+        
+        forest_pixels = 0
+        for y0 in range(0, height, chunk_rows):
+            y1 = min(y0 + chunk_rows, height)
+            mask = vegetation_mask(rgb[y0:y1], min_green, out=buffer[:y1 - y0])
+            forest_pixels += int(np.count_nonzero(mask))
+            
+            if tile_size is not None:
+                row_counts = np.add.reduceat(mask, np.arange(0, y1 - y0, tile_size), axis=0, dtype=np.int32)
+                tile_counts[y0 // tile_size:y0 // tile_size + row_counts.shape[0]] = np.add.reduceat(
+                    row_counts, column_starts, axis=1, dtype=np.int32
+                )
+        
+        coverage[index] = forest_pixels / (height * width) * 100
+        
+        if tile_size is not None:
+            # Tiles on the right and bottom edges may be smaller than tile_size
+            tile_heights = np.minimum(tile_size, height - np.arange(0, height, tile_size))
+            tile_widths = np.minimum(tile_size, width - column_starts)
+            grids[scene_ids[index]] = (tile_counts / np.outer(tile_heights, tile_widths) * 100).astype(np.float32)
+    
+    coverage = pd.Series(coverage, index=pd.Index(scene_ids, name="scene_id"), name="forest_coverage")
+    if tile_size is not None:
+        return coverage, grids
+    return coverage
+
 def calculate_detailed_deforestation_metrics(before_image, after_image, time_difference_years=1):
     """
     Calculate detailed deforestation metrics between two satellite images.
@@ -70,26 +236,13 @@ def calculate_detailed_deforestation_metrics(before_image, after_image, time_dif
     annual_rate = percentage_change / time_difference_years
     
     # Determine severity level
-    if annual_rate <= 0:
-        severity = "Improving"
-        severity_color = "#4CAF50"  # Green
-    elif annual_rate < 0.5:
-        severity = "Low"
-        severity_color = "#8BC34A"  # Light Green
-    elif annual_rate < 1.0:
-        severity = "Moderate"
-        severity_color = "#FFC107"  # Amber
-    elif annual_rate < 2.0:
-        severity = "High"
-        severity_color = "#FF9800"  # Orange
-    else:
-        severity = "Critical"
-        severity_color = "#F44336"  # Red
+    severity_index = int(severity_level_index(annual_rate))
+    severity = str(SEVERITY_LEVELS[severity_index])
+    severity_color = str(SEVERITY_COLORS[severity_index])
     
     # Calculate carbon impact (simplified)
-    # Average tropical forest stores about 250 tons of carbon per hectare
-    estimated_area_hectares = 100  # This would be calculated from image metadata in a real system
-    carbon_impact_tons = (absolute_change / 100) * estimated_area_hectares * 250
+    estimated_area_hectares = ESTIMATED_AREA_HECTARES
+    carbon_impact_tons = (absolute_change / 100) * estimated_area_hectares * CARBON_TONS_PER_HECTARE
     
     # Calculate biodiversity impact score (simplified)
     # Higher score means more biodiversity loss
@@ -109,6 +262,76 @@ def calculate_detailed_deforestation_metrics(before_image, after_image, time_dif
         "estimated_area_hectares": estimated_area_hectares
     }
 
+def severity_level_index(annual_rates):
+    """
+    Map annual deforestation rates to indices into SEVERITY_LEVELS and SEVERITY_COLORS.
+    
+    Parameters:
+    -----------
+    annual_rates : float or np.ndarray
+        Annual deforestation rates in percent per year
+    
+    Returns:
+    --------
+    np.ndarray
+        Integer severity indices with the shape of annual_rates
+    """
+    annual_rates = np.asarray(annual_rates, dtype=np.float64)
+    index = np.searchsorted(SEVERITY_UPPER_BOUNDS, annual_rates, side="right") + 1
+    return np.where(annual_rates <= 0, 0, index)
+
+def calculate_bulk_deforestation_metrics(pairs, time_difference_years=1, pair_ids=None):
+    """
+    Calculate detailed deforestation metrics for many before/after image pairs at once.
+    
+    Produces the same metrics as calculate_detailed_deforestation_metrics, with
+    coverage computed by calculate_forest_coverage_batch and every derived column
+    (including severity) computed with array operations.
+    
+    Parameters:
+    -----------
+    pairs : list
+        List of (before_image, after_image) tuples; images may be PIL images or uint8 RGB arrays
+    time_difference_years : float or array-like
+        Time difference between the images of each pair in years, or one value for all pairs
+    pair_ids : list, optional
+        Identifiers for the pairs, in order; defaults to 0..N-1
+    
+    Returns:
+    --------
+    pd.DataFrame
+        One row per pair, indexed by pair id, with the keys returned by
+        calculate_detailed_deforestation_metrics as columns
+    """
+    if pair_ids is None:
+        pair_ids = list(range(len(pairs)))
+    
+    before_coverage = calculate_forest_coverage_batch([before for before, _ in pairs]).to_numpy()
+    after_coverage = calculate_forest_coverage_batch([after for _, after in pairs]).to_numpy()
+    time_difference_years = np.broadcast_to(np.asarray(time_difference_years, dtype=np.float64), before_coverage.shape)
+    
+    absolute_change = before_coverage - after_coverage
+    percentage_change = np.divide(
+        absolute_change * 100, before_coverage,
+        out=np.zeros_like(absolute_change), where=before_coverage > 0
+    )
+    annual_rate = percentage_change / time_difference_years
+    severity_index = severity_level_index(annual_rate)
+    
+    return pd.DataFrame({
+        "before_coverage": before_coverage,
+        "after_coverage": after_coverage,
+        "absolute_change": absolute_change,
+        "percentage_change": percentage_change,
+        "annual_rate": annual_rate,
+        "time_difference_years": time_difference_years,
+        "severity": pd.Categorical.from_codes(severity_index, categories=SEVERITY_LEVELS, ordered=True),
+        "severity_color": SEVERITY_COLORS[severity_index],
+        "carbon_impact_tons": (absolute_change / 100) * ESTIMATED_AREA_HECTARES * CARBON_TONS_PER_HECTARE,
+        "biodiversity_impact": np.minimum(10, absolute_change / 10),
+        "estimated_area_hectares": ESTIMATED_AREA_HECTARES
+    }, index=pd.Index(pair_ids, name="pair_id"))
+
 def compare_to_global_regions(deforestation_rate):
     """
     Compare the deforestation rate to global regions.
@@ -154,10 +377,201 @@ def compare_to_global_regions(deforestation_rate):
     
     return comparisons
 
+def _weather_region_params(location):
+    """Return the (base temperature, base rainfall, seasonality) of the region a location belongs to."""
+    for region, params in WEATHER_REGION_PARAMS.items():
+        if region in location:
+            return params
+    return DEFAULT_WEATHER_PARAMS
+
+def _day_number(date):
+    return (pd.Timestamp(date).normalize() - _WEATHER_EPOCH).days
+
+def _simulate_weather_blocks(location, first_block, blocks):
+    """Simulate whole blocks of daily weather as an array of shape (days, len(WEATHER_VARIABLES))."""
+    base_temp, base_rain, seasonality = _weather_region_params(location)
+    # Stable across processes, unlike hash() on strings
+    location_seed = zlib.crc32(location.encode("utf-8"))
+    
+    noise = np.empty((blocks * WEATHER_BLOCK_DAYS, 3))
+    for offset in range(blocks):
+        rng = np.random.default_rng([location_seed, (first_block + offset) % 2**32])
+        rows = noise[offset * WEATHER_BLOCK_DAYS:(offset + 1) * WEATHER_BLOCK_DAYS]
+        rows[:, 0] = rng.normal(0, 1.5, WEATHER_BLOCK_DAYS)
+        rows[:, 1] = rng.exponential(10, WEATHER_BLOCK_DAYS)
+        rows[:, 2] = rng.normal(0, 5, WEATHER_BLOCK_DAYS)
+    
+    first_day = first_block * WEATHER_BLOCK_DAYS
+    dates = _WEATHER_EPOCH + pd.to_timedelta(np.arange(first_day, first_day + len(noise)), unit="D")
+    
+    # Seasonal component - higher in wet season, lower in dry season
+    month_factor = np.sin((dates.month.to_numpy() / 12) * 2 * np.pi)
+    
+    values = np.empty_like(noise)
+    values[:, 0] = base_temp + 3 * month_factor + noise[:, 0]
+    values[:, 1] = np.maximum(0, base_rain + seasonality * month_factor + noise[:, 1])
+    values[:, 2] = np.clip(70 + 20 * month_factor + noise[:, 2], 40, 100)
+    return values
+
+def _weather_reference_climate(location):
+    """Return the (mean temperature, annual precipitation) a location is compared against."""
+    for region, reference in WEATHER_REFERENCE_CLIMATE.items():
+        if region in location:
+            return reference
+    return DEFAULT_REFERENCE_CLIMATE
+
+class WeatherSeriesStore:
+    """
+    Per-location daily weather series that grow instead of being regenerated.
+    
+    Each location's series covers a contiguous span of whole simulation blocks,
+    with running totals of every variable kept alongside, so the sum of any
+    period is the difference of two totals. Requests past the end of the span
+    only simulate and total the missing blocks; requests before its start
+    prepend blocks and recompute the totals.
+    """
+    
+    def __init__(self, max_locations=WEATHER_STORE_MAX_LOCATIONS):
+        self.max_locations = max_locations
+        self._series = OrderedDict()  # location -> series, least recently used first
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _new_series(first_block, values):
+        totals = np.zeros((len(values) + 1, values.shape[1]))
+        np.cumsum(values, axis=0, out=totals[1:])
+        return {"first_day": first_block * WEATHER_BLOCK_DAYS, "length": len(values),
+                "values": values, "totals": totals}
+    
+    @staticmethod
+    def _append(series, values):
+        """Append days to a series, growing its buffers geometrically so appends stay amortized O(days added)."""
+        length, added = series["length"], len(values)
+        if length + added > len(series["values"]):
+            capacity = max(2 * len(series["values"]), length + added)
+            grown = np.empty((capacity, values.shape[1]))
+            grown[:length] = series["values"][:length]
+            grown_totals = np.empty((capacity + 1, values.shape[1]))
+            grown_totals[:length + 1] = series["totals"][:length + 1]
+            series["values"], series["totals"] = grown, grown_totals
+        series["values"][length:length + added] = values
+        totals = series["totals"]
+        np.cumsum(values, axis=0, out=totals[length + 1:length + added + 1])
+        totals[length + 1:length + added + 1] += totals[length]
+        series["length"] = length + added
+    
+    def _covering(self, location, first_day, last_day):
+        """Return the location's series, extended to cover the given day numbers; call with the lock held."""
+        first_block = first_day // WEATHER_BLOCK_DAYS
+        last_block = last_day // WEATHER_BLOCK_DAYS
+        series = self._series.get(location)
+        
+        if series is None:
+            values = _simulate_weather_blocks(location, first_block, last_block - first_block + 1)
+            series = self._new_series(first_block, values)
+            self._series[location] = series
+            while len(self._series) > self.max_locations:
+                self._series.popitem(last=False)
+            return series
+        
+        self._series.move_to_end(location)
+        stored_first_block = series["first_day"] // WEATHER_BLOCK_DAYS
+        stored_end_block = stored_first_block + series["length"] // WEATHER_BLOCK_DAYS
+        if last_block >= stored_end_block:
+            self._append(series, _simulate_weather_blocks(location, stored_end_block, last_block - stored_end_block + 1))
+        if first_block < stored_first_block:
+            earlier = _simulate_weather_blocks(location, first_block, stored_first_block - first_block)
+            series = self._new_series(first_block, np.concatenate([earlier, series["values"][:series["length"]]]))
+            self._series[location] = series
+        return series
+    
+    def daily(self, location, start_date, end_date):
+        """
+        Return the daily weather of a location between two dates (inclusive).
+        
+        Parameters:
+        -----------
+        location : str
+            Name of the location
+        start_date : datetime
+            First day
+        end_date : datetime
+            Last day
+        
+        Returns:
+        --------
+        pd.DataFrame
+            DataFrame with a 'date' column and one column per WEATHER_VARIABLES entry
+        """
+        first_day, last_day = _day_number(start_date), _day_number(end_date)
+        with self._lock:
+            series = self._covering(location, first_day, last_day)
+            offset = first_day - series["first_day"]
+            values = series["values"][offset:offset + max(0, last_day - first_day + 1)].copy()
+        
+        weather_data = pd.DataFrame(values, columns=list(WEATHER_VARIABLES))
+        weather_data.insert(0, 'date', pd.date_range(pd.Timestamp(start_date).normalize(), periods=len(values), freq="D"))
+        return weather_data
+    
+    def rollup(self, location, start_date, end_date, period="monthly", drought_threshold_mm=DROUGHT_THRESHOLD_MM,
+               reference=None):
+        """
+        Aggregate the stored weather of a location into monthly or seasonal periods.
+        
+        Works from the running totals, so the cost grows with the number of
+        periods rather than the number of days. Takes the same options and
+        returns the same columns as rollup_weather; the first and last periods
+        only count the days inside the range.
+        
+        Parameters:
+        -----------
+        location : str
+            Name of the location
+        start_date : datetime
+            First day
+        end_date : datetime
+            Last day
+        
+        Returns:
+        --------
+        pd.DataFrame
+            One row per period, as returned by rollup_weather
+        """
+        freq, months = _rollup_period(period)
+        first_day, last_day = _day_number(start_date), _day_number(end_date)
+        if last_day < first_day:
+            # An empty range, like daily() returns no days
+            return _empty_weather_rollup(freq, months, drought_threshold_mm, reference)
+        index = pd.period_range(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize(), freq=freq)
+        
+        # Day numbers where each period starts within the range, plus the end of the range
+        bounds = np.empty(len(index) + 1, dtype=np.int64)
+        bounds[:-1] = (index.start_time - _WEATHER_EPOCH).days
+        bounds[0] = first_day
+        bounds[-1] = last_day + 1
+        
+        with self._lock:
+            series = self._covering(location, first_day, last_day)
+            positions = bounds - series["first_day"]
+            sums = np.diff(series["totals"][positions], axis=0)
+        return _weather_rollup_frame(index, np.diff(bounds), sums, months, drought_threshold_mm, reference)
+    
+    def clear(self):
+        """Drop every stored series."""
+        with self._lock:
+            self._series.clear()
+
+
+# Weather series shared by all sessions in this process
+weather_store = WeatherSeriesStore()
+
 def get_historical_weather_data(location, start_date, end_date):
     """
     Generate simulated historical weather data for the given location and time period.
     
+    Days are served from the process-wide weather store, which only simulates
+    the days it does not hold yet; callers get a copy.
+    
     Parameters:
     -----------
     location : str
@@ -170,69 +584,89 @@ def get_historical_weather_data(location, start_date, end_date):
     Returns:
     --------
     pd.DataFrame
-        DataFrame with simulated weather data
+        DataFrame with one row of simulated weather per day
+    """
+    return weather_store.daily(location, start_date, end_date)
+
+def rollup_weather(weather_data, period="monthly", drought_threshold_mm=DROUGHT_THRESHOLD_MM, reference=None):
+    """
+    Aggregate daily weather into monthly or seasonal periods in one grouped pass.
+    
+    Parameters:
+    -----------
+    weather_data : pd.DataFrame
+        Daily weather as returned by get_historical_weather_data
+    period : str
+        One of the WEATHER_ROLLUP_PERIODS keys ("monthly" or "seasonal")
+    drought_threshold_mm : float
+        A period is a drought when its precipitation is below this per month
+    reference : tuple, optional
+        (mean temperature, annual precipitation) to compute anomalies against;
+        by default each period is compared with the mean of the same calendar
+        month or season over the whole series
+    
+    Returns:
+    --------
+    pd.DataFrame
+        One row per period with the period start 'date', mean 'temperature' and
+        'humidity', total 'precipitation', number of 'days', a 'drought' flag and
+        'temperature_anomaly' (°C) and 'precipitation_anomaly_percent' columns
     """
-    # Set a seed for reproducible random data
-    np.random.seed(hash(location) % 2**32)
-    
-    # Generate dates for the time period
-    dates = []
-    current_date = start_date
-    while current_date <= end_date:
-        dates.append(current_date)
-        current_date += timedelta(days=1)
-    
-    # Base values for different regions
-    if "Amazon" in location:
-        base_temp = 27
-        base_rain = 200
-        seasonality = 20
-    elif "Borneo" in location:
-        base_temp = 28
-        base_rain = 220
-        seasonality = 100
-    elif "Congo" in location:
-        base_temp = 25
-        base_rain = 150
-        seasonality = 80
+    freq, months = _rollup_period(period)
+    if weather_data.empty:
+        return _empty_weather_rollup(freq, months, drought_threshold_mm, reference)
+    
+    # Period ordinals index the bincounts directly, which is much cheaper than a
+    # DataFrame groupby for the handful of columns involved
+    ordinals = weather_data['date'].dt.to_period(freq).array.asi8
+    first = ordinals.min()
+    codes = ordinals - first
+    days = np.bincount(codes)
+    present = days > 0
+    
+    sums = np.column_stack([
+        np.bincount(codes, weights=weather_data[variable].to_numpy())[present] for variable in WEATHER_VARIABLES
+    ])
+    index = pd.PeriodIndex.from_ordinals(np.flatnonzero(present) + first, freq=freq)
+    return _weather_rollup_frame(index, days[present], sums, months, drought_threshold_mm, reference)
+
+def _rollup_period(period):
+    if period not in WEATHER_ROLLUP_PERIODS:
+        raise ValueError(f"Unknown period '{period}', expected one of {sorted(WEATHER_ROLLUP_PERIODS)}")
+    return WEATHER_ROLLUP_PERIODS[period]
+
+def _empty_weather_rollup(freq, months, drought_threshold_mm, reference):
+    """Rollup table with no periods, with the same columns and dtypes as a non-empty one."""
+    index = pd.PeriodIndex([], freq=freq)
+    return _weather_rollup_frame(index, np.zeros(0, dtype=np.int64), np.zeros((0, len(WEATHER_VARIABLES))),
+                                 months, drought_threshold_mm, reference)
+
+def _weather_rollup_frame(index, days, sums, months, drought_threshold_mm, reference):
+    """Build the rollup table from per-period day counts and variable sums (columns in WEATHER_VARIABLES order)."""
+    temperature = sums[:, 0] / days
+    precipitation = sums[:, 1]
+    humidity = sums[:, 2] / days
+    
+    if reference is not None:
+        expected_temp = reference[0]
+        expected_precip = reference[1] * months / 12
     else:
-        base_temp = 22
-        base_rain = 120
-        seasonality = 50
-    
-    # Generate data
-    temperatures = []
-    precipitation = []
-    humidity = []
-    
-    for date in dates:
-        # Seasonal component - higher in wet season, lower in dry season
-        month_factor = np.sin((date.month / 12) * 2 * np.pi)
-        season_temp = 3 * month_factor
-        season_rain = seasonality * month_factor
-        
-        # Daily variation
-        daily_temp_var = np.random.normal(0, 1.5)
-        daily_rain_var = np.random.exponential(10)
-        
-        # Calculate values
-        temp = base_temp + season_temp + daily_temp_var
-        rain = max(0, base_rain + season_rain + daily_rain_var)
-        humid = min(100, max(40, 70 + 20 * month_factor + np.random.normal(0, 5)))
-        
-        temperatures.append(temp)
-        precipitation.append(rain)
-        humidity.append(humid)
-    
-    # Create DataFrame
-    weather_data = pd.DataFrame({
-        'date': dates,
-        'temperature': temperatures,
+        # Mean of the same calendar month or season over the series
+        calendar_slot = np.asarray(index.month if months == 1 else index.quarter)
+        slot_periods = np.bincount(calendar_slot)[calendar_slot]
+        expected_temp = np.bincount(calendar_slot, weights=temperature)[calendar_slot] / slot_periods
+        expected_precip = np.bincount(calendar_slot, weights=precipitation)[calendar_slot] / slot_periods
+    
+    return pd.DataFrame({
+        'date': index.start_time,
+        'temperature': temperature,
         'precipitation': precipitation,
-        'humidity': humidity
+        'humidity': humidity,
+        'days': days,
+        'drought': precipitation < drought_threshold_mm * months,
+        'temperature_anomaly': temperature - expected_temp,
+        'precipitation_anomaly_percent': (precipitation - expected_precip) / expected_precip * 100
     })
-    
-    return weather_data
 
 def analyze_weather_impact(location, time_difference_years):
     """
@@ -256,54 +690,23 @@ def analyze_weather_impact(location, time_difference_years):
     # Generate start date based on time difference
     start_date = end_date - timedelta(days=int(time_difference_years * 365))
     
-    # Get weather data
+    # Get weather data; only days not seen by earlier calls are simulated
     weather_data = get_historical_weather_data(location, start_date, end_date)
     
+    # Monthly totals, means and drought flags for the whole period, from the stored running totals
+    reference_temp, reference_precip = _weather_reference_climate(location)
+    monthly_data = weather_store.rollup(location, start_date, end_date, reference=(reference_temp, reference_precip))
+    
     # Calculate metrics
-    avg_temp = weather_data['temperature'].mean()
+    avg_temp = (monthly_data['temperature'] * monthly_data['days']).sum() / monthly_data['days'].sum()
     
     # Instead of summing all daily precipitation, calculate annual average
     # This avoids unrealistically high values when time_difference_years is large
-    total_precipitation = weather_data.groupby(weather_data['date'].dt.year)['precipitation'].sum().mean()
-    avg_monthly_precipitation = total_precipitation / 12
+    total_precipitation = monthly_data.groupby(monthly_data['date'].dt.year)['precipitation'].sum().mean()
     
     # Determine if there were drought conditions
     # This is a simplified approach
-    monthly_precip = []
-    current_month = start_date.month
-    current_year = start_date.year
-    monthly_sum = 0
-    drought_months = 0
-    
-    for idx, row in weather_data.iterrows():
-        if row['date'].month == current_month and row['date'].year == current_year:
-            monthly_sum += row['precipitation']
-        else:
-            monthly_precip.append(monthly_sum)
-            if monthly_sum < 100:  # Simplified drought threshold
-                drought_months += 1
-            monthly_sum = row['precipitation']
-            current_month = row['date'].month
-            current_year = row['date'].year
-    
-    # Add the last month
-    monthly_precip.append(monthly_sum)
-    if monthly_sum < 100:
-        drought_months += 1
-    
-    # Calculate reference values for comparison
-    if "Amazon" in location:
-        reference_temp = 27
-        reference_precip = 2400
-    elif "Borneo" in location:
-        reference_temp = 28
-        reference_precip = 2600
-    elif "Congo" in location:
-        reference_temp = 25
-        reference_precip = 1800
-    else:
-        reference_temp = 22
-        reference_precip = 1500
+    drought_months = int(monthly_data['drought'].sum())
     
     # Calculate anomalies
     temp_anomaly = avg_temp - reference_temp
@@ -336,13 +739,6 @@ def analyze_weather_impact(location, time_difference_years):
     else:
         recommendation = "Standard conservation practices should be effective"
     
-    # Create plots and visualization data
-    monthly_avg_temp = weather_data.groupby(weather_data['date'].dt.to_period("M")).agg({
-        'temperature': 'mean',
-        'precipitation': 'sum'
-    }).reset_index()
-    monthly_avg_temp['date'] = monthly_avg_temp['date'].dt.to_timestamp()
-    
     return {
         "average_temperature": avg_temp,
         "temperature_anomaly": temp_anomaly,
@@ -353,7 +749,7 @@ def analyze_weather_impact(location, time_difference_years):
         "impact_factors": impact_factors,
         "recommendation": recommendation,
         "weather_data": weather_data,
-        "monthly_data": monthly_avg_temp
+        "monthly_data": monthly_data
     }
 
 def create_weather_plots(weather_impact):
@@ -419,6 +815,79 @@ def create_weather_plots(weather_impact):
         "precipitation_plot": precip_fig
     }
 
+@functools.lru_cache(maxsize=PROJECTION_CACHE_SIZE)
+def _simulate_log_survival(annual_rate, simulations, rate_uncertainty, annual_volatility, shock_probability,
+                           shock_rate, horizon, seed):
+    """Log of the fraction of today's coverage left after each year, shape (simulations, horizon + 1)."""
+    rng = np.random.default_rng(seed)
+    trajectory_rates = annual_rate * (1 + rate_uncertainty * rng.standard_normal((simulations, 1)))
+    rates = trajectory_rates * (1 + annual_volatility * rng.standard_normal((simulations, horizon)))
+    rates += shock_rate * (rng.random((simulations, horizon)) < shock_probability)
+    
+    # Compounding is a cumulative sum in log space; rates are capped just below total loss
+    log_survival = np.zeros((simulations, horizon + 1))
+    np.cumsum(np.log1p(-np.minimum(rates, 99.9) / 100), axis=1, out=log_survival[:, 1:])
+    log_survival.flags.writeable = False
+    return log_survival
+
+def simulate_coverage_trajectories(current_coverage, annual_rate, years_to_project, simulations=PROJECTION_SIMULATIONS,
+                                   rate_uncertainty=PROJECTION_RATE_UNCERTAINTY,
+                                   annual_volatility=PROJECTION_ANNUAL_VOLATILITY,
+                                   shock_probability=PROJECTION_SHOCK_PROBABILITY, shock_rate=PROJECTION_SHOCK_RATE,
+                                   seed=PROJECTION_SEED):
+    """
+    Simulate stochastic forest coverage trajectories as one NumPy broadcast.
+    
+    Each trajectory draws its own underlying rate around annual_rate, varies it
+    from year to year and adds occasional loss shocks. Draws are cached per rate
+    and settings over PROJECTION_HORIZON_YEARS, so redraws for another
+    projection length or starting coverage only rescale and slice them.
+    
+    Parameters:
+    -----------
+    current_coverage : float
+        Forest coverage today (%)
+    annual_rate : float
+        Expected annual deforestation rate (% of remaining forest per year)
+    years_to_project : int
+        Number of years to return trajectories for
+    simulations : int
+        Number of trajectories
+    rate_uncertainty : float
+        Relative standard deviation of each trajectory's underlying rate
+    annual_volatility : float
+        Relative standard deviation of the rate from one year to the next
+    shock_probability : float
+        Yearly probability of a loss shock
+    shock_rate : float
+        Extra deforestation rate (percentage points) in a shock year
+    seed : int
+        Seed of the random generator, so redraws are stable
+    
+    Returns:
+    --------
+    dict
+        Dictionary with the 'coverage' trajectories (simulations x years_to_project + 1,
+        capped at 100%), the 'percentiles' (one row per PROJECTION_PERCENTILES entry)
+        and 'years_to_50_percent' per trajectory (NaN when not reached within
+        PROJECTION_HORIZON_YEARS)
+    """
+    horizon = max(PROJECTION_HORIZON_YEARS, years_to_project)
+    log_survival = _simulate_log_survival(float(annual_rate), simulations, rate_uncertainty, annual_volatility,
+                                          shock_probability, shock_rate, horizon, seed)
+    
+    coverage = np.minimum(current_coverage * np.exp(log_survival[:, :years_to_project + 1]), 100)
+    
+    # First year in which half of today's forest is gone
+    halved = log_survival <= np.log(0.5)
+    years_to_half = np.where(halved.any(axis=1), halved.argmax(axis=1), np.nan)
+    
+    return {
+        "coverage": coverage,
+        "percentiles": np.percentile(coverage, PROJECTION_PERCENTILES, axis=0),
+        "years_to_50_percent": years_to_half
+    }
+
 def create_deforestation_projection(metrics, years_to_project=10):
     """
     Create a projection of future deforestation trends.
@@ -433,43 +902,35 @@ def create_deforestation_projection(metrics, years_to_project=10):
     Returns:
     --------
     dict
-        Dictionary with projection data and plots
+        Dictionary with the scenario projections and their plot, the years until
+        half of today's forest is lost at the current rate, the P5/P50/P95 bands
+        of the simulated trajectories and the simulated years until 50% loss
+        (per trajectory and as percentiles)
     """
     # Start with current forest coverage
     current_coverage = metrics["after_coverage"]
     annual_rate = metrics["annual_rate"]
     
     # Project years
-    years = list(range(datetime.now().year, datetime.now().year + years_to_project + 1))
-    
-    # Create 3 scenarios
-    scenarios = {
-        "Current Trend": annual_rate,
-        "Improved Conservation (50% reduction)": annual_rate * 0.5,
-        "Accelerated Loss (50% increase)": annual_rate * 1.5
-    }
+    years = np.arange(datetime.now().year, datetime.now().year + years_to_project + 1)
+    elapsed = np.arange(years_to_project + 1)
     
-    projection_data = {}
-    for scenario, rate in scenarios.items():
-        coverage_values = [current_coverage]
-        for i in range(years_to_project):
-            next_coverage = coverage_values[-1] * (1 - rate/100)
-            coverage_values.append(next_coverage)
-        projection_data[scenario] = coverage_values
-    
-    # Create projection plot
-    projection_df = pd.DataFrame({
-        'Year': years
-    })
+    # Scenarios compound at a constant rate, which has a closed form
+    projection_df = pd.DataFrame({'Year': years})
+    for scenario, multiplier in PROJECTION_SCENARIOS.items():
+        projection_df[scenario] = current_coverage * (1 - min(annual_rate * multiplier, 100) / 100) ** elapsed
     
-    for scenario, values in projection_data.items():
-        projection_df[scenario] = values
+    # Uncertainty around the current trend
+    simulation = simulate_coverage_trajectories(current_coverage, annual_rate, years_to_project)
+    percentile_bands = pd.DataFrame({'Year': years})
+    for percentile, values in zip(PROJECTION_PERCENTILES, simulation["percentiles"]):
+        percentile_bands[f"P{percentile}"] = values
     
     # Convert to long format for plotting
     projection_df_long = pd.melt(
         projection_df, 
         id_vars=['Year'], 
-        value_vars=list(scenarios.keys()),
+        value_vars=list(PROJECTION_SCENARIOS),
         var_name='Scenario', 
         value_name='Forest Coverage (%)'
     )
@@ -482,6 +943,18 @@ def create_deforestation_projection(metrics, years_to_project=10):
         color='Scenario',
         title='Projected Forest Coverage'
     )
+    
+    # Shaded P5-P95 band of the simulated current-trend trajectories
+    low, high = f"P{PROJECTION_PERCENTILES[0]}", f"P{PROJECTION_PERCENTILES[-1]}"
+    projection_fig.add_trace(go.Scatter(
+        x=years, y=percentile_bands[high],
+        mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'
+    ))
+    projection_fig.add_trace(go.Scatter(
+        x=years, y=percentile_bands[low],
+        mode='lines', line=dict(width=0), fill='tonexty', fillcolor='rgba(255, 152, 0, 0.2)',
+        name=f"Simulated range ({low}-{high})", hoverinfo='skip'
+    ))
     projection_fig.update_layout(
         template="plotly_white",
         xaxis=dict(
@@ -496,13 +969,22 @@ def create_deforestation_projection(metrics, years_to_project=10):
         hovermode="x unified"
     )
     
-    # Calculate critical metrics
+    # Calculate critical metrics: years until half of today's forest is gone at the current rate
     years_to_50_percent = None
     if annual_rate > 0:
-        years_to_50_percent = int(50 / annual_rate)
+        years_to_50_percent = int(np.log(0.5) / np.log1p(-min(annual_rate, 99.9) / 100))
+    
+    # Trajectories that never reach 50% loss count as infinitely far away
+    years_to_half = np.nan_to_num(simulation["years_to_50_percent"], nan=np.inf)
+    years_to_50_percent_range = dict(zip(
+        PROJECTION_PERCENTILES, np.percentile(years_to_half, PROJECTION_PERCENTILES, method="lower")
+    ))
     
     return {
         "projection_data": projection_df,
         "projection_plot": projection_fig,
-        "years_to_50_percent": years_to_50_percent
+        "years_to_50_percent": years_to_50_percent,
+        "percentile_bands": percentile_bands,
+        "years_to_50_percent_samples": simulation["years_to_50_percent"],
+        "years_to_50_percent_percentiles": years_to_50_percent_range
     }
\ No newline at end of file
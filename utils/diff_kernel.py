@@ -0,0 +1,87 @@
+import numpy as np
+
+
+def allocate_diff_buffers(shape):
+    """
+    Allocate the reusable buffers for abs_diff_sum.
+
+    Parameters:
+    -----------
+    shape : tuple
+        (height, width) of the images to compare
+
+    Returns:
+    --------
+    dict
+        Dictionary with the uint16 "change_sum" output and two uint8 "high" and "low"
+        scratch planes; about 4 bytes per pixel in total
+    """
+    return {
+        "change_sum": np.empty(shape, dtype=np.uint16),
+        "high": np.empty(shape, dtype=np.uint8),
+        "low": np.empty(shape, dtype=np.uint8)
+    }
+
+
+def abs_diff_sum(before, after, buffers=None, channel_diff=None):
+    """
+    Sum the absolute per-channel difference of two uint8 images without float intermediates.
+
+    Each channel is processed as max - min in a uint8 scratch plane, which cannot
+    overflow, and accumulated into a uint16 plane (0-765 fits easily).
+
+    Parameters:
+    -----------
+    before : np.ndarray
+        uint8 array of shape (height, width, channels)
+    after : np.ndarray
+        uint8 array with the same shape as before
+    buffers : dict, optional
+        Buffers from allocate_diff_buffers for this shape, reused between calls
+    channel_diff : np.ndarray, optional
+        uint8 array shaped like before that receives the per-channel absolute difference
+
+    Returns:
+    --------
+    np.ndarray
+        uint16 array of shape (height, width) with the summed absolute difference;
+        this is buffers["change_sum"] when buffers are given
+    """
+    if buffers is None:
+        buffers = allocate_diff_buffers(before.shape[:2])
+    change_sum, high, low = buffers["change_sum"], buffers["high"], buffers["low"]
+
+    change_sum.fill(0)
+    for channel in range(before.shape[2]):
+        np.maximum(before[:, :, channel], after[:, :, channel], out=high)
+        np.minimum(before[:, :, channel], after[:, :, channel], out=low)
+        high -= low
+        change_sum += high
+        if channel_diff is not None:
+            channel_diff[:, :, channel] = high
+    return change_sum
+
+
+def threshold_masks(change_sum, thresholds, out=None):
+    """
+    Threshold a summed difference at several levels.
+
+    Parameters:
+    -----------
+    change_sum : np.ndarray
+        Summed difference as returned by abs_diff_sum
+    thresholds : sequence
+        Levels to compare against; pixels strictly above a level are set in its mask
+    out : np.ndarray, optional
+        Preallocated boolean array of shape (len(thresholds), height, width)
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean array of shape (len(thresholds), height, width)
+    """
+    if out is None:
+        out = np.empty((len(thresholds),) + change_sum.shape, dtype=bool)
+    for index, threshold in enumerate(thresholds):
+        np.greater(change_sum, threshold, out=out[index])
+    return out
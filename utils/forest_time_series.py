@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+# Simulated forest cover by region: starting cover (%), change per year (percentage
+# points), noise level, and known deforestation events as {date: percentage points}
+REGION_PROFILES = {
+    "Amazon Rainforest": {
+        "start_value": 95.0,
+        "yearly_change": -0.72,
+        "variation": 0.25,
+        "events": {
+            "2004-07-01": -1.2,  # Increased logging
+            "2007-11-01": -1.7,  # Major agricultural expansion
+            "2016-05-01": -2.1,  # Severe drought and fires
+            "2019-08-01": -2.4,  # Significant policy changes
+            "2022-03-01": -1.8,  # Recent acceleration
+        }
+    },
+    "Borneo": {
+        "start_value": 90.0,
+        "yearly_change": -1.1,
+        "variation": 0.3,
+        "events": {
+            "2005-04-01": -2.2,  # Palm oil expansion
+            "2009-09-01": -1.9,  # Timber concessions
+            "2015-02-01": -2.6,  # Major fires
+            "2018-06-01": -1.5,  # Industrial plantations
+            "2021-11-01": -1.3,  # Recent changes
+        }
+    },
+    "Congo Basin": {
+        "start_value": 92.0,
+        "yearly_change": -0.45,
+        "variation": 0.2,
+        "events": {
+            "2006-03-01": -0.8,  # Road development
+            "2010-08-01": -1.1,  # Mining concessions
+            "2014-05-01": -1.4,  # Agricultural expansion
+            "2017-11-01": -1.2,  # Increased logging
+            "2020-07-01": -0.9,  # Recent pressures
+        }
+    }
+}
+DEFAULT_REGION_PROFILE = {"start_value": 88.0, "yearly_change": -0.85, "variation": 0.3, "events": {}}
+
+# Supported resolutions: pandas frequency and number of samples per year
+TIME_SERIES_RESOLUTIONS = {
+    "quarterly": ("QS", 4),
+    "monthly": ("MS", 12),
+    "weekly": ("W-MON", 365.25 / 7),
+    "daily": ("D", 365.25)
+}
+
+# Default span: 92 quarters from 2000 to 2022
+DEFAULT_START_DATE = "2000-01-01"
+DEFAULT_END_DATE = "2022-12-31"
+
+# Metric columns of the generated frames
+TIME_SERIES_METRICS = ("forest_cover", "urban_expansion", "agricultural_expansion", "logging_activity")
+
+
+def region_profile(region):
+    """Return the simulation profile of a region, or the default profile for unknown regions."""
+    return REGION_PROFILES.get(region, DEFAULT_REGION_PROFILE)
+
+
+def generate_forest_time_series(regions, start_date=DEFAULT_START_DATE, end_date=DEFAULT_END_DATE,
+                                resolution="quarterly", seed=None):
+    """
+    Generate simulated forest cover and land-use time series for many regions at once.
+
+    All regions and samples are computed as (regions x samples) arrays. Each known
+    deforestation event within the span is applied to the first sample on or after
+    its date.
+
+    Parameters:
+    -----------
+    regions : list
+        Unique region names; names without a profile use DEFAULT_REGION_PROFILE
+    start_date : str or datetime
+        First sample date
+    end_date : str or datetime
+        Last possible sample date
+    resolution : str
+        One of the TIME_SERIES_RESOLUTIONS keys
+    seed : int, optional
+        Seed of the random generator; fresh noise on every call when omitted
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Long-format frame with a categorical 'region' column, a 'date' column and
+        one float32 column per TIME_SERIES_METRICS entry, ordered by region and date
+    """
+    if resolution not in TIME_SERIES_RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}', expected one of {sorted(TIME_SERIES_RESOLUTIONS)}")
+    freq, samples_per_year = TIME_SERIES_RESOLUTIONS[resolution]
+
+    regions = list(regions)
+    dates = pd.date_range(start_date, end_date, freq=freq)
+    rng = np.random.default_rng(seed)
+    shape = (len(regions), len(dates))
+
+    profiles = [region_profile(region) for region in regions]
+    start_value = np.array([profile["start_value"] for profile in profiles], dtype=np.float32)[:, None]
+    yearly_change = np.array([profile["yearly_change"] for profile in profiles], dtype=np.float32)[:, None]
+    variation = np.array([profile["variation"] for profile in profiles], dtype=np.float32)[:, None]
+
+    # Long-term trend plus one seasonal cycle per year
+    years_passed = (np.arange(len(dates)) / samples_per_year).astype(np.float32)
+    season = np.sin(2 * np.pi * years_passed)
+
+    value = start_value + yearly_change * years_passed + 0.2 * season
+    value += variation * rng.standard_normal(shape, dtype=np.float32)
+
+    # Apply specific deforestation events by sample index
+    event_rows, event_dates, event_changes = [], [], []
+    for row, profile in enumerate(profiles):
+        for event_date, change in profile["events"].items():
+            event_rows.append(row)
+            event_dates.append(pd.Timestamp(event_date))
+            event_changes.append(change)
+    if event_rows:
+        event_dates = pd.DatetimeIndex(event_dates)
+        event_columns = dates.searchsorted(event_dates)
+        # Events outside the requested span are not part of the series
+        inside = (event_dates >= pd.Timestamp(start_date)) & (event_columns < len(dates))
+        np.add.at(value, (np.array(event_rows)[inside], event_columns[inside]),
+                  np.array(event_changes, dtype=np.float32)[inside])
+
+    loss = 100 - value
+    metrics = {
+        # Ensure value is between 0 and 100
+        "forest_cover": np.clip(value, 0, 100),
+        # Urban expansion: inverse of forest loss but not exactly, capped at a reasonable level
+        "urban_expansion": np.minimum(loss + 5, 35) + 0.15 * rng.standard_normal(shape, dtype=np.float32),
+        # Agricultural expansion correlates with forest loss, higher than urban but capped
+        "agricultural_expansion": np.minimum(loss + 10, 70) + 0.2 * rng.standard_normal(shape, dtype=np.float32),
+        # Logging activity fluctuates more, with a stronger seasonal effect
+        "logging_activity": np.maximum(
+            0, np.minimum(loss - 5, 40) + 0.4 * season + 0.4 * rng.standard_normal(shape, dtype=np.float32)
+        )
+    }
+
+    frame = {
+        "region": pd.Categorical.from_codes(np.repeat(np.arange(len(regions)), len(dates)), categories=regions),
+        "date": np.tile(dates.values, len(regions))
+    }
+    for name in TIME_SERIES_METRICS:
+        frame[name] = metrics[name].astype(np.float32, copy=False).ravel()
+    return pd.DataFrame(frame)
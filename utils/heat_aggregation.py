@@ -0,0 +1,125 @@
+import numpy as np
+
+# Most heat points sent to the browser by one heatmap layer
+DEFAULT_MAX_HEAT_POINTS = 2000
+
+# Supported binning grids
+HEAT_GRIDS = ("square", "hex")
+
+# Decimal places kept for binned coordinates (5 is about 1 m)
+HEAT_COORDINATE_DECIMALS = 5
+
+
+def _square_cells(lats, lons, max_cells):
+    """Assign points to a grid of at most max_cells square-ish cells over their bounding box."""
+    lat_min, lon_min = lats.min(), lons.min()
+    height = max(lats.max() - lat_min, 1e-9)
+    width = max(lons.max() - lon_min, 1e-9)
+
+    columns = int(np.clip(round(np.sqrt(max_cells * width / height)), 1, max_cells))
+    rows = max(1, max_cells // columns)
+    column = np.minimum(((lons - lon_min) * (columns / width)).astype(np.int64), columns - 1)
+    row = np.minimum(((lats - lat_min) * (rows / height)).astype(np.int64), rows - 1)
+    return row * columns + column, rows * columns
+
+
+def _hex_cells(lats, lons, max_cells):
+    """Assign points to pointy-top hexagons sized so the bounding box holds about max_cells of them."""
+    lat_min, lon_min = lats.min(), lons.min()
+    height = max(lats.max() - lat_min, 1e-9)
+    width = max(lons.max() - lon_min, 1e-9)
+
+    # A pointy-top hexagon of circumradius size covers 3 * sqrt(3) / 2 * size^2. Columns are
+    # sqrt(3) * size apart and rows 1.5 * size, so the lower bounds keep a thin strip of
+    # points (all on one parallel, say) from being split into more than max_cells hexagons
+    size = max(
+        np.sqrt(width * height / max_cells / (1.5 * np.sqrt(3))),
+        width / (np.sqrt(3) * max_cells),
+        height / (1.5 * max_cells)
+    )
+    x = (lons - lon_min) / size
+    y = (lats - lat_min) / size
+
+    # Fractional axial coordinates, rounded to the nearest hexagon in cube coordinates
+    q = np.sqrt(3) / 3 * x - y / 3
+    r = 2 / 3 * y
+    s = -q - r
+    q_round, r_round, s_round = np.rint(q), np.rint(r), np.rint(s)
+    q_diff, r_diff, s_diff = np.abs(q_round - q), np.abs(r_round - r), np.abs(s_round - s)
+    fix_q = (q_diff > r_diff) & (q_diff > s_diff)
+    fix_r = ~fix_q & (r_diff > s_diff)
+    q_round = np.where(fix_q, -r_round - s_round, q_round)
+    r_round = np.where(fix_r, -q_round - s_round, r_round)
+
+    # Offset (odd-r) coordinates, so the ids span the bounding box rather than the
+    # larger parallelogram around it that axial coordinates would need
+    row = r_round.astype(np.int64)
+    column = q_round.astype(np.int64) + (row - (row & 1)) // 2
+    row_index = row - row.min()
+    column_index = column - column.min()
+    column_count = int(column_index.max()) + 1
+    return row_index * column_count + column_index, column_count * (int(row_index.max()) + 1)
+
+
+def bin_heat_points(lats, lons, weights=None, max_points=DEFAULT_MAX_HEAT_POINTS, grid="square", normalize=True):
+    """
+    Aggregate heat points into grid cells so the browser only receives cell centroids.
+
+    Points are binned over their bounding box with np.bincount; each non-empty
+    cell becomes one point at the weighted centroid of its members, carrying
+    their summed weight. Up to max_points points are passed through unbinned,
+    weights included.
+
+    Parameters:
+    -----------
+    lats : array-like
+        Latitudes of the points
+    lons : array-like
+        Longitudes of the points
+    weights : array-like, optional
+        Intensity of each point; 1 for every point when omitted
+    max_points : int
+        Most points returned; the heaviest cells are kept if a grid yields more
+    grid : str
+        "square" or "hex"
+    normalize : bool
+        Scale binned weights so the heaviest cell has weight 1, matching the default
+        maximum intensity of the heatmap layer; summed cell weights otherwise grow
+        with the number of points binned
+
+    Returns:
+    --------
+    list
+        [lat, lon, weight] rows ready for folium.plugins.HeatMap
+    """
+    if grid not in HEAT_GRIDS:
+        raise ValueError(f"Unknown grid '{grid}', expected one of {HEAT_GRIDS}")
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    weights = np.ones_like(lats) if weights is None else np.asarray(weights, dtype=np.float64)
+    if len(lats) == 0:
+        return []
+
+    if len(lats) > max_points:
+        cells, cell_count = (_square_cells if grid == "square" else _hex_cells)(lats, lons, max_points)
+        total = np.bincount(cells, weights=weights, minlength=cell_count)
+        members = np.bincount(cells, minlength=cell_count)
+        occupied = members > 0
+
+        # Weighted centroid, falling back to the plain mean for cells without weight
+        centroid_weights = np.where(total[cells] > 0, weights, 1.0)
+        centroid_total = np.bincount(cells, weights=centroid_weights, minlength=cell_count)[occupied]
+        lats = np.bincount(cells, weights=lats * centroid_weights, minlength=cell_count)[occupied] / centroid_total
+        lons = np.bincount(cells, weights=lons * centroid_weights, minlength=cell_count)[occupied] / centroid_total
+        weights = total[occupied]
+
+        if len(weights) > max_points:
+            heaviest = np.argpartition(weights, -max_points)[-max_points:]
+            lats, lons, weights = lats[heaviest], lons[heaviest], weights[heaviest]
+
+        if normalize and weights.max() > 0:
+            weights = weights / weights.max()
+
+    return np.column_stack([
+        np.round(lats, HEAT_COORDINATE_DECIMALS), np.round(lons, HEAT_COORDINATE_DECIMALS), weights
+    ]).tolist()
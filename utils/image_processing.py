@@ -1,8 +1,11 @@
 import numpy as np
-from PIL import Image, ImageDraw, ImageEnhance
-import random
+from PIL import Image, ImageDraw, ImageEnhance, ImageFont
+from utils.vegetation import detect_cleared_regions
+from utils.parallel import parallel_detect_deforestation_regions
+from utils.alignment import align_pair, DEFAULT_RESAMPLING
+from utils.change_product import build_change_product
 
-def process_satellite_image(image):
+def process_satellite_image(image, reference_image=None, max_regions=200, workers=None):
     """
     Process a satellite image to detect deforestation.
     
@@ -10,6 +13,14 @@ def process_satellite_image(image):
     -----------
     image : PIL.Image
         The satellite image to process
+    reference_image : PIL.Image, optional
+        An earlier image of the same scene. When given, areas that lost forest
+        since the reference are detected; otherwise non-forest patches in the
+        image itself are reported
+    max_regions : int
+        Maximum number of (largest) areas to report
+    workers : int, optional
+        Number of worker processes for large scenes (defaults to all cores)
         
     Returns:
     --------
@@ -18,65 +29,141 @@ def process_satellite_image(image):
         where processed_image is a PIL Image with highlighted deforestation
         and deforested_areas is a list of dictionaries with bounding box coordinates
     """
-    # Convert PIL image to numpy array for processing
-    img_array = np.array(image)
+    # Detect connected regions with the vegetation-index rules
+    if reference_image is not None:
+        # Regions are detected on the reference grid; map them back if sizes differ
+        deforested_areas, _ = parallel_detect_deforestation_regions(
+            reference_image, image, max_regions=max_regions, workers=workers
+        )
+        if reference_image.size != image.size:
+            scale_x = image.width / reference_image.width
+            scale_y = image.height / reference_image.height
+            for area in deforested_areas:
+                area["x1"] = int(area["x1"] * scale_x)
+                area["x2"] = int(area["x2"] * scale_x)
+                area["y1"] = int(area["y1"] * scale_y)
+                area["y2"] = int(area["y2"] * scale_y)
+    else:
+        deforested_areas = detect_cleared_regions(image, max_regions=max_regions)
     
-    # Create a copy of the image for highlighting deforestation
-    analyzed_img = image.copy()
-    draw = ImageDraw.Draw(analyzed_img)
+    # Highlight all detected areas in a single pass
+    analyzed_img = draw_deforestation_annotations(image, deforested_areas)
+    
+    return analyzed_img, deforested_areas
+
+def analyze_image_pair(before_image, after_image, workers=None, resampling=DEFAULT_RESAMPLING, change_product=None):
+    """
+    Run the full before/after analysis used by the upload page.
+    
+    Parameters:
+    -----------
+    before_image : PIL.Image
+        The earlier satellite image
+    after_image : PIL.Image
+        The later satellite image; resampled onto the before image if sizes differ
+    workers : int, optional
+        Number of worker processes for large scenes (defaults to all cores)
+    resampling : str
+        Resampling quality for the alignment (see utils.alignment.RESAMPLING_FILTERS)
+    change_product : dict, optional
+        The pair's change product (see utils.change_product); built here when omitted.
+        The heatmap and overlay are read from it, so the pair is only compared once
+        
+    Returns:
+    --------
+    dict
+        Dictionary with the annotated "before_analyzed" and "after_analyzed" images
+        (both on the before image grid),
+        the "deforested_areas" list and the "diff_visualization" heatmap and
+        "change_overlay" images
+    """
+    # Align the pair once; every stage below then works on the same grid
+    before_image, after_image = align_pair(before_image, after_image, resampling)
     
-    # In a real application, this is where you would apply an actual
-    # deforestation detection algorithm. Here we're simulating detection
-    # by randomly generating "deforested" areas.
+    # Process the before image for reference
+    before_analyzed, _ = process_satellite_image(before_image, workers=workers)
     
-    # Get image dimensions
-    width, height = image.size
+    # Process the after image for comparison and detection
+    after_analyzed, deforested_areas = process_satellite_image(
+        after_image, reference_image=before_image, workers=workers
+    )
     
-    # Generate random deforested areas
-    num_areas = random.randint(3, 8)
-    deforested_areas = []
+    # Change heatmap and highlighted overlay from the shared, tiled pixel comparison
+    if change_product is None:
+        change_product = build_change_product(before_image, after_image, resampling, workers)
     
-    for _ in range(num_areas):
-        # Generate random box dimensions (between 5-15% of image size)
-        box_width = random.randint(int(width * 0.05), int(width * 0.15))
-        box_height = random.randint(int(height * 0.05), int(height * 0.15))
-        
-        # Generate random position
-        x1 = random.randint(0, width - box_width)
-        y1 = random.randint(0, height - box_height)
-        x2 = x1 + box_width
-        y2 = y1 + box_height
-        
-        # Add to list of deforested areas
-        area = {
-            "x1": x1,
-            "y1": y1,
-            "x2": x2,
-            "y2": y2,
-            "confidence": random.uniform(0.75, 0.98),
-            "area_km2": round(box_width * box_height / 1000, 2)  # Simulated area
-        }
-        deforested_areas.append(area)
-        
-        # Draw red box with some transparency
-        draw.rectangle([(x1, y1), (x2, y2)], outline="red", width=3)
-        
-        # Add a semi-transparent red fill
-        overlay = Image.new('RGBA', analyzed_img.size, (0, 0, 0, 0))
-        overlay_draw = ImageDraw.Draw(overlay)
-        overlay_draw.rectangle([(x1, y1), (x2, y2)], fill=(255, 0, 0, 75))
+    return {
+        "before_analyzed": before_analyzed,
+        "after_analyzed": after_analyzed,
+        "deforested_areas": deforested_areas,
+        "diff_visualization": Image.fromarray(np.asarray(change_product["heatmap"])),
+        "change_overlay": Image.fromarray(np.asarray(change_product["overlay"]))
+    }
+
+def draw_deforestation_annotations(image, deforested_areas, fill_color=(255, 0, 0), fill_alpha=75,
+                                   outline_color="red", outline_width=3, show_labels=False):
+    """
+    Draw highlighted boxes for detected deforestation areas onto a copy of an image.
+    
+    Only the pixels inside each box are blended, so the cost grows with the total
+    box area rather than with the number of boxes times the image size.
+    
+    Parameters:
+    -----------
+    image : PIL.Image
+        The satellite image to annotate
+    deforested_areas : list
+        List of dictionaries with "x1", "y1", "x2", "y2" box coordinates and,
+        when labels are shown, a "confidence" value
+    fill_color : tuple
+        RGB color of the semi-transparent box fill
+    fill_alpha : int
+        Opacity of the box fill (0-255)
+    outline_color : str or tuple
+        Color of the box outline
+    outline_width : int
+        Width of the box outline in pixels
+    show_labels : bool
+        Whether to write the area number and confidence next to each box
         
-        # Convert analyzed_img to RGBA if it isn't already
-        if analyzed_img.mode != 'RGBA':
-            analyzed_img = analyzed_img.convert('RGBA')
-            
-        # Paste the overlay onto the analyzed image
-        analyzed_img = Image.alpha_composite(analyzed_img, overlay)
+    Returns:
+    --------
+    PIL.Image
+        RGB image with the deforested areas highlighted
+    """
+    analyzed_img = image.convert('RGB') if image.mode != 'RGB' else image.copy()
+    width, height = analyzed_img.size
+    alpha = fill_alpha / 255.0
     
-    # Convert back to RGB for display compatibility
-    analyzed_img = analyzed_img.convert('RGB')
+    # Clip every box to the image once; boxes are inclusive of their far edge
+    boxes = []
+    for area in deforested_areas:
+        x1, y1 = max(0, int(area["x1"])), max(0, int(area["y1"]))
+        x2, y2 = min(width, int(area["x2"]) + 1), min(height, int(area["y2"]) + 1)
+        if x2 > x1 and y2 > y1:
+            boxes.append((area, (x1, y1, x2, y2)))
     
-    return analyzed_img, deforested_areas
+    # Blend the fill color into each box region only (the dirty region) and paste it back
+    for _, box in boxes:
+        region = analyzed_img.crop(box)
+        tint = Image.new('RGB', region.size, fill_color)
+        analyzed_img.paste(Image.blend(region, tint, alpha), box)
+    
+    # Draw all outlines and labels with a single drawing context
+    draw = ImageDraw.Draw(analyzed_img)
+    font = ImageFont.load_default() if show_labels else None
+    for i, (area, (x1, y1, x2, y2)) in enumerate(boxes):
+        draw.rectangle([(x1, y1), (x2 - 1, y2 - 1)], outline=outline_color, width=outline_width)
+        
+        if show_labels:
+            label = f"#{i + 1}"
+            if "confidence" in area:
+                label += f" {area['confidence']:.0%}"
+            text_box = draw.textbbox((x1 + outline_width + 2, y1 + outline_width + 2), label, font=font)
+            draw.rectangle(text_box, fill=(0, 0, 0))
+            draw.text((text_box[0], text_box[1]), label, fill=(255, 255, 255), font=font)
+    
+    return analyzed_img
 
 def enhance_satellite_image(image, brightness=1.0, contrast=1.0, color=1.2):
     """
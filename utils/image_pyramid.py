@@ -0,0 +1,233 @@
+import io
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from utils.result_cache import image_fingerprint
+from utils.memory_budget import memory_budget
+
+# Rendered widths (in CSS pixels) of the layouts images are shown in, with the wide page layout
+FULL_DISPLAY_WIDTH = 1600
+COLUMN_DISPLAY_WIDTH = 800
+
+# Levels are halved until they are narrower than this
+PYRAMID_MIN_WIDTH = 256
+
+# Upper bound on the decoded size of all cached pyramid levels
+DEFAULT_MAX_PYRAMID_BYTES = 256 * 1024 * 1024
+
+# Upper bound on the decoded size of all cached previews of encoded files
+DEFAULT_MAX_PREVIEW_BYTES = 64 * 1024 * 1024
+
+# Modes Image.reduce supports directly; anything else is converted first
+_REDUCIBLE_MODES = ("L", "LA", "RGB", "RGBA", "I", "F")
+
+_pyramids = OrderedDict()  # fingerprint -> (levels, size in bytes)
+_pyramid_bytes = 0
+_pyramids_lock = threading.Lock()
+
+_previews = OrderedDict()  # (file key, display width) -> (image, size in bytes)
+_preview_bytes = 0
+_previews_lock = threading.Lock()
+
+# Owner ids the cached levels and previews are registered under in the process memory budget
+_PYRAMID_BUDGET_ID = "pyramid_cache"
+_PREVIEW_BUDGET_ID = "preview_cache"
+
+
+def _level_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+def _drop_pyramid(key):
+    """Memory budget eviction callback: forget one cached pyramid."""
+    global _pyramid_bytes
+    with _pyramids_lock:
+        entry = _pyramids.pop(key, None)
+        if entry is not None:
+            _pyramid_bytes -= entry[1]
+
+
+def _drop_preview(key):
+    """Memory budget eviction callback: forget one cached preview."""
+    global _preview_bytes
+    with _previews_lock:
+        entry = _previews.pop(key, None)
+        if entry is not None:
+            _preview_bytes -= entry[1]
+
+
+def build_pyramid(image, min_width=PYRAMID_MIN_WIDTH):
+    """
+    Build the downsampled levels of an image by repeated 2x box reduction.
+
+    Parameters:
+    -----------
+    image : PIL.Image
+        The full-resolution image
+    min_width : int
+        Stop once a level is narrower than this
+
+    Returns:
+    --------
+    list
+        Downsampled PIL images from the largest to the smallest, not including
+        the full-resolution image itself
+    """
+    levels = []
+    level = image
+    if level.mode not in _REDUCIBLE_MODES:
+        level = level.convert("RGBA" if "transparency" in level.info else "RGB")
+    while level.width // 2 >= min_width and level.height >= 2:
+        level = level.reduce(2)
+        levels.append(level)
+    return levels
+
+
+def get_pyramid(image):
+    """
+    Return the cached pyramid levels of an image, building them on first use.
+
+    Pyramids are keyed by image content, so an image that is re-opened on every
+    rerun (such as a file uploader result) is only reduced once.
+
+    Parameters:
+    -----------
+    image : PIL.Image
+        The full-resolution image
+
+    Returns:
+    --------
+    list
+        Downsampled levels as returned by build_pyramid
+    """
+    global _pyramid_bytes
+    key = image_fingerprint(image)
+    with _pyramids_lock:
+        if key in _pyramids:
+            _pyramids.move_to_end(key)
+            memory_budget.touch(_PYRAMID_BUDGET_ID, key)
+            return _pyramids[key][0]
+
+    levels = build_pyramid(image)
+    size = sum(_level_bytes(level) for level in levels)
+
+    with _pyramids_lock:
+        stored = key not in _pyramids and size <= DEFAULT_MAX_PYRAMID_BYTES
+        if stored:
+            _pyramids[key] = (levels, size)
+            _pyramid_bytes += size
+            while _pyramid_bytes > DEFAULT_MAX_PYRAMID_BYTES:
+                evicted_key, (_, evicted_size) = _pyramids.popitem(last=False)
+                _pyramid_bytes -= evicted_size
+                memory_budget.release(_PYRAMID_BUDGET_ID, evicted_key)
+    if stored:
+        # Registered outside the cache lock; see MemoryBudget._evict
+        memory_budget.register(_PYRAMID_BUDGET_ID, key, size, functools.partial(_drop_pyramid, key))
+    return levels
+
+
+def display_level(image, display_width=FULL_DISPLAY_WIDTH):
+    """
+    Pick the smallest pyramid level that still covers the rendered width.
+
+    Parameters:
+    -----------
+    image : PIL.Image
+        The full-resolution image
+    display_width : int
+        Width in pixels the image is rendered at
+
+    Returns:
+    --------
+    PIL.Image
+        A cached downsampled level, or the image itself when it is already no
+        wider than the display or no smaller level covers the display width
+    """
+    if image is None or image.width <= display_width:
+        return image
+    best = image
+    for level in get_pyramid(image):
+        if level.width < display_width:
+            break
+        best = level
+    return best
+
+
+def encoded_preview(data, display_width=FULL_DISPLAY_WIDTH, key=None):
+    """
+    Decode an encoded image file directly at display resolution.
+
+    JPEGs are decoded in draft mode, where the decoder scales the DCT blocks by
+    1/2, 1/4 or 1/8 and never produces the full-resolution raster; other formats
+    are decoded in full. The result is then box-reduced by the largest integer
+    factor that still covers the display width, like display_level. Previews are
+    cached by file content and width.
+
+    Parameters:
+    -----------
+    data : bytes or str
+        The encoded file, or the path of a file on disk
+    display_width : int
+        Width in pixels the preview is rendered at
+    key : str, optional
+        Precomputed identifier of the file content; hashed from data when omitted,
+        and required when data is a path
+
+    Returns:
+    --------
+    PIL.Image
+        Preview covering display_width, or the full image when it is narrower
+    """
+    global _preview_bytes
+    if key is None:
+        key = hashlib.blake2b(data, digest_size=20).hexdigest()
+    with _previews_lock:
+        cached = _previews.get((key, display_width))
+        if cached is not None:
+            _previews.move_to_end((key, display_width))
+            memory_budget.touch(_PREVIEW_BUDGET_ID, (key, display_width))
+            return cached[0]
+
+    preview = Image.open(data if isinstance(data, str) else io.BytesIO(data))
+    if preview.width > display_width:
+        height = max(1, preview.height * display_width // preview.width)
+        preview.draft(None, (display_width, height))
+    preview.load()
+    factor = preview.width // display_width
+    if factor > 1:
+        if preview.mode not in _REDUCIBLE_MODES:
+            preview = preview.convert("RGBA" if "transparency" in preview.info else "RGB")
+        preview = preview.reduce(factor)
+
+    size = _level_bytes(preview)
+    cache_key = (key, display_width)
+    with _previews_lock:
+        stored = cache_key not in _previews and size <= DEFAULT_MAX_PREVIEW_BYTES
+        if stored:
+            _previews[cache_key] = (preview, size)
+            _preview_bytes += size
+            while _preview_bytes > DEFAULT_MAX_PREVIEW_BYTES:
+                evicted_key, (_, evicted_size) = _previews.popitem(last=False)
+                _preview_bytes -= evicted_size
+                memory_budget.release(_PREVIEW_BUDGET_ID, evicted_key)
+    if stored:
+        # Registered outside the cache lock; see MemoryBudget._evict
+        memory_budget.register(_PREVIEW_BUDGET_ID, cache_key, size, functools.partial(_drop_preview, cache_key))
+    return preview
+
+
+def clear_pyramid_cache():
+    """Drop every cached pyramid and preview."""
+    global _pyramid_bytes, _preview_bytes
+    with _pyramids_lock:
+        _pyramids.clear()
+        _pyramid_bytes = 0
+    with _previews_lock:
+        _previews.clear()
+        _preview_bytes = 0
+    memory_budget.release_session(_PYRAMID_BUDGET_ID)
+    memory_budget.release_session(_PREVIEW_BUDGET_ID)
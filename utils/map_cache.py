@@ -0,0 +1,159 @@
+import json
+import uuid
+import hashlib
+import weakref
+import functools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.memory_budget import memory_budget
+
+# Upper bound on the rendered HTML held by the map cache
+DEFAULT_MAX_MAP_CACHE_BYTES = 128 * 1024 * 1024
+
+
+def _canonical(value):
+    """JSON fallback for map inputs: content digests for frames and arrays, str() for the rest."""
+    if isinstance(value, pd.DataFrame):
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes(), digest_size=20)
+        return {"frame": list(map(str, value.columns)), "digest": digest.hexdigest()}
+    if isinstance(value, np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(value).tobytes(), digest_size=20)
+        return {"array": [value.dtype.str, list(value.shape)], "digest": digest.hexdigest()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def map_input_key(builder, inputs):
+    """
+    Build a cache key from a map builder and the inputs it is called with.
+
+    Parameters:
+    -----------
+    builder : callable
+        The function that builds the map
+    inputs : dict
+        Keyword arguments passed to the builder; DataFrames and arrays are keyed by content
+
+    Returns:
+    --------
+    str
+        Hex digest cache key
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{builder.__module__}.{builder.__qualname__}".encode())
+    digest.update(json.dumps(inputs, sort_keys=True, default=_canonical).encode())
+    return digest.hexdigest()
+
+
+class MapCache:
+    """
+    LRU cache of the rendered HTML of folium maps, shared by all sessions.
+
+    Maps are keyed by their builder and inputs, so a rerun triggered by an
+    unrelated widget reuses the HTML without building the map again. Only the
+    HTML is kept; the map object is dropped once rendered, so the cache is
+    bounded by exactly what it holds.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MAP_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> html
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Pages also count toward the process memory budget, under this owner id
+        self.budget_id = f"map_cache_{uuid.uuid4().hex}"
+        weakref.finalize(self, memory_budget.release_session, self.budget_id)
+
+    def get(self, builder, **inputs):
+        """
+        Return the rendered HTML of a map, building and rendering the map on a miss.
+
+        Parameters:
+        -----------
+        builder : callable
+            Function returning a folium.Map when called with the inputs
+        **inputs
+            Keyword arguments for the builder
+
+        Returns:
+        --------
+        str
+            The map's standalone HTML page
+        """
+        key = map_input_key(builder, inputs)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                memory_budget.touch(self.budget_id, key)
+                self.hits += 1
+                return html
+            self.misses += 1
+
+        html = builder(**inputs).get_root().render()
+
+        size = len(html)
+        with self._lock:
+            stored = key not in self._entries and size <= self.max_bytes
+            if stored:
+                self._entries[key] = html
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    evicted_key, evicted_html = self._entries.popitem(last=False)
+                    self._bytes -= len(evicted_html)
+                    memory_budget.release(self.budget_id, evicted_key)
+        if stored:
+            # Registered outside the cache lock; see MemoryBudget._evict
+            memory_budget.register(self.budget_id, key, size,
+                                   functools.partial(_evict_page, weakref.ref(self), key))
+        return html
+
+    def _drop(self, key):
+        """Forget one cached page."""
+        with self._lock:
+            html = self._entries.pop(key, None)
+            if html is not None:
+                self._bytes -= len(html)
+
+    def clear(self):
+        """Drop every cached page and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = 0
+        memory_budget.release_session(self.budget_id)
+
+    def stats(self):
+        """
+        Return cache usage and hit/miss counters.
+
+        Returns:
+        --------
+        dict
+            Dictionary with hit and miss counts and the number and size of cached pages
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._bytes
+            }
+
+
+def _evict_page(cache_ref, key):
+    """Memory budget eviction callback; holds the cache weakly so it can be collected."""
+    cache = cache_ref()
+    if cache is not None:
+        cache._drop(key)
+
+
+# Process-wide cache shared by all sessions
+map_cache = MapCache()
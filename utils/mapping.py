@@ -1,10 +1,53 @@
 import folium
 import random
-from folium.plugins import HeatMap, MarkerCluster, MeasureControl, Draw, Fullscreen
+import numpy as np
+from folium.plugins import HeatMap, MarkerCluster, FastMarkerCluster, MeasureControl, Draw, Fullscreen, TimestampedGeoJson
+from folium.utilities import JsCode
 from data.sample_coordinates import get_coordinates_for_location
+from utils.heat_aggregation import bin_heat_points
 from datetime import datetime, timedelta
 
-def create_map_with_deforestation(center_lat, center_lon, zoom, deforested_areas=None):
+# Above this many deforested areas, "auto" rendering emits one GeoJSON layer and a
+# client-side cluster instead of a marker, popup and circle object per area
+MAX_OBJECT_RENDERED_AREAS = 50
+
+# Circle radius (m) per km² of deforested area, scaled for visibility
+AREA_RADIUS_M_PER_KM2 = 100
+
+# Decimal places kept for coordinates sent to the browser (6 is about 0.1 m)
+COORDINATE_DECIMALS = 6
+
+# Jittered heat points generated around the map center per deforested area
+HEAT_POINTS_PER_AREA = 20
+
+# Confidence above which a deforested area is reported as recent
+RECENT_CONFIDENCE = 0.9
+
+# Time step of the time-enabled timelapse (ISO 8601 duration)
+TIMELAPSE_PERIOD = "P1Y"
+
+# Circle marker radius (px) per unit of timelapse area size; circle markers keep
+# their screen size, so the 500 m per unit of the per-year maps does not apply
+TIMELAPSE_RADIUS_PX_PER_SIZE = 8
+
+# Styles each circle of the GeoJSON layer from its feature properties in the browser
+_AREA_STYLE_JS = JsCode("""
+function(feature, layer) {
+    layer.setRadius(feature.properties.radius_m);
+}
+""")
+
+# Builds the cluster pins in the browser from [lat, lon, area number] rows
+_AREA_PIN_JS = """
+function(row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'tree', prefix: 'fa', markerColor: 'red'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindTooltip('Deforested Area #' + row[2]);
+    return marker;
+}
+"""
+
+def create_map_with_deforestation(center_lat, center_lon, zoom, deforested_areas=None, render_mode="auto"):
     """
     Create an interactive map with deforested areas highlighted.
     
@@ -18,6 +61,11 @@ def create_map_with_deforestation(center_lat, center_lon, zoom, deforested_areas
         Initial zoom level
     deforested_areas : list, optional
         List of dictionaries containing deforested area information
+    render_mode : str
+        "objects" adds a marker, popup and circle per area; "geojson" adds all
+        areas as one GeoJSON layer with shared popup and tooltip templates plus a
+        client-side marker cluster, so the page grows only with the area data;
+        "auto" uses "objects" for up to MAX_OBJECT_RENDERED_AREAS areas
         
     Returns:
     --------
@@ -47,59 +95,32 @@ def create_map_with_deforestation(center_lat, center_lon, zoom, deforested_areas
         # In a real application, these would be actual geo-coordinates
         # Here we're simulating by generating random coordinates around the center
         
-        # Create a feature group for deforested areas
-        deforested_group = folium.FeatureGroup(name="Deforested Areas")
+        if render_mode == "auto":
+            render_mode = "objects" if len(deforested_areas) <= MAX_OBJECT_RENDERED_AREAS else "geojson"
         
-        for i, area in enumerate(deforested_areas):
-            # Generate a random offset from the center (in degrees)
-            lat_offset = random.uniform(-0.05, 0.05)
-            lon_offset = random.uniform(-0.05, 0.05)
-            
-            # Calculate coordinate
-            area_lat = center_lat + lat_offset
-            area_lon = center_lon + lon_offset
-            
-            # Add a marker with popup
-            popup_html = f"""
-            <div style="width: 200px;">
-                <h4>Deforested Area #{i+1}</h4>
-                <p><b>Confidence:</b> {area['confidence']:.2f}</p>
-                <p><b>Estimated Area:</b> {area['area_km2']} km²</p>
-                <p><b>Status:</b> {"Recent" if area['confidence'] > 0.9 else "Ongoing"}</p>
-            </div>
-            """
-            
-            folium.Marker(
-                [area_lat, area_lon],
-                popup=folium.Popup(popup_html, max_width=300),
-                icon=folium.Icon(color="red", icon="tree", prefix="fa")
-            ).add_to(deforested_group)
-            
-            # Add a red circle to highlight the area
-            folium.Circle(
-                [area_lat, area_lon],
-                radius=area['area_km2'] * 100,  # Scale for visibility
-                color="red",
-                fill=True,
-                fill_color="red",
-                fill_opacity=0.4,
-                tooltip=f"Deforested Area: {area['area_km2']} km²"
-            ).add_to(deforested_group)
+        # Generate a random offset from the center (in degrees) for each area
+        coordinates = [
+            (center_lat + random.uniform(-0.05, 0.05), center_lon + random.uniform(-0.05, 0.05))
+            for _ in deforested_areas
+        ]
         
-        # Add the deforested areas to the map
-        deforested_group.add_to(m)
+        if render_mode == "geojson":
+            _add_deforested_area_layers(m, deforested_areas, coordinates)
+        elif render_mode == "objects":
+            _add_deforested_area_objects(m, deforested_areas, coordinates)
+        else:
+            raise ValueError(f"Unknown render_mode '{render_mode}', expected 'auto', 'objects' or 'geojson'")
         
-        # Generate heatmap data
-        heatmap_data = []
-        for i in range(20):  # Generate more points for a better heatmap
-            for area in deforested_areas:
-                # Add multiple points around each deforested area
-                lat_offset = random.uniform(-0.03, 0.03)
-                lon_offset = random.uniform(-0.03, 0.03)
-                area_lat = center_lat + lat_offset
-                area_lon = center_lon + lon_offset
-                intensity = area['confidence'] * random.uniform(0.5, 1.0)
-                heatmap_data.append([area_lat, area_lon, intensity])
+        # Generate heatmap data: several points per deforested area for a better heatmap,
+        # binned so only cell centroids reach the browser
+        rng = np.random.default_rng()
+        confidence = np.array([area['confidence'] for area in deforested_areas], dtype=np.float64)
+        shape = (HEAT_POINTS_PER_AREA, len(deforested_areas))
+        heatmap_data = bin_heat_points(
+            center_lat + rng.uniform(-0.03, 0.03, shape).ravel(),
+            center_lon + rng.uniform(-0.03, 0.03, shape).ravel(),
+            (confidence * rng.uniform(0.5, 1.0, shape)).ravel()
+        )
         
         # Add heatmap layer
         HeatMap(heatmap_data, name="Deforestation Intensity").add_to(m)
@@ -109,6 +130,97 @@ def create_map_with_deforestation(center_lat, center_lon, zoom, deforested_areas
     
     return m
 
+def _add_deforested_area_objects(m, deforested_areas, coordinates):
+    """Add a marker with popup and a highlight circle per deforested area."""
+    # Create a feature group for deforested areas
+    deforested_group = folium.FeatureGroup(name="Deforested Areas")
+    
+    for i, (area, (area_lat, area_lon)) in enumerate(zip(deforested_areas, coordinates)):
+        # Add a marker with popup
+        popup_html = f"""
+        <div style="width: 200px;">
+            <h4>Deforested Area #{i+1}</h4>
+            <p><b>Confidence:</b> {area['confidence']:.2f}</p>
+            <p><b>Estimated Area:</b> {area['area_km2']} km²</p>
+            <p><b>Status:</b> {"Recent" if area['confidence'] > RECENT_CONFIDENCE else "Ongoing"}</p>
+        </div>
+        """
+    
+        folium.Marker(
+            [area_lat, area_lon],
+            popup=folium.Popup(popup_html, max_width=300),
+            icon=folium.Icon(color="red", icon="tree", prefix="fa")
+        ).add_to(deforested_group)
+    
+        # Add a red circle to highlight the area
+        folium.Circle(
+            [area_lat, area_lon],
+            radius=area['area_km2'] * AREA_RADIUS_M_PER_KM2,
+            color="red",
+            fill=True,
+            fill_color="red",
+            fill_opacity=0.4,
+            tooltip=f"Deforested Area: {area['area_km2']} km²"
+        ).add_to(deforested_group)
+    
+    # Add the deforested areas to the map
+    deforested_group.add_to(m)
+
+def _add_deforested_area_layers(m, deforested_areas, coordinates):
+    """Add all deforested areas as one GeoJSON circle layer and one client-side pin cluster."""
+    coordinates = [
+        (round(area_lat, COORDINATE_DECIMALS), round(area_lon, COORDINATE_DECIMALS)) for area_lat, area_lon in coordinates
+    ]
+    
+    features = []
+    for i, (area, (area_lat, area_lon)) in enumerate(zip(deforested_areas, coordinates)):
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [area_lon, area_lat]},
+            "properties": {
+                "area_id": i + 1,
+                "confidence": round(float(area['confidence']), 2),
+                "area_km2": float(area['area_km2']),
+                "status": "Recent" if area['confidence'] > RECENT_CONFIDENCE else "Ongoing",
+                "radius_m": float(area['area_km2']) * AREA_RADIUS_M_PER_KM2
+            }
+        })
+    
+    # Circles are created from the features in the browser; popup and tooltip are
+    # shared templates filled from the feature properties
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name="Deforested Areas",
+        marker=folium.Circle(radius=1, color="red", fill=True, fill_color="red", fill_opacity=0.4),
+        on_each_feature=_AREA_STYLE_JS,
+        popup=folium.GeoJsonPopup(
+            fields=["area_id", "confidence", "area_km2", "status"],
+            aliases=["Deforested Area #", "Confidence", "Estimated Area (km²)", "Status"]
+        ),
+        tooltip=folium.GeoJsonTooltip(fields=["area_km2"], aliases=["Deforested Area (km²)"])
+    ).add_to(m)
+    
+    FastMarkerCluster(
+        [[area_lat, area_lon, i + 1] for i, (area_lat, area_lon) in enumerate(coordinates)],
+        callback=_AREA_PIN_JS,
+        name="Deforested Area Markers"
+    ).add_to(m)
+
+def _timelapse_areas(coordinates, year):
+    """Generate random (lat, lon, size) deforested areas near a location for one timelapse year."""
+    # The idea is that more recent years have more deforestation
+    num_areas = int((year - 2000) / 5) + 1  # More areas in recent years
+    areas = []
+    for i in range(num_areas):
+        # Random coordinates near the center
+        area_lat = coordinates["lat"] + random.uniform(-0.05, 0.05)
+        area_lon = coordinates["lon"] + random.uniform(-0.05, 0.05)
+        
+        # Random area size (larger in recent years)
+        area_size = random.uniform(0.5, 1.0) * (1 + (year - 2000) / 40)
+        areas.append((area_lat, area_lon, area_size))
+    return areas
+
 def create_timelapse_map(location, years):
     """
     Create a set of maps showing deforestation over time.
@@ -143,22 +255,9 @@ def create_timelapse_map(location, years):
             overlay=False
         ).add_to(m)
         
-        # Generate random deforested areas based on year
-        # The idea is that more recent years have more deforestation
-        num_areas = int((year - 2000) / 5) + 1  # More areas in recent years
-        
         deforested_group = folium.FeatureGroup(name=f"Deforestation {year}")
         
-        for i in range(num_areas):
-            # Random coordinates near the center
-            lat_offset = random.uniform(-0.05, 0.05)
-            lon_offset = random.uniform(-0.05, 0.05)
-            area_lat = coordinates["lat"] + lat_offset
-            area_lon = coordinates["lon"] + lon_offset
-            
-            # Random area size (larger in recent years)
-            area_size = random.uniform(0.5, 1.0) * (1 + (year - 2000) / 40)
-            
+        for area_lat, area_lon, area_size in _timelapse_areas(coordinates, year):
             # Add a circle to represent deforested area
             folium.Circle(
                 [area_lat, area_lon],
@@ -183,6 +282,88 @@ def create_timelapse_map(location, years):
     
     return maps
 
+def create_time_enabled_timelapse_map(location, years, cumulative=True):
+    """
+    Create one map with a time slider showing deforestation over time.
+    
+    Unlike create_timelapse_map, the base map, tile layers and controls are
+    emitted once and every year's areas are encoded once as features of a
+    single timestamped GeoJSON layer, so the page grows only with the area data.
+    
+    Parameters:
+    -----------
+    location : str
+        Name of the location
+    years : list
+        List of years to include in the timelapse
+    cumulative : bool
+        Keep the areas of earlier years on the map; when False only the areas of
+        the selected year are shown, like the per-year maps
+        
+    Returns:
+    --------
+    folium.Map
+        An interactive Folium map with a time slider over the years
+    """
+    coordinates = get_coordinates_for_location(location)
+    m = folium.Map(
+        location=[coordinates["lat"], coordinates["lon"]],
+        zoom_start=coordinates["zoom"],
+        tiles="OpenStreetMap"
+    )
+    
+    # Add satellite view
+    folium.TileLayer(
+        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+        attr='Esri',
+        name='Satellite',
+        overlay=False
+    ).add_to(m)
+    
+    features = []
+    for year in years:
+        for area_lat, area_lon, area_size in _timelapse_areas(coordinates, year):
+            features.append({
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [round(area_lon, COORDINATE_DECIMALS), round(area_lat, COORDINATE_DECIMALS)]
+                },
+                "properties": {
+                    "times": [f"{year}-01-01"],
+                    "icon": "circle",
+                    "iconstyle": {
+                        "radius": round(area_size * TIMELAPSE_RADIUS_PX_PER_SIZE, 1),
+                        "color": "red",
+                        "fillColor": "red",
+                        "fillOpacity": 0.4
+                    },
+                    "tooltip": f"Deforested in {year}"
+                }
+            })
+    
+    # Each year is stamped on January 1st, so a window shorter than one period
+    # shows only the selected year's areas
+    TimestampedGeoJson(
+        {"type": "FeatureCollection", "features": features},
+        period=TIMELAPSE_PERIOD,
+        duration=None if cumulative else "P6M",
+        add_last_point=False,
+        auto_play=False,
+        loop=False,
+        date_options="YYYY"
+    ).add_to(m)
+    
+    folium.LayerControl().add_to(m)
+    
+    # Add title; the time control shows the selected year
+    title_html = '''
+        <h3 align="center" style="font-size:16px"><b>Deforestation Timelapse</b></h3>
+    '''
+    m.get_root().html.add_child(folium.Element(title_html))
+    
+    return m
+
 def create_realtime_map(location, days_back=30):
     """
     Create an interactive map with real-time deforestation alerts.
@@ -315,12 +496,12 @@ def create_realtime_map(location, days_back=30):
             popup=f"Area: {alert['area_ha']} hectares"
         ).add_to(m)
     
-    # Add heat map
-    heat_data = []
-    for alert in alerts:
-        # Heat intensity based on severity and area
-        intensity = alert['severity'] * alert['area_ha']
-        heat_data.append([alert['lat'], alert['lon'], intensity])
+    # Add heat map; intensity based on severity and area
+    heat_data = bin_heat_points(
+        [alert['lat'] for alert in alerts],
+        [alert['lon'] for alert in alerts],
+        [alert['severity'] * alert['area_ha'] for alert in alerts]
+    )
     
     HeatMap(
         heat_data,
@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+
+# Ceiling on the heavy session artifacts and shared caches held in memory by the process
+DEFAULT_GLOBAL_BUDGET_BYTES = 2 * 1024 * 1024 * 1024
+
+
+class MemoryBudget:
+    """
+    Process-wide memory budget for the heavy artifacts of all user sessions.
+
+    Every tracked artifact is registered with its size and an eviction callback.
+    The shared caches (aligned images, pyramids and previews, analysis results and
+    rendered maps) register their entries the same way, under an owner id of their
+    own in place of a session id. When the total exceeds the ceiling, artifacts are evicted across all sessions
+    in least recently used order; the callback frees the memory (for example by
+    spilling the artifact to disk or dropping a product that can be rebuilt).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_GLOBAL_BUDGET_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._artifacts = OrderedDict()  # (session_id, name) -> (size, evict callback), least recent first
+        self._session_bytes = {}
+        self._lock = threading.RLock()
+
+    def register(self, session_id, name, size, evict):
+        """
+        Track an artifact and enforce the ceiling.
+
+        Parameters:
+        -----------
+        session_id : str
+            Identifier of the owning session
+        name : str
+            Artifact name, unique within the session
+        size : int
+            Bytes the artifact holds in memory
+        evict : callable
+            Called without arguments to free the artifact's memory when it is evicted
+        """
+        key = (session_id, name)
+        with self._lock:
+            self._forget(key)
+            self._artifacts[key] = (size, evict)
+            self.total_bytes += size
+            self._session_bytes[session_id] = self._session_bytes.get(session_id, 0) + size
+            victims = self._select_victims(keep=key)
+        self._evict(victims)
+
+    def touch(self, session_id, name):
+        """Mark an artifact as recently used."""
+        with self._lock:
+            if (session_id, name) in self._artifacts:
+                self._artifacts.move_to_end((session_id, name))
+
+    def release(self, session_id, name):
+        """Stop tracking an artifact that its owner freed."""
+        with self._lock:
+            self._forget((session_id, name))
+
+    def release_session(self, session_id):
+        """Stop tracking every artifact of a session that ended."""
+        with self._lock:
+            for key in [key for key in self._artifacts if key[0] == session_id]:
+                self._forget(key)
+            self._session_bytes.pop(session_id, None)
+
+    def _forget(self, key):
+        entry = self._artifacts.pop(key, None)
+        if entry is None:
+            return None
+        size = entry[0]
+        self.total_bytes -= size
+        remaining = self._session_bytes.get(key[0], 0) - size
+        if remaining > 0:
+            self._session_bytes[key[0]] = remaining
+        else:
+            self._session_bytes.pop(key[0], None)
+        return entry
+
+    def _select_victims(self, keep=None):
+        """Stop tracking least recently used artifacts until the total fits the ceiling."""
+        victims = []
+        for key in list(self._artifacts):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            victims.append(self._forget(key)[1])
+        self.evictions += len(victims)
+        return victims
+
+    @staticmethod
+    def _evict(victims):
+        # Run outside the budget lock: callbacks take their owner's lock, and owners
+        # call into the budget while holding it
+        for evict in victims:
+            evict()
+
+    def set_limit(self, max_bytes):
+        """Change the ceiling and evict immediately if usage is above it."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            victims = self._select_victims()
+        self._evict(victims)
+
+    def usage(self):
+        """
+        Return the memory held by tracked artifacts.
+
+        Returns:
+        --------
+        dict
+            Dictionary with the total and maximum bytes, the number of tracked
+            artifacts and evictions, and the bytes held by each session
+        """
+        with self._lock:
+            return {
+                "total_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "artifacts": len(self._artifacts),
+                "evictions": self.evictions,
+                "sessions": dict(self._session_bytes)
+            }
+
+
+# Budget shared by all sessions in this process
+memory_budget = MemoryBudget()
@@ -0,0 +1,473 @@
+import os
+import sys
+import atexit
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+from scipy import ndimage
+
+from utils.tiled_change import (
+    _prepare_pair, _allocate_output, iter_tiles, process_change_window, merge_tile_stats,
+    window_with_margin, detect_changes_tiled
+)
+from utils.vegetation import (
+    to_rgb_array, excess_green, vegetation_mask, label_regions,
+    detect_deforestation_regions, DEFAULT_PIXEL_SIZE_M
+)
+
+# Number of worker processes used when the caller does not ask for a specific count
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Scenes smaller than this are processed in the calling process; the pool overhead
+# is larger than the work itself
+MIN_PARALLEL_PIXELS = 4_000_000
+
+# Side length of the tiles handed to workers
+PARALLEL_TILE_SIZE = 1024
+
+# Start method of the worker processes. Forking the multithreaded app server could
+# copy a held lock into a child, and every session's state with it; the kernels are
+# module-level and attach to shared memory by name, so a clean start works for them
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_executor = None
+_executor_workers = 0
+# Guards the shared pool; Streamlit runs every session in its own thread
+_executor_lock = threading.Lock()
+
+
+def _ensure_executor(workers):
+    """Return the shared pool, growing it to at least workers processes. The caller holds _executor_lock."""
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers < workers:
+        previous = _executor
+        _executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD)
+        )
+        _executor_workers = workers
+        if previous is not None:
+            # Work already submitted by other sessions still runs to completion
+            previous.shutdown(wait=False)
+    return _executor
+
+
+def get_executor(workers=None):
+    """
+    Return the shared process pool with at least the requested number of workers.
+
+    The pool only ever grows: a caller asking for fewer workers reuses the larger
+    pool rather than replacing it under another session's running jobs.
+
+    Parameters:
+    -----------
+    workers : int, optional
+        Minimum number of worker processes (defaults to DEFAULT_WORKERS)
+
+    Returns:
+    --------
+    concurrent.futures.ProcessPoolExecutor
+        The shared process pool
+    """
+    with _executor_lock:
+        return _ensure_executor(workers or DEFAULT_WORKERS)
+
+
+@atexit.register
+def shutdown_executor():
+    """Shut down the shared process pool, if one was started."""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+            _executor_workers = 0
+
+
+def _should_parallelize(num_pixels, workers):
+    """Return True when a scene is large enough and more than one worker is available."""
+    return (workers or DEFAULT_WORKERS) > 1 and num_pixels >= MIN_PARALLEL_PIXELS
+
+
+class SharedArray:
+    """
+    A numpy array backed by a named shared memory block.
+
+    The creating process owns the block and must call release() when done. Worker
+    processes receive the lightweight spec tuple and attach to the same memory,
+    so the array data itself is never pickled.
+    """
+
+    def __init__(self, shape, dtype, source=None):
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        if source is not None:
+            np.copyto(self.array, source)
+        self.spec = (self.shm.name, tuple(shape), dtype.str)
+
+    def release(self):
+        """Close and unlink the shared memory block."""
+        del self.array
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _attach(spec):
+    """Attach to a SharedArray from its spec, returning (shared_memory, array)."""
+    name, shape, dtype = spec
+    if sys.version_info >= (3, 13):
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    else:
+        # Attaching must not register the block with the resource tracker: the
+        # creating process owns it and unlinks it (bpo-39959)
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _call_attached(specs, kernel, job):
+    """Worker entry point: attach to the shared arrays, run the kernel on them and detach."""
+    attached = [_attach(spec) for spec in specs]
+    blocks = [shm for shm, _ in attached]
+    arrays = [array for _, array in attached]
+    del attached
+    try:
+        return kernel(*arrays, job)
+    finally:
+        # Views of the shared buffers must be gone before the blocks can be closed
+        del arrays
+        for shm in blocks:
+            shm.close()
+
+
+def _run_workers(kernel, specs, jobs, workers):
+    """Run the kernel once per job on the process pool and return the results in order."""
+    # Submit under the lock so a concurrent resize cannot shut the pool down between the two
+    with _executor_lock:
+        executor = _ensure_executor(workers or DEFAULT_WORKERS)
+        futures = [executor.submit(_call_attached, specs, kernel, job) for job in jobs]
+    return [future.result() for future in futures]
+
+
+def _change_tile_kernel(before, after, heatmap, overlay, mask, change_sum, window):
+    """Compute the change heatmap, overlay, mask and change sum for one tile; return its pixel count and stats."""
+    x0, y0, x1, y1 = window
+    height, width = mask.shape
+    mx0, my0, mx1, my1 = window_with_margin(window, width, height)
+    tile_heatmap, tile_overlay, tile_mask, tile_sum, stats = process_change_window(
+        before[my0:my1, mx0:mx1], after[my0:my1, mx0:mx1], x1 - x0, y1 - y0
+    )
+    heatmap[y0:y1, x0:x1] = tile_heatmap
+    overlay[y0:y1, x0:x1] = tile_overlay
+    mask[y0:y1, x0:x1] = tile_mask
+    change_sum[y0:y1, x0:x1] = tile_sum
+    return int(np.count_nonzero(tile_mask)), stats
+
+
+def _vegetation_tile_kernel(before, after, index_drop, loss_mask, job):
+    """Compute the vegetation-index drop and forest-loss mask for one tile."""
+    (x0, y0, x1, y1), index_drop_threshold, min_green = job
+    before_tile = before[y0:y1, x0:x1]
+    after_tile = after[y0:y1, x0:x1]
+
+    drop = excess_green(before_tile, out=index_drop[y0:y1, x0:x1])
+    drop -= excess_green(after_tile)
+
+    tile_mask = vegetation_mask(before_tile, min_green, out=loss_mask[y0:y1, x0:x1])
+    tile_mask &= ~vegetation_mask(after_tile, min_green)
+    tile_mask &= drop >= index_drop_threshold
+
+
+def _label_structure(connectivity):
+    """Return the ndimage structuring element for 4- or 8-connectivity."""
+    if connectivity not in (4, 8):
+        raise ValueError(f"connectivity must be 4 or 8, got {connectivity}")
+    return ndimage.generate_binary_structure(2, 1 if connectivity == 4 else 2)
+
+
+def _label_band_kernel(mask, labels, job):
+    """Label the connected components in one horizontal band of the mask."""
+    (y0, y1), connectivity = job
+    return ndimage.label(mask[y0:y1], structure=_label_structure(connectivity), output=labels[y0:y1])
+
+
+def _relabel_band_kernel(labels, job):
+    """Offset a band's labels to be globally unique, or map them through a lookup table."""
+    (y0, y1), offset, lookup = job
+    band = labels[y0:y1]
+    if lookup is not None:
+        band[...] = lookup[band]
+    elif offset:
+        band[band > 0] += offset
+
+
+def _row_bands(height, workers):
+    """Split the rows of an image into one contiguous band per worker."""
+    edges = np.linspace(0, height, min(workers, height) + 1).astype(int)
+    return [(int(y0), int(y1)) for y0, y1 in zip(edges[:-1], edges[1:]) if y1 > y0]
+
+
+def _find(parent, i):
+    """Union-find root lookup with path halving."""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _merge_band_edges(labels, bands, total, connectivity=8):
+    """
+    Union components that touch across band edges.
+
+    Returns a lookup table mapping every band-local label to a consecutive global
+    region id, and the number of regions.
+    """
+    parent = np.arange(total + 1)
+    for _, y1 in bands[:-1]:
+        upper = labels[y1 - 1]
+        lower = labels[y1]
+        for shift in ((-1, 0, 1) if connectivity == 8 else (0,)):
+            a = upper[max(0, -shift):len(upper) - max(0, shift)]
+            b = lower[max(0, shift):len(lower) - max(0, -shift)]
+            touching = (a > 0) & (b > 0)
+            for first, second in set(zip(a[touching].tolist(), b[touching].tolist())):
+                root_a, root_b = _find(parent, first), _find(parent, second)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    # Resolve every label to its root and renumber the roots consecutively
+    roots = parent
+    while True:
+        next_roots = roots[roots]
+        if np.array_equal(next_roots, roots):
+            break
+        roots = next_roots
+    unique_roots, lookup = np.unique(roots, return_inverse=True)
+    return lookup.astype(np.int32), len(unique_roots) - 1
+
+
+def parallel_change_detection(before_image, after_image, workers=None, tile_size=PARALLEL_TILE_SIZE, output_dir=None):
+    """
+    Run the before/after change detection across a pool of worker processes.
+
+    Both images are copied once into shared memory; workers read and write their
+    tiles in place. Small scenes fall back to the serial tiled engine.
+
+    Parameters:
+    -----------
+    before_image : PIL.Image
+        The earlier satellite image
+    after_image : PIL.Image
+        The later satellite image; resized to the before image if sizes differ
+    workers : int, optional
+        Number of worker processes (defaults to DEFAULT_WORKERS)
+    tile_size : int
+        Side length of the tiles handed to workers
+    output_dir : str, optional
+        Write the outputs to memory-mapped .npy files in this directory
+
+    Returns:
+    --------
+    dict
+        Same dictionary as utils.tiled_change.detect_changes_tiled
+    """
+    width, height = before_image.size
+    if not _should_parallelize(width * height, workers):
+        return detect_changes_tiled(before_image, after_image, tile_size=tile_size, output_dir=output_dir)
+
+    before_image, after_image = _prepare_pair(before_image, after_image)
+    shared = [
+        SharedArray((height, width, 3), np.uint8, np.asarray(before_image)),
+        SharedArray((height, width, 3), np.uint8, np.asarray(after_image)),
+        SharedArray((height, width, 3), np.uint8),
+        SharedArray((height, width, 3), np.uint8),
+        SharedArray((height, width), bool),
+        SharedArray((height, width), np.uint16)
+    ]
+    try:
+        specs = [array.spec for array in shared]
+        results = _run_workers(_change_tile_kernel, specs, list(iter_tiles(width, height, tile_size)), workers)
+
+        # Copy the results out of shared memory before it is released
+        outputs = {
+            "heatmap": _allocate_output((height, width, 3), "heatmap", output_dir),
+            "overlay": _allocate_output((height, width, 3), "overlay", output_dir),
+            "mask": _allocate_output((height, width), "mask", output_dir, dtype=bool),
+            "change_sum": _allocate_output((height, width), "change_sum", output_dir, dtype=np.uint16)
+        }
+        for output, array in zip(outputs.values(), shared[2:]):
+            output[...] = array.array
+            if output_dir is not None:
+                output.flush()
+    finally:
+        for array in shared:
+            array.release()
+
+    return {
+        **outputs,
+        "significant_pixels": sum(count for count, _ in results),
+        "total_pixels": width * height,
+        "stats": merge_tile_stats([stats for _, stats in results], width * height),
+        "tile_size": tile_size
+    }
+
+
+def parallel_vegetation_loss(before_image, after_image, index_drop_threshold=40, min_green=100,
+                             workers=None, tile_size=PARALLEL_TILE_SIZE):
+    """
+    Compute the vegetation-index drop and forest-loss mask across a pool of worker processes.
+
+    Parameters:
+    -----------
+    before_image : PIL.Image
+        The earlier satellite image
+    after_image : PIL.Image
+        The later satellite image; resized to the before image if sizes differ
+    index_drop_threshold : int
+        Minimum drop in excess-green index for a pixel to count as lost forest
+    min_green : int
+        Minimum green value for a pixel to count as forest
+    workers : int, optional
+        Number of worker processes (defaults to DEFAULT_WORKERS)
+    tile_size : int
+        Side length of the tiles handed to workers
+
+    Returns:
+    --------
+    tuple
+        (index_drop, loss_mask) as an int16 array and a boolean array
+    """
+    before_image, after_image = _prepare_pair(before_image, after_image)
+    width, height = before_image.size
+
+    shared = [
+        SharedArray((height, width, 3), np.uint8, to_rgb_array(before_image)),
+        SharedArray((height, width, 3), np.uint8, to_rgb_array(after_image)),
+        SharedArray((height, width), np.int16),
+        SharedArray((height, width), bool)
+    ]
+    try:
+        specs = [array.spec for array in shared]
+        jobs = [(window, index_drop_threshold, min_green) for window in iter_tiles(width, height, tile_size)]
+        _run_workers(_vegetation_tile_kernel, specs, jobs, workers)
+        index_drop = shared[2].array.copy()
+        loss_mask = shared[3].array.copy()
+    finally:
+        for array in shared:
+            array.release()
+
+    return index_drop, loss_mask
+
+
+def parallel_label(mask, workers=None, connectivity=8):
+    """
+    Label connected components of a boolean mask using one horizontal band per worker.
+
+    Each band is labelled independently, then components that touch across band
+    edges are merged with a union-find pass over the boundary rows, giving the
+    same partition into regions as a single ndimage.label call.
+
+    Parameters:
+    -----------
+    mask : np.ndarray
+        Boolean mask to label
+    workers : int, optional
+        Number of worker processes (defaults to DEFAULT_WORKERS)
+    connectivity : int
+        8 to join diagonal neighbours, 4 for edge neighbours only (ndimage.label's default)
+
+    Returns:
+    --------
+    tuple
+        (labels, num_regions) where labels is an int32 array with consecutive region ids
+    """
+    workers = workers or DEFAULT_WORKERS
+    height = mask.shape[0]
+    if not _should_parallelize(mask.size, workers):
+        return ndimage.label(mask, structure=_label_structure(connectivity))
+
+    bands = _row_bands(height, workers)
+    shared = [SharedArray(mask.shape, bool, mask), SharedArray(mask.shape, np.int32)]
+    try:
+        mask_spec, labels_spec = shared[0].spec, shared[1].spec
+        counts = _run_workers(_label_band_kernel, [mask_spec, labels_spec],
+                              [(band, connectivity) for band in bands], workers)
+
+        # Make the labels unique across bands
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        _run_workers(_relabel_band_kernel, [labels_spec],
+                     [(band, int(offset), None) for band, offset in zip(bands, offsets)], workers)
+
+        # Merge components that touch across band edges and renumber them
+        lookup, num_regions = _merge_band_edges(shared[1].array, bands, int(sum(counts)), connectivity)
+        _run_workers(_relabel_band_kernel, [labels_spec], [(band, 0, lookup) for band in bands], workers)
+
+        labels = shared[1].array.copy()
+    finally:
+        for array in shared:
+            array.release()
+
+    return labels, num_regions
+
+
+def parallel_detect_deforestation_regions(before_image, after_image, index_drop_threshold=40, min_green=100,
+                                          min_region_pixels=50, max_regions=None,
+                                          pixel_size_m=DEFAULT_PIXEL_SIZE_M, workers=None):
+    """
+    Parallel version of utils.vegetation.detect_deforestation_regions.
+
+    The vegetation-index and labelling stages run across the process pool; small
+    scenes fall back to the serial detector.
+
+    Parameters:
+    -----------
+    before_image : PIL.Image
+        The earlier satellite image
+    after_image : PIL.Image
+        The later satellite image
+    index_drop_threshold : int
+        Minimum drop in excess-green index for a pixel to count as lost forest
+    min_green : int
+        Minimum green value for a pixel to count as forest
+    min_region_pixels : int
+        Regions smaller than this are discarded as noise
+    max_regions : int, optional
+        Keep only the largest max_regions regions
+    pixel_size_m : float
+        Ground size of one pixel in meters
+    workers : int, optional
+        Number of worker processes (defaults to DEFAULT_WORKERS)
+
+    Returns:
+    --------
+    tuple
+        (regions, loss_mask) as returned by detect_deforestation_regions
+    """
+    width, height = before_image.size
+    if not _should_parallelize(width * height, workers):
+        return detect_deforestation_regions(
+            before_image, after_image, index_drop_threshold, min_green,
+            min_region_pixels, max_regions, pixel_size_m
+        )
+
+    index_drop, loss_mask = parallel_vegetation_loss(
+        before_image, after_image, index_drop_threshold, min_green, workers
+    )
+    labels = parallel_label(loss_mask, workers)
+    regions = label_regions(
+        loss_mask,
+        strength=index_drop,
+        min_region_pixels=min_region_pixels,
+        max_regions=max_regions,
+        pixel_size_m=pixel_size_m,
+        labels=labels
+    )
+
+    return regions, loss_mask
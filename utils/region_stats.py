@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# Column order of the region statistics table
+REGION_STATS_COLUMNS = [
+    "label", "area", "x1", "y1", "x2", "y2",
+    "centroid_x", "centroid_y", "mean_intensity", "perimeter"
+]
+
+
+def _boundary_edge_counts(labels, num_regions):
+    """
+    Count, for every region, the pixel edges it shares with a different label or the image border.
+
+    This is the 4-connected perimeter of each region in pixel-edge units.
+    """
+    counts = np.zeros(num_regions + 1, dtype=np.int64)
+
+    # Interior edges: compare each pixel with its right and lower neighbour once,
+    # and credit the edge to both sides when they differ
+    for first, second in ((labels[:, :-1], labels[:, 1:]), (labels[:-1, :], labels[1:, :])):
+        differs = first != second
+        counts += np.bincount(first[differs], minlength=num_regions + 1)
+        counts += np.bincount(second[differs], minlength=num_regions + 1)
+
+    # Edges on the image border
+    for border in (labels[0, :], labels[-1, :], labels[:, 0], labels[:, -1]):
+        counts += np.bincount(border, minlength=num_regions + 1)
+
+    return counts
+
+
+def compute_region_stats(labels, num_regions=None, intensity=None, include_perimeter=True):
+    """
+    Compute per-region statistics for a label image with bincount-style reductions.
+
+    Parameters:
+    -----------
+    labels : np.ndarray
+        Integer label image where 0 is background and regions are numbered 1..N
+        (as produced by scipy.ndimage.label)
+    num_regions : int, optional
+        Number of regions; defaults to the largest label
+    intensity : np.ndarray, optional
+        Per-pixel values to average over each region (for example change intensity)
+    include_perimeter : bool
+        Whether to compute the perimeter column, which needs a full-frame pass
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per region with columns label, area (pixels), x1, y1, x2, y2
+        (inclusive bounding box), centroid_x, centroid_y, mean_intensity and
+        perimeter (pixel edges), sorted by area from largest to smallest
+    """
+    if num_regions is None:
+        num_regions = int(labels.max()) if labels.size else 0
+    if num_regions == 0:
+        return pd.DataFrame({column: pd.Series(dtype="int32") for column in REGION_STATS_COLUMNS})
+
+    # Work on the labelled pixels only; change masks are usually sparse
+    rows, cols = np.nonzero(labels)
+    pixel_labels = labels[rows, cols]
+    minlength = num_regions + 1
+
+    area = np.bincount(pixel_labels, minlength=minlength)
+    safe_area = np.maximum(area, 1)
+    centroid_y = np.bincount(pixel_labels, weights=rows, minlength=minlength) / safe_area
+    centroid_x = np.bincount(pixel_labels, weights=cols, minlength=minlength) / safe_area
+    if intensity is not None:
+        mean_intensity = np.bincount(pixel_labels, weights=intensity[rows, cols], minlength=minlength) / safe_area
+    else:
+        mean_intensity = np.full(minlength, np.nan)
+
+    # Bounding boxes: group the pixel coordinates by label and reduce each group
+    order = np.argsort(pixel_labels, kind="stable")
+    sorted_rows = rows[order]
+    sorted_cols = cols[order]
+    present = np.nonzero(area[1:])[0] + 1
+    starts = np.concatenate(([0], np.cumsum(area[present])[:-1]))
+    boxes = np.column_stack((
+        np.minimum.reduceat(sorted_cols, starts),
+        np.minimum.reduceat(sorted_rows, starts),
+        np.maximum.reduceat(sorted_cols, starts),
+        np.maximum.reduceat(sorted_rows, starts)
+    )).astype(np.int32)
+
+    if include_perimeter:
+        perimeter = _boundary_edge_counts(labels, num_regions)
+    else:
+        perimeter = np.zeros(minlength, dtype=np.int64)
+
+    table = pd.DataFrame({
+        "label": present.astype(np.int32),
+        "area": area[present].astype(np.int64),
+        "x1": boxes[:, 0],
+        "y1": boxes[:, 1],
+        "x2": boxes[:, 2],
+        "y2": boxes[:, 3],
+        "centroid_x": centroid_x[present].astype(np.float32),
+        "centroid_y": centroid_y[present].astype(np.float32),
+        "mean_intensity": mean_intensity[present].astype(np.float32),
+        "perimeter": perimeter[present].astype(np.int32)
+    })
+
+    return table.sort_values("area", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def summarize_region_stats(table):
+    """
+    Summarize a region statistics table for display.
+
+    Parameters:
+    -----------
+    table : pd.DataFrame
+        Table as returned by compute_region_stats
+
+    Returns:
+    --------
+    dict
+        Dictionary with the number of regions, the largest, average and total area,
+        and the number of regions below 1000 pixels
+    """
+    if table.empty:
+        return {"num_regions": 0, "largest_area": 0, "average_area": 0.0, "total_area": 0, "small_regions": 0}
+    return {
+        "num_regions": len(table),
+        "largest_area": int(table["area"].iloc[0]),
+        "average_area": float(table["area"].mean()),
+        "total_area": int(table["area"].sum()),
+        "small_regions": int((table["area"] < 1000).sum())
+    }
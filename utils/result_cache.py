@@ -0,0 +1,374 @@
+import os
+import io
+import json
+import stat
+import uuid
+import hashlib
+import functools
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+from utils.memory_budget import memory_budget
+
+# Default cache location and size limits
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "deforestation_analysis_cache")
+DEFAULT_MAX_MEMORY_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 4 * 1024 * 1024 * 1024
+
+# Rows hashed per chunk when fingerprinting an image, to avoid a full-frame byte copy
+FINGERPRINT_BAND_ROWS = 256
+
+# Image modes that round-trip losslessly through a numpy array; others are stored as RGB(A)
+_ARRAY_MODES = ("1", "L", "LA", "RGB", "RGBA", "I", "F")
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def image_fingerprint(image):
+    """
+    Return a content hash of a PIL image's mode, size and pixel data.
+
+    The hash is computed band by band and remembered for the lifetime of the image
+    object, so repeated lookups for the same image are free.
+
+    Parameters:
+    -----------
+    image : PIL.Image
+        The image to fingerprint
+
+    Returns:
+    --------
+    str
+        Hex digest identifying the image content
+    """
+    with _fingerprints_lock:
+        cached = _fingerprints.get(id(image))
+    if cached is not None:
+        return cached
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"{image.mode}:{image.width}x{image.height}".encode())
+    for y0 in range(0, image.height, FINGERPRINT_BAND_ROWS):
+        y1 = min(y0 + FINGERPRINT_BAND_ROWS, image.height)
+        digest.update(image.crop((0, y0, image.width, y1)).tobytes())
+    fingerprint = digest.hexdigest()
+
+    remember_fingerprint(image, fingerprint)
+    return fingerprint
+
+
+def remember_fingerprint(image, fingerprint):
+    """
+    Record a known fingerprint for an image object.
+
+    Used when an image is decoded from stored pixels whose fingerprint was already
+    computed, so it does not have to be hashed again.
+    """
+    with _fingerprints_lock:
+        if id(image) in _fingerprints:
+            return
+        _fingerprints[id(image)] = fingerprint
+    weakref.finalize(image, _forget_fingerprint, id(image))
+
+
+def _forget_fingerprint(image_id):
+    """Drop a remembered fingerprint once its image has been garbage collected."""
+    with _fingerprints_lock:
+        _fingerprints.pop(image_id, None)
+
+
+def _private_directory(path):
+    """Return path as a directory only this user can access, or a fresh private temporary directory."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+        owned = not hasattr(os, "getuid") or info.st_uid == os.getuid()
+        if stat.S_ISDIR(info.st_mode) and owned and not info.st_mode & 0o077:
+            return path
+    except OSError:
+        pass
+    # Someone else created or can write to the shared location; do not read from it
+    return tempfile.mkdtemp(prefix="deforestation_analysis_cache_")
+
+
+def _encode_value(value, arrays):
+    """Turn a result into JSON-compatible data, moving images and arrays into the arrays list."""
+    if isinstance(value, Image.Image):
+        if value.mode not in _ARRAY_MODES:
+            value = value.convert("RGBA" if "transparency" in value.info else "RGB")
+        arrays.append(np.asarray(value))
+        return {"__image__": len(arrays) - 1}
+    if isinstance(value, np.ndarray):
+        arrays.append(value)
+        return {"__array__": len(arrays) - 1}
+    if isinstance(value, dict):
+        return {str(key): _encode_value(item, arrays) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode_value(item, arrays) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Cannot cache a value of type {type(value).__name__}")
+
+
+def _decode_value(data, arrays):
+    """Rebuild a result from the output of _encode_value."""
+    if isinstance(data, dict):
+        if "__image__" in data:
+            return Image.fromarray(arrays[data["__image__"]])
+        if "__array__" in data:
+            return arrays[data["__array__"]]
+        return {key: _decode_value(item, arrays) for key, item in data.items()}
+    if isinstance(data, list):
+        return [_decode_value(item, arrays) for item in data]
+    return data
+
+
+def encode_result(value):
+    """
+    Serialize an analysis result without pickle.
+
+    Images and arrays are written as .npy members of an .npz archive and the rest
+    of the structure as JSON, so loading an entry can never run code.
+
+    Parameters:
+    -----------
+    value : object
+        Dicts, lists and tuples of PIL images, numpy arrays and JSON scalars;
+        tuples come back as lists
+
+    Returns:
+    --------
+    bytes
+        The encoded .npz payload
+    """
+    arrays = []
+    meta = json.dumps(_encode_value(value, arrays)).encode()
+    buffer = io.BytesIO()
+    np.savez(buffer, meta=np.frombuffer(meta, dtype=np.uint8),
+             **{f"a{i}": array for i, array in enumerate(arrays)})
+    return buffer.getvalue()
+
+
+def decode_result(payload):
+    """Rebuild a result encoded by encode_result."""
+    with np.load(io.BytesIO(payload), allow_pickle=False) as archive:
+        arrays = [archive[f"a{i}"] for i in range(len(archive.files) - 1)]
+        meta = json.loads(archive["meta"].tobytes())
+    return _decode_value(meta, arrays)
+
+
+class AnalysisCache:
+    """
+    Two-level (memory and disk) LRU cache for analysis results.
+
+    Entries are keyed by a hash of the input image contents plus the analysis
+    parameters. Both levels are bounded by the encoded size of their entries and
+    evict the least recently used entries first. Entries are stored with
+    encode_result rather than pickle, in a directory private to this user.
+    """
+
+    def __init__(self, max_memory_bytes=DEFAULT_MAX_MEMORY_BYTES, max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+                 cache_dir=DEFAULT_CACHE_DIR):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()  # key -> (value, size)
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.RLock()
+        # Memory entries also count toward the process memory budget, under this owner id
+        self.budget_id = f"analysis_cache_{uuid.uuid4().hex}"
+        weakref.finalize(self, memory_budget.release_session, self.budget_id)
+        self._load_disk_index()
+
+    def _load_disk_index(self):
+        """Rebuild the disk LRU order from the files already in the cache directory."""
+        if not self.cache_dir or self.max_disk_bytes <= 0:
+            return
+        self.cache_dir = _private_directory(self.cache_dir)
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npz"):
+                info = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((info.st_mtime, name[:-4], info.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    @staticmethod
+    def make_key(images, params=None):
+        """
+        Build a cache key from a list of images and a dictionary of analysis parameters.
+
+        Parameters:
+        -----------
+        images : list
+            PIL images the analysis depends on, in order
+        params : dict, optional
+            JSON-serializable analysis parameters
+
+        Returns:
+        --------
+        str
+            Hex digest cache key
+        """
+        digest = hashlib.blake2b(digest_size=20)
+        for image in images:
+            digest.update(image_fingerprint(image).encode())
+        digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached result, promoting disk hits into memory.
+
+        Returns:
+        --------
+        object or None
+            The cached value, or None on a miss
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                memory_budget.touch(self.budget_id, key)
+                self.hits += 1
+                return self._memory[key][0]
+
+            if key not in self._disk:
+                self.misses += 1
+                return None
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    payload = f.read()
+                value = decode_result(payload)
+            except Exception:
+                # Unreadable, truncated or foreign entries are dropped and recomputed
+                self._drop_disk_entry(key)
+                self.misses += 1
+                return None
+            self._disk.move_to_end(key)
+            os.utime(self._disk_path(key))
+            stored = self._store_in_memory(key, value, len(payload))
+            self.hits += 1
+            self.disk_hits += 1
+
+        if stored:
+            self._track(key, len(payload))
+        return value
+
+    def put(self, key, value):
+        """Store a result in memory and on disk, evicting older entries as needed."""
+        payload = encode_result(value)
+        with self._lock:
+            stored = self._store_in_memory(key, value, len(payload))
+            self._store_on_disk(key, payload)
+        if stored:
+            self._track(key, len(payload))
+
+    def _store_in_memory(self, key, value, size):
+        """Keep a value in the memory level; returns False when it is too large to keep."""
+        if size > self.max_memory_bytes:
+            return False
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (value, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            evicted_key, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            memory_budget.release(self.budget_id, evicted_key)
+        return True
+
+    def _track(self, key, size):
+        # Called outside the cache lock; see MemoryBudget._evict
+        memory_budget.register(self.budget_id, key, size, functools.partial(_evict_memory_entry, weakref.ref(self), key))
+
+    def _drop_memory_entry(self, key):
+        """Forget a memory entry; its copy on disk stays available."""
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry is not None:
+                self._memory_bytes -= entry[1]
+
+    def _store_on_disk(self, key, payload):
+        if not self.cache_dir or len(payload) > self.max_disk_bytes:
+            return
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = self._disk_path(key) + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            return
+        if key in self._disk:
+            self._disk_bytes -= self._disk.pop(key)
+        self._disk[key] = len(payload)
+        self._disk_bytes += len(payload)
+        while self._disk_bytes > self.max_disk_bytes:
+            self._drop_disk_entry(next(iter(self._disk)))
+
+    def _drop_disk_entry(self, key):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove every entry from memory and disk and reset the counters."""
+        with self._lock:
+            for key in list(self._disk):
+                self._drop_disk_entry(key)
+            self._memory.clear()
+            self._memory_bytes = 0
+            self.hits = self.misses = self.disk_hits = 0
+        memory_budget.release_session(self.budget_id)
+
+    def stats(self):
+        """
+        Return cache usage and hit/miss counters.
+
+        Returns:
+        --------
+        dict
+            Dictionary with hit and miss counts, hit rate and entry counts and sizes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes
+            }
+
+
+def _evict_memory_entry(cache_ref, key):
+    """Memory budget eviction callback; holds the cache weakly so it can be collected."""
+    cache = cache_ref()
+    if cache is not None:
+        cache._drop_memory_entry(key)
+
+
+# Process-wide cache shared by all sessions
+analysis_cache = AnalysisCache()
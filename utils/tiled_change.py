@@ -0,0 +1,303 @@
+import os
+import numpy as np
+
+from utils.diff_kernel import abs_diff_sum, threshold_masks
+from utils.alignment import align_pair
+
+# Rough upper bound of working memory needed per pixel while a tile is processed:
+# two RGB input tiles, the diff kernel buffers and per-channel difference, the
+# int16 edge temporaries, the threshold masks and the heatmap/overlay outputs for the tile.
+WORKING_BYTES_PER_PIXEL = 56
+
+# Thresholds on the summed per-channel difference (0-765). They are the integer
+# equivalents of the mean-intensity thresholds (30, 80 and 50) used by the upload page.
+MODERATE_CHANGE_SUM = 90
+HIGH_CHANGE_SUM = 240
+SIGNIFICANT_CHANGE_SUM = 150
+
+# Summed quantities reported per tile by process_change_window
+TILE_STAT_NAMES = (
+    "before_green_sum", "after_green_sum", "before_blue_sum", "after_blue_sum",
+    "total_diff", "horizontal_edges", "vertical_edges"
+)
+
+
+def choose_tile_size(memory_limit_mb=64, minimum=64):
+    """
+    Pick the side length of a square tile that fits in the given memory ceiling.
+
+    Parameters:
+    -----------
+    memory_limit_mb : float
+        Maximum working memory to spend on a single tile, in megabytes
+    minimum : int
+        Smallest tile side that will be returned
+
+    Returns:
+    --------
+    int
+        Tile side length in pixels (a multiple of 64)
+    """
+    max_pixels = (memory_limit_mb * 1024 * 1024) / WORKING_BYTES_PER_PIXEL
+    side = int(np.sqrt(max_pixels)) // 64 * 64
+    return max(minimum, side)
+
+
+def iter_tiles(width, height, tile_size):
+    """
+    Yield (x0, y0, x1, y1) windows covering an image in row-major order.
+
+    Parameters:
+    -----------
+    width : int
+        Image width in pixels
+    height : int
+        Image height in pixels
+    tile_size : int
+        Side length of each tile; edge tiles are clipped to the image
+    """
+    for y0 in range(0, height, tile_size):
+        y1 = min(y0 + tile_size, height)
+        for x0 in range(0, width, tile_size):
+            x1 = min(x0 + tile_size, width)
+            yield x0, y0, x1, y1
+
+
+def _allocate_output(shape, name, output_dir, dtype=np.uint8):
+    """Allocate an output raster in memory, or as a memory-mapped .npy file when output_dir is set."""
+    if output_dir is None:
+        return np.zeros(shape, dtype=dtype)
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{name}.npy")
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def _prepare_pair(before_image, after_image):
+    """Convert both images to RGB and put the after image on the before image grid (cached per pair)."""
+    return align_pair(before_image, after_image)
+
+
+def change_visualization(change_sum, after_tile):
+    """
+    Turn a summed difference into the change heatmap, highlighted overlay and significance mask.
+
+    Parameters:
+    -----------
+    change_sum : np.ndarray
+        uint16 summed per-channel difference as returned by abs_diff_sum
+    after_tile : np.ndarray
+        uint8 RGB array of the later image, with the same height and width
+
+    Returns:
+    --------
+    tuple
+        (heatmap, overlay, mask) where heatmap and overlay are uint8 RGB arrays and
+        mask is a boolean array
+    """
+    at_least_moderate, high, mask = threshold_masks(
+        change_sum, (MODERATE_CHANGE_SUM - 1, HIGH_CHANGE_SUM - 1, SIGNIFICANT_CHANGE_SUM)
+    )
+
+    heatmap = np.zeros(after_tile.shape, dtype=np.uint8)
+
+    # Blue channel for minimal changes, green for moderate, red for significant
+    low = ~at_least_moderate
+    heatmap[low, 2] = (change_sum[low] * 8 // 3).astype(np.uint8)
+
+    moderate = at_least_moderate & ~high
+    heatmap[moderate, 1] = ((change_sum[moderate] - MODERATE_CHANGE_SUM) * 5 // 3).astype(np.uint8)
+
+    heatmap[high, 0] = np.minimum(change_sum[high] - HIGH_CHANGE_SUM, 255).astype(np.uint8)
+
+    # Highlight significant changes in red on top of the after image (70% image, 30% red)
+    overlay = after_tile.copy()
+    highlighted = overlay[mask].astype(np.uint16) * 7
+    highlighted[:, 0] += 765  # 255 * 0.3, scaled by 10
+    overlay[mask] = (highlighted // 10).astype(np.uint8)
+
+    return heatmap, overlay, mask
+
+
+def process_change_tile(before_tile, after_tile):
+    """
+    Compute the change heatmap, highlighted overlay and significance mask for one tile.
+
+    Parameters:
+    -----------
+    before_tile : np.ndarray
+        uint8 RGB array of the earlier image
+    after_tile : np.ndarray
+        uint8 RGB array of the later image, same shape as before_tile
+
+    Returns:
+    --------
+    tuple
+        (heatmap, overlay, mask, change_sum) where heatmap and overlay are uint8 RGB
+        arrays, mask is a boolean array and change_sum is the uint16 summed difference
+    """
+    # Summed absolute difference over the three channels (0-765), in integer buffers
+    change_sum = abs_diff_sum(before_tile, after_tile)
+    heatmap, overlay, mask = change_visualization(change_sum, after_tile)
+    return heatmap, overlay, mask, change_sum
+
+
+def process_change_window(before_window, after_window, tile_width, tile_height):
+    """
+    Process one tile read with a one-pixel margin below and to the right of it.
+
+    The margin (present wherever the image continues) lets the edge sums of the
+    per-channel difference include the pixel pairs that straddle tile seams, so
+    the summed statistics of all tiles equal those of the full frame.
+
+    Parameters:
+    -----------
+    before_window : np.ndarray
+        uint8 RGB array of the earlier image, the tile plus its margin
+    after_window : np.ndarray
+        uint8 RGB array of the later image, same shape as before_window
+    tile_width : int
+        Width of the tile without its margin
+    tile_height : int
+        Height of the tile without its margin
+
+    Returns:
+    --------
+    tuple
+        (heatmap, overlay, mask, change_sum, stats) for the tile without its margin,
+        where stats holds the tile's sums as listed in TILE_STAT_NAMES
+    """
+    h, w = tile_height, tile_width
+    diff = np.empty_like(before_window)
+    window_sum = abs_diff_sum(before_window, after_window, channel_diff=diff)
+    change_sum = window_sum[:h, :w]
+    heatmap, overlay, mask = change_visualization(change_sum, after_window[:h, :w])
+
+    # Edges between vertically and horizontally adjacent pixels whose first pixel is in the tile
+    signed_diff = diff.astype(np.int16)
+    rows = min(h, diff.shape[0] - 1)
+    columns = min(w, diff.shape[1] - 1)
+    horizontal_edges = np.abs(signed_diff[1:rows + 1, :w] - signed_diff[:rows, :w]).sum(dtype=np.int64)
+    vertical_edges = np.abs(signed_diff[:h, 1:columns + 1] - signed_diff[:h, :columns]).sum(dtype=np.int64)
+    del signed_diff
+
+    before_tile = before_window[:h, :w]
+    after_tile = after_window[:h, :w]
+    stats = {
+        "before_green_sum": int(before_tile[:, :, 1].sum(dtype=np.int64)),
+        "after_green_sum": int(after_tile[:, :, 1].sum(dtype=np.int64)),
+        "before_blue_sum": int(before_tile[:, :, 2].sum(dtype=np.int64)),
+        "after_blue_sum": int(after_tile[:, :, 2].sum(dtype=np.int64)),
+        "total_diff": int(change_sum.sum(dtype=np.int64)),
+        "max_channel_diff": int(diff[:h, :w].max()) if h and w else 0,
+        "horizontal_edges": int(horizontal_edges),
+        "vertical_edges": int(vertical_edges)
+    }
+    return heatmap, overlay, mask, change_sum.copy(), stats
+
+
+def merge_tile_stats(tile_stats, total_pixels):
+    """
+    Combine the per-tile sums of process_change_window into frame statistics.
+
+    Parameters:
+    -----------
+    tile_stats : list
+        Stats dictionaries of all tiles of a frame
+    total_pixels : int
+        Number of pixels in the frame
+
+    Returns:
+    --------
+    dict
+        Green and blue channel means of both images, the total and maximum
+        difference and the horizontal and vertical edge sums of the difference
+    """
+    totals = {name: sum(stats[name] for stats in tile_stats) for name in TILE_STAT_NAMES}
+    pixels = max(total_pixels, 1)
+    return {
+        "before_green_mean": totals["before_green_sum"] / pixels,
+        "after_green_mean": totals["after_green_sum"] / pixels,
+        "before_blue_mean": totals["before_blue_sum"] / pixels,
+        "after_blue_mean": totals["after_blue_sum"] / pixels,
+        "total_diff": totals["total_diff"],
+        "max_channel_diff": max((stats["max_channel_diff"] for stats in tile_stats), default=0),
+        "horizontal_edges": totals["horizontal_edges"],
+        "vertical_edges": totals["vertical_edges"]
+    }
+
+
+def window_with_margin(window, width, height):
+    """Extend a tile window by one pixel to the right and below, clipped to the image."""
+    x0, y0, x1, y1 = window
+    return x0, y0, min(x1 + 1, width), min(y1 + 1, height)
+
+
+def detect_changes_tiled(before_image, after_image, memory_limit_mb=64, tile_size=None, output_dir=None):
+    """
+    Run before/after change detection tile by tile with bounded working memory.
+
+    Parameters:
+    -----------
+    before_image : PIL.Image
+        The earlier satellite image
+    after_image : PIL.Image
+        The later satellite image; resized to the before image if sizes differ
+    memory_limit_mb : float
+        Working memory ceiling per tile, used when tile_size is not given
+    tile_size : int, optional
+        Explicit tile side length in pixels
+    output_dir : str, optional
+        If given, the heatmap, overlay, mask and change sum are written to
+        memory-mapped .npy files in this directory instead of being held in memory
+
+    Returns:
+    --------
+    dict
+        Dictionary with the "heatmap", "overlay" and "mask" arrays, the uint16
+        "change_sum", the number of "significant_pixels", "total_pixels", the
+        frame "stats" from merge_tile_stats and the "tile_size" used
+    """
+    before_image, after_image = _prepare_pair(before_image, after_image)
+    width, height = before_image.size
+
+    if tile_size is None:
+        tile_size = choose_tile_size(memory_limit_mb)
+
+    heatmap = _allocate_output((height, width, 3), "heatmap", output_dir)
+    overlay = _allocate_output((height, width, 3), "overlay", output_dir)
+    mask = _allocate_output((height, width), "mask", output_dir, dtype=bool)
+    change_sum = _allocate_output((height, width), "change_sum", output_dir, dtype=np.uint16)
+
+    significant_pixels = 0
+    tile_stats = []
+    for window in iter_tiles(width, height, tile_size):
+        x0, y0, x1, y1 = window
+        margin = window_with_margin(window, width, height)
+        before_window = np.asarray(before_image.crop(margin))
+        after_window = np.asarray(after_image.crop(margin))
+
+        tile_heatmap, tile_overlay, tile_mask, tile_sum, stats = process_change_window(
+            before_window, after_window, x1 - x0, y1 - y0
+        )
+
+        heatmap[y0:y1, x0:x1] = tile_heatmap
+        overlay[y0:y1, x0:x1] = tile_overlay
+        mask[y0:y1, x0:x1] = tile_mask
+        change_sum[y0:y1, x0:x1] = tile_sum
+        significant_pixels += int(np.count_nonzero(tile_mask))
+        tile_stats.append(stats)
+
+    if output_dir is not None:
+        for output in (heatmap, overlay, mask, change_sum):
+            output.flush()
+
+    return {
+        "heatmap": heatmap,
+        "overlay": overlay,
+        "mask": mask,
+        "change_sum": change_sum,
+        "significant_pixels": significant_pixels,
+        "total_pixels": width * height,
+        "stats": merge_tile_stats(tile_stats, width * height),
+        "tile_size": tile_size
+    }
@@ -0,0 +1,230 @@
+import numpy as np
+from scipy import ndimage
+
+from utils.region_stats import compute_region_stats
+from utils.alignment import align_pair
+
+# Ground sampling distance assumed when converting pixel counts to areas (Sentinel-2 visible bands)
+DEFAULT_PIXEL_SIZE_M = 10
+
+
+def to_rgb_array(image):
+    """Return a uint8 RGB numpy view of a PIL image, converting the mode only when needed."""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.asarray(image)
+
+
+def excess_green(rgb, out=None):
+    """
+    Compute the excess-green vegetation index (2G - R - B) in integer arithmetic.
+
+    Parameters:
+    -----------
+    rgb : np.ndarray
+        uint8 array of shape (height, width, 3)
+    out : np.ndarray, optional
+        Preallocated int16 array of shape (height, width) to write the result into
+
+    Returns:
+    --------
+    np.ndarray
+        int16 array with values between -510 and 510
+    """
+    if out is None:
+        out = np.empty(rgb.shape[:2], dtype=np.int16)
+    np.copyto(out, rgb[:, :, 1])
+    out <<= 1
+    out -= rgb[:, :, 0]
+    out -= rgb[:, :, 2]
+    return out
+
+
+def vegetation_mask(rgb, min_green=100, out=None):
+    """
+    Classify pixels as forest using the green-dominance rule.
+
+    A pixel counts as forest when its green channel is larger than both the red and
+    blue channels and above min_green. This is the rule used by calculate_forest_coverage.
+
+    Parameters:
+    -----------
+    rgb : np.ndarray
+        uint8 array of shape (height, width, 3)
+    min_green : int
+        Minimum green value for a pixel to count as forest
+    out : np.ndarray, optional
+        Preallocated boolean array of shape (height, width)
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean forest mask
+    """
+    green = rgb[:, :, 1]
+    if out is None:
+        out = np.empty(rgb.shape[:2], dtype=bool)
+    np.greater(green, rgb[:, :, 0], out=out)
+    out &= green > rgb[:, :, 2]
+    out &= green > min_green
+    return out
+
+
+def label_regions(mask, strength=None, min_region_pixels=50, max_regions=None,
+                  pixel_size_m=DEFAULT_PIXEL_SIZE_M, strength_scale=255.0, labels=None):
+    """
+    Turn a boolean mask into a list of connected regions with boxes, areas and confidence.
+
+    Parameters:
+    -----------
+    mask : np.ndarray
+        Boolean mask of candidate pixels
+    strength : np.ndarray, optional
+        Per-pixel signal strength used for the confidence score (for example the
+        drop in vegetation index); without it every region gets the base confidence
+    min_region_pixels : int
+        Regions smaller than this are discarded as noise
+    max_regions : int, optional
+        Keep only the largest max_regions regions
+    pixel_size_m : float
+        Ground size of one pixel in meters
+    strength_scale : float
+        Mean strength that maps to the highest confidence
+    labels : tuple, optional
+        Precomputed (labels, num_regions) for the mask, e.g. from a parallel labeller
+
+    Returns:
+    --------
+    list
+        List of dictionaries with "x1", "y1", "x2", "y2", "pixels", "area_km2" and
+        "confidence", sorted from the largest region to the smallest
+    """
+    # 8-connected components so diagonal clearings stay in one region
+    if labels is None:
+        labels = ndimage.label(mask, structure=np.ones((3, 3), dtype=bool))
+    labels, num_regions = labels
+    if num_regions == 0:
+        return []
+
+    # Per-region area, bounding box and mean strength in one pass
+    table = compute_region_stats(labels, num_regions, intensity=strength, include_perimeter=False)
+    table = table[table["area"] >= min_region_pixels]
+    if max_regions is not None:
+        table = table.head(max_regions)
+
+    # Map mean strength to a 0.5-0.99 confidence score
+    mean_strength = table["mean_intensity"].to_numpy(dtype=np.float64) if strength is not None else np.zeros(len(table))
+    confidence = 0.5 + 0.49 * np.clip(mean_strength / strength_scale, 0.0, 1.0)
+    pixel_area_km2 = (pixel_size_m ** 2) / 1e6
+
+    regions = []
+    for row, region_confidence in zip(table.itertuples(index=False), confidence):
+        regions.append({
+            "x1": int(row.x1),
+            "y1": int(row.y1),
+            "x2": int(row.x2),
+            "y2": int(row.y2),
+            "pixels": int(row.area),
+            "confidence": float(region_confidence),
+            "area_km2": round(int(row.area) * pixel_area_km2, 4)
+        })
+
+    return regions
+
+
+def detect_deforestation_regions(before_image, after_image, index_drop_threshold=40, min_green=100,
+                                 min_region_pixels=50, max_regions=None, pixel_size_m=DEFAULT_PIXEL_SIZE_M):
+    """
+    Detect connected areas that changed from forest to non-forest between two dates.
+
+    A pixel is flagged when it satisfies the green-dominance forest rule in the
+    before image, fails it in the after image, and its excess-green index dropped
+    by at least index_drop_threshold.
+
+    Parameters:
+    -----------
+    before_image : PIL.Image
+        The earlier satellite image
+    after_image : PIL.Image
+        The later satellite image; resized to the before image if sizes differ
+    index_drop_threshold : int
+        Minimum drop in excess-green index (0-1020) for a pixel to count as lost forest
+    min_green : int
+        Minimum green value for a pixel to count as forest
+    min_region_pixels : int
+        Regions smaller than this are discarded as noise
+    max_regions : int, optional
+        Keep only the largest max_regions regions
+    pixel_size_m : float
+        Ground size of one pixel in meters
+
+    Returns:
+    --------
+    tuple
+        (regions, loss_mask) where regions is a list of dictionaries as returned by
+        label_regions and loss_mask is the boolean per-pixel deforestation mask
+    """
+    before_image, after_image = align_pair(before_image, after_image)
+    before_rgb = to_rgb_array(before_image)
+    after_rgb = to_rgb_array(after_image)
+
+    # Drop in vegetation index, computed in place in a single int16 buffer
+    index_drop = excess_green(before_rgb)
+    index_drop -= excess_green(after_rgb)
+
+    # Forest before, not forest after, with a large enough index drop
+    loss_mask = vegetation_mask(before_rgb, min_green)
+    loss_mask &= ~vegetation_mask(after_rgb, min_green)
+    loss_mask &= index_drop >= index_drop_threshold
+
+    regions = label_regions(
+        loss_mask,
+        strength=index_drop,
+        min_region_pixels=min_region_pixels,
+        max_regions=max_regions,
+        pixel_size_m=pixel_size_m
+    )
+
+    return regions, loss_mask
+
+
+def detect_cleared_regions(image, min_green=100, min_region_pixels=50, max_regions=None,
+                           pixel_size_m=DEFAULT_PIXEL_SIZE_M):
+    """
+    Detect connected non-forest patches in a single image.
+
+    Used when no earlier image is available to compare against.
+
+    Parameters:
+    -----------
+    image : PIL.Image
+        The satellite image to analyze
+    min_green : int
+        Minimum green value for a pixel to count as forest
+    min_region_pixels : int
+        Regions smaller than this are discarded as noise
+    max_regions : int, optional
+        Keep only the largest max_regions regions
+    pixel_size_m : float
+        Ground size of one pixel in meters
+
+    Returns:
+    --------
+    list
+        List of region dictionaries as returned by label_regions
+    """
+    rgb = to_rgb_array(image)
+    cleared_mask = vegetation_mask(rgb, min_green)
+    np.logical_not(cleared_mask, out=cleared_mask)
+
+    # Confidence grows with how far the pixel is from being green-dominant
+    strength = np.negative(excess_green(rgb))
+    np.maximum(strength, 0, out=strength)
+
+    return label_regions(
+        cleared_mask,
+        strength=strength,
+        min_region_pixels=min_region_pixels,
+        max_regions=max_regions,
+        pixel_size_m=pixel_size_m
+    )